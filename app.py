@@ -1,20 +1,34 @@
 import time
+rerun_start = time.perf_counter()
 
 import streamlit as st
 from streamlit_webrtc import webrtc_streamer, WebRtcMode
 
-from utils.parameters import DEFAULT_AUDIO_LANG, DEFAULT_TRANS_LANG, REFRESH_RATE_FAST, REFRESH_RATE_SLOW, SHUTDOWN_MSG, INFO_MSG
-from utils.lang_list import LANGUAGE_CODES
-from web.display import get_html_subt, format_subt, join_text
-from utils.streamlit_utils import shutdown_app
-from utils.logs import print_logs_threads
+from utils.parameters import DEFAULT_AUDIO_LANG, DEFAULT_TRANS_LANG, REFRESH_RATE_FAST, REFRESH_RATE_SLOW, RENDER_STATS_INTERVAL, SHUTDOWN_MSG, INFO_MSG, ENGINE
+from utils.parameters import TRACING_ENABLED, TRACE_PANEL, TRACE_PANEL_INTERVAL, TRACE_EXPORT_PORT
+from utils.lang_list import LANGUAGE_CODES, LANGUAGE_NAMES, LANGUAGE_INDEX
+from utils.segmentation import get_segmenter
+from web.display import get_html_subt, get_html_voice, format_subt, join_text
+from utils.streamlit_utils import shutdown_app, rerun_latency, static_asset, style_tag
+from utils.logs import print_logs, print_logs_threads
+from utils.tracing import process_tracer, format_markdown, start_metrics_server
+from utils.session_monitor import process_rss
 from thread_manager import ThreadManager, stop_all_threads
+from async_engine import AsyncThreadManager
+from worker_pool import RemoteSession
+from broadcast import get_broadcast, start_broadcast, stop_broadcast
 from microphone_stream import AudioProcessor
 
 
+st.set_page_config(
+    page_title="EdgeBox-Nova LLM",
+    page_icon="web/logo3.png",
+    layout="wide"
+)
+
+
 def load_css(path: str):
-    with open(path, "r", encoding="utf-8") as f:
-        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+    st.markdown(style_tag(path), unsafe_allow_html=True)
 load_css("web/theme.css")
 
 
@@ -23,16 +37,9 @@ if st.session_state.get("shutdown", False):
     st.warning(SHUTDOWN_MSG)
     st.stop()
 
-st.set_page_config(layout="wide")
-st.set_page_config(
-    page_title="EdgeBox-Nova LLM",
-    page_icon="web/logo3.png",
-    layout="wide"
-)
-
 col1, col2 = st.columns([1, 8])
 with col1:
-    st.image("web/logo2.png", width=600)
+    st.image(static_asset("web/logo2.png"), width=600)
 with col2:
     st.markdown(
         "<h1 style='margin-top: 10px;'>EdgeBox-Nova LLM</h1>",
@@ -41,6 +48,17 @@ with col2:
 
 st.sidebar.info(INFO_MSG, width=400)
 
+if TRACING_ENABLED and TRACE_EXPORT_PORT:
+    start_metrics_server(TRACE_EXPORT_PORT)
+
+
+#------- broadcast mode (one speaker, many viewers) -------#
+broadcast_mode = st.sidebar.radio("Broadcast", ["Off", "Speaker", "Viewer"], horizontal=True, key="broadcast_mode")
+broadcast_name = st.sidebar.text_input("Broadcast name", value="main", key="broadcast_name")
+
+if st.session_state.get("broadcasting") and (broadcast_mode != "Speaker" or st.session_state.broadcasting != broadcast_name):
+    stop_broadcast(st.session_state.pop("broadcasting"))
+
 
 
 #------- Rerun and stop buttons -------#
@@ -71,7 +89,6 @@ with col_audio:
 
 
 #------- languages choice -------#
-lang_keys = list(LANGUAGE_CODES.keys())
 if "lang_audio" not in st.session_state:
     st.session_state["lang_audio"] = DEFAULT_AUDIO_LANG
 if "lang_transl" not in st.session_state:
@@ -79,9 +96,9 @@ if "lang_transl" not in st.session_state:
 
 col_transc, col_transl = st.columns(2, gap="large")
 with col_transc:
-    lang_audio_ui = st.selectbox("Audio language", lang_keys, key="lang_audio_ui", index=lang_keys.index(st.session_state.lang_audio))
+    lang_audio_ui = st.selectbox("Audio language", LANGUAGE_NAMES, key="lang_audio_ui", index=LANGUAGE_INDEX[st.session_state.lang_audio])
 with col_transl:
-    lang_transl_ui = st.selectbox("Translation language", lang_keys, key="lang_transl_ui", index=lang_keys.index(st.session_state.lang_transl))
+    lang_transl_ui = st.selectbox("Translation language", LANGUAGE_NAMES, key="lang_transl_ui", index=LANGUAGE_INDEX[st.session_state.lang_transl])
 
 st.session_state.lang_audio = lang_audio_ui
 st.session_state.lang_transl = lang_transl_ui
@@ -93,36 +110,105 @@ LANG_TRANSL = LANGUAGE_CODES[lang_transl_ui]
 #------- transcription and translation display initialization -------#
 transc, transl, prev_transc, prev_transl = [], [], [], []
 with col_transc:
+    transc_voice_box = st.empty()
     transc_box = st.empty()
 with col_transl:
+    transl_voice_box = st.empty()
     transl_box = st.empty()
+transc_voice_box.markdown(get_html_voice(0.0), unsafe_allow_html=True)
+transl_voice_box.markdown(get_html_voice(0.0), unsafe_allow_html=True)
 transc_box.markdown(get_html_subt("", "", False, "transc", "Transcription"), unsafe_allow_html=True)
 transl_box.markdown(get_html_subt("", "", False, "transl", "Translation"), unsafe_allow_html=True)
 
 
 #------- stopping STT and translation threads -------#
-print_logs_threads("Threads before stop_all_threads (before running while)")
-stop_all_threads()
-print_logs_threads("Threads after stop_all_threads (before running while)")
-
-
-if ctx and ctx.audio_processor:
+# the running session of this tab is kept when only the languages change
+engine = {"asyncio": AsyncThreadManager, "processes": RemoteSession}.get(ENGINE, ThreadManager)
+threads = st.session_state.get("threads")
+if (
+    broadcast_mode == "Off" and ctx and ctx.audio_processor and type(threads) is engine
+    and threads.running and threads.audio_processor is ctx.audio_processor
+):
+    threads.reconfigure(LANG_AUDIO, LANG_TRANSL)
+else:
+    print_logs_threads("Threads before stop_all_threads (before running while)")
+    stop_all_threads()
+    print_logs_threads("Threads after stop_all_threads (before running while)")
+    threads = None
+
+
+if broadcast_mode == "Viewer":
+    session = get_broadcast(broadcast_name)
+    if session is not None:
+        LANG_AUDIO = session.lang_audio
+        threads = session.subscribe(LANG_TRANSL)
+    else:
+        st.sidebar.warning(f"No broadcast named '{broadcast_name}' is running.")
+
+elif ctx and ctx.audio_processor:
+    if broadcast_mode == "Speaker":
+        threads = start_broadcast(broadcast_name, LANG_AUDIO, ctx.audio_processor).subscribe(LANG_TRANSL)
+        st.session_state.broadcasting = broadcast_name
+    elif threads is None:
+        threads = engine(LANG_AUDIO, LANG_TRANSL, ctx.audio_processor)
+
+
+if threads is not None:
 
     #------- start STT and translation threads -------#
-    st.session_state.threads = ThreadManager(LANG_AUDIO, LANG_TRANSL, ctx.audio_processor)
+    st.session_state.threads = threads
     print_logs_threads("Threads after creating threads (before running while)")
 
-    threads = st.session_state.threads
     threads.start()
 
 
     #----- real-time update of transcription and translation -----#
+    # only the panes whose HTML changed are pushed to the browser, the voice level is pushed on its own
+    last_html = {"transc": None, "transl": None, "voice": get_html_voice(0.0)}
+    render_stats = st.session_state["render_stats"] = {"renders": 0, "bytes": 0, "start_time": time.time()}
+    last_stats_log = time.time()
+
+    # stage latencies of this session and of the whole process
+    tracer = threads.tracer
+    last_traced = {"transc": None, "transl": None}
+    trace_box = st.sidebar.empty() if tracer.enabled and TRACE_PANEL else None
+    last_trace_panel = 0
+
+    def push_html(boxes, subt_type, html, received_at=None):
+        if html == last_html[subt_type]:
+            return
+        for box in boxes:
+            box.markdown(html, unsafe_allow_html=True)
+        last_html[subt_type] = html
+        render_stats["renders"] += len(boxes)
+        render_stats["bytes"] += len(boxes) * len(html.encode("utf-8"))
+        if subt_type == "voice":
+            return
+
+        # a revision is traced on its first render only (the line scrolling also changes the HTML)
+        if received_at != last_traced[subt_type]:
+            tracer.record(f"render_{subt_type}", received_at)
+            last_traced[subt_type] = received_at
+
+    version = None
     while threads.running:
 
-        volume = ctx.audio_processor.volume if ctx.audio_processor else 0.0
+        # reading the session state lets Streamlit end this run when a rerun is requested
+        # (language change, buttons, WebRTC stop), even when nothing is pushed
+        if st.session_state.get("threads") is not threads:
+            break
+        # the audio of this tab is gone: its session is not updated anymore
+        if broadcast_mode != "Viewer" and not (ctx and ctx.audio_processor and ctx.audio_processor.running):
+            break
+
+        # wait for a new transcription/translation (the timeout refreshes the voice level)
+        version = threads.wait_update(version, timeout=REFRESH_RATE_FAST)
+
+        volume = ctx.audio_processor.volume if ctx and ctx.audio_processor else 0.0
+        push_html([transc_voice_box, transl_voice_box], "voice", get_html_voice(volume))
 
-        new_line_transc, prev_transc, transc = format_subt(threads.output_stt, prev_transc)
-        new_line_transl, prev_transl, transl = format_subt(threads.output_transl, prev_transl)
+        new_line_transc, prev_transc, transc = format_subt(threads.output_stt, prev_transc, get_segmenter(LANG_AUDIO).max_len)
+        new_line_transl, prev_transl, transl = format_subt(threads.output_transl, prev_transl, get_segmenter(LANG_TRANSL).max_len)
 
         # transcription
         html_transc = get_html_subt(
@@ -131,9 +217,13 @@ if ctx and ctx.audio_processor:
             new_line_transc, 
             "transc", 
             "Transcription",
-            voice_level=volume,
         )
-        transc_box.markdown(html_transc, unsafe_allow_html=True)
+        push_html([transc_box], "transc", html_transc, threads.stt_received_at)
+
+        if rerun_start is not None and threads.output_stt:
+            latency, rerun_start = time.perf_counter() - rerun_start, None
+            rerun_latency.add(latency)
+            print_logs(f"First subtitle {1000 * latency:.0f} ms after the rerun (p95 {1000 * rerun_latency.percentile(95):.0f} ms)", log_type="render")
 
         # translation
         html_transl = get_html_subt(
@@ -142,10 +232,20 @@ if ctx and ctx.audio_processor:
             new_line_transl, 
             "transl",
             "Translation",
-            voice_level=volume,
         )
-        transl_box.markdown(html_transl, unsafe_allow_html=True)
-
-        # waiting time
-        waiting_time = REFRESH_RATE_SLOW if (new_line_transc or new_line_transl) else REFRESH_RATE_FAST
-        time.sleep(waiting_time)
+        push_html([transl_box], "transl", html_transl, threads.transl_received_at)
+
+        if trace_box is not None and time.time() - last_trace_panel > TRACE_PANEL_INTERVAL:
+            trace_box.markdown(format_markdown({"session": tracer, "process": process_tracer}))
+            last_trace_panel = time.time()
+
+        if time.time() - last_stats_log > RENDER_STATS_INTERVAL:
+            elapsed = time.time() - render_stats["start_time"]
+            print_logs(f"{render_stats['renders'] / elapsed:.1f} renders/s, {render_stats['bytes'] / elapsed / 1000:.1f} kB/s pushed", log_type="render")
+            memory = threads.memory_usage()
+            print_logs(f"Session buffers {sum(memory.values()) / 1000:.0f} kB {memory}, process RSS {process_rss() / 1e6:.0f} MB", log_type="memory")
+            last_stats_log = time.time()
+
+        # let the line scrolling animation finish
+        if new_line_transc or new_line_transl:
+            time.sleep(REFRESH_RATE_SLOW)
@@ -0,0 +1,324 @@
+import asyncio
+import threading
+import time
+
+from thread_manager import ThreadManager, STTStream, TranslationJob, PROJECT_ID, speech, translate_v3
+from utils.parameters import (
+    AUDIO_ENCODING, STREAMING_LIMIT, STREAM_HANDOFF_TIME, TRANSLATE_MAX_WAIT, TRANSLATE_TIMEOUT, TRANSLATE_MAX_IN_FLIGHT, TRANSLATION_BATCHING,
+    ASYNC_LOOPS, ASYNC_LOOP_NAME,
+)
+from utils.logs import print_logs
+from utils.client_pool import client_pool
+from utils.audio_encoder import create_encoder
+from utils.audio_queue import AsyncAudioBuffer
+from utils.session_monitor import session_monitor
+from utils.translation_dispatcher import translation_dispatcher
+
+
+class EventLoopThread:
+    def __init__(self, name):
+        self.loop = asyncio.new_event_loop()
+        self.sessions = 0
+        self.thread = threading.Thread(target=self.loop.run_forever, name=name, daemon=True)
+        self.thread.start()
+
+        # async clients are bound to the event loop they are created in: each loop has its own pooled clients,
+        # acquired from the session tasks
+        self.client_names = {"speech": f"speech_{name}", "translate": f"translate_{name}"}
+        client_pool.register(self.client_names["speech"], lambda: speech.SpeechAsyncClient(), close=self.close_client)
+        client_pool.register(self.client_names["translate"], lambda: translate_v3.TranslationServiceAsyncClient(), close=self.close_client)
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def close_client(self, client):
+        # the channel of an async client has to be closed in its event loop
+        self.submit(client.transport.close())
+
+
+# shared by all the asyncio sessions of the server process
+loops = []
+loops_lock = threading.Lock()
+
+
+def get_loop():
+    # the loops are started on first use, sessions go to the least loaded one
+    with loops_lock:
+        if len(loops) < ASYNC_LOOPS:
+            loops.append(EventLoopThread(f"{ASYNC_LOOP_NAME}_{len(loops)}"))
+        return min(loops, key=lambda loop: loop.sessions)
+
+
+class AsyncSTTStream(STTStream):
+    def __init__(self, client, config, audio_processor, since=None, encoding=AUDIO_ENCODING):
+        self.audio_processor = audio_processor
+        self.buffer, self.audio_offset = audio_processor.subscribe(since, AsyncAudioBuffer(asyncio.get_running_loop()))
+        self.start_time = time.time()
+        self.skip_words = 0
+
+        self.client, self.config = client, config
+        self.encoder = create_encoder(encoding)
+        self.sent_samples = 0
+        self.sent_bytes = 0
+        self.cancelled = False
+        self.call = self.responses = None
+
+    async def requests(self):
+        # the async client has no helper sending the config first
+        yield speech.StreamingRecognizeRequest(streaming_config=self.config)
+        async for content in self.audio_processor.agenerator(self.buffer):
+            self.trace_sent(content)
+            yield speech.StreamingRecognizeRequest(audio_content=self.encode(content))
+
+    async def open(self):
+        self.call = self.responses = await self.client.streaming_recognize(requests=self.requests())
+        return self
+
+
+class AsyncThreadManager(ThreadManager):
+    # same interface as ThreadManager, but speech_to_text and translate are coroutines
+    # running on an event loop shared with the other sessions instead of two threads
+    def __init__(self, lang_audio, lang_transl, audio_processor, transc_client=None, transl_client=None):
+        super().__init__(lang_audio, lang_transl, audio_processor, transc_client, transl_client)
+        self.event_loop = None
+        self.task = None
+        self.stt_event = None
+
+        # set when the session task is done, see join()
+        self.finished = None
+
+    def acquire_clients(self, transc_client=None, transl_client=None):
+        # the pooled clients are acquired in the event loop, see run()
+        self.pooled_clients = []
+        self.transc_client, self.transl_client = transc_client, transl_client
+
+    async def open_stream(self):
+        stream = AsyncSTTStream(self.transc_client, self.streaming_config, self.audio_processor, since=self.last_final_audio_time, encoding=self.encoding)
+        with self.streams_lock:
+            self.streams.append(stream)
+        print_logs(f"Start STT session (replay from {stream.audio_offset:.1f}s)...")
+        try:
+            return await stream.open()
+        except Exception:
+            self.close_stream(stream)
+            raise
+
+    def close_stream(self, stream):
+        # streams are closed in the event loop they were opened in
+        if self.event_loop is not None and threading.current_thread() is not self.event_loop.thread:
+            self.event_loop.loop.call_soon_threadsafe(super().close_stream, stream)
+        else:
+            super().close_stream(stream)
+
+    async def speech_to_text(self):
+        stream = await self.open_stream()
+
+        while self.running and self.audio_processor.running:
+            next_stream = None
+            try:
+                async for response in stream.responses:
+                    if not self.running or stream.cancelled:
+                        break
+
+                    # open the next session before the streaming time limit, replaying the audio since the last final result
+                    if next_stream is None and stream.elapsed > STREAMING_LIMIT - STREAM_HANDOFF_TIME:
+                        next_stream = await self.open_stream()
+
+                    final_words = self.process_response(stream, response)
+
+                    # hand off to the next session at the end of a sentence (or when the limit is reached)
+                    if next_stream is not None:
+                        if final_words is not None:
+                            next_stream.skip_words += len(final_words)
+                            break
+                        if stream.elapsed > STREAMING_LIMIT:
+                            break
+            except asyncio.CancelledError:
+                # a stream cancelled by reconfigure() is reopened below, the session task goes on,
+                # unless the task itself was cancelled in the meantime
+                if asyncio.current_task().cancelling() or not (self.running and stream.cancelled):
+                    self.close_stream(stream)
+                    self.close_stream(next_stream)
+                    raise
+            except Exception as e:
+                if not stream.cancelled and not stream.expired:
+                    print_logs(f"STT session interrupted: {e}")
+                    self.report_client("speech", success=False)
+            else:
+                self.report_client("speech", success=True)
+
+            self.log_stream_stop(stream)
+            self.close_stream(stream)
+            if not self.running or not self.audio_processor.running:
+                self.close_stream(next_stream)
+                break
+
+            stream = next_stream if next_stream is not None and not next_stream.cancelled else await self.open_stream()
+            self.prev_output_stt = []
+
+    def publish_transcript(self, output_stt, segments, received_at=None):
+        super().publish_transcript(output_stt, segments, received_at)
+        self.set_stt_event()
+
+    def set_stt_event(self):
+        # reconfigure() and stop() are called from the streamlit thread
+        if self.stt_event is None:
+            return
+        if threading.current_thread() is self.event_loop.thread:
+            self.stt_event.set()
+        else:
+            self.event_loop.loop.call_soon_threadsafe(self.stt_event.set)
+
+    async def wait_transcript(self, version):
+        # same as ThreadManager.wait_transcript, with an asyncio.Event set by publish_transcript
+        # (both run in the event loop, so no revision can be published between a check and clear())
+        while self.running and self.stt_version <= version:
+            self.stt_event.clear()
+            await self.stt_event.wait()
+
+        deadline = time.time() + TRANSLATE_MAX_WAIT
+        while self.running and self.transl_jobs:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                break
+            self.stt_event.clear()
+            try:
+                await asyncio.wait_for(self.stt_event.wait(), timeout)
+            except asyncio.TimeoutError:
+                break
+
+        with self.stt_cond:
+            pending_since, self.first_pending_time = self.first_pending_time, None
+            return self.stt_version, self.output_stt, self.stt_segments, pending_since, self.stt_received_at
+
+    def submit_translations(self, texts, lang_transl, lang_audio=None):
+        lang_audio = lang_audio or self.lang_audio
+        if TRANSLATION_BATCHING:
+            # batched by the dispatcher threads with the requests of the other sessions, the call itself
+            # is run in the event loop of the client
+            future = asyncio.wrap_future(translation_dispatcher.submit(
+                self.transl_client, f"projects/{PROJECT_ID}/locations/global", lang_audio, lang_transl, texts, loop=self.event_loop.loop,
+            ))
+        else:
+            future = asyncio.ensure_future(self.direct_translations(texts, lang_transl, lang_audio))
+        self.transl_futures.add(future)
+        future.add_done_callback(self.transl_futures.discard)
+        return future
+
+    async def direct_translations(self, texts, lang_transl, lang_audio=None):
+        response = await self.transl_client.translate_text(
+            contents=texts,
+            target_language_code=lang_transl,
+            source_language_code=lang_audio or self.lang_audio,
+            parent=f"projects/{PROJECT_ID}/locations/global",
+            timeout=TRANSLATE_TIMEOUT,
+        )
+        return [translation.translated_text for translation in response.translations]
+
+    @staticmethod
+    def is_sent(future):
+        # a task sends its request as soon as it starts and can be cancelled during the call
+        return not future.done()
+
+    def cancel_translations(self):
+        # the tasks are cancelled in their event loop
+        if self.event_loop is not None and threading.current_thread() is not self.event_loop.thread:
+            self.event_loop.loop.call_soon_threadsafe(super().cancel_translations)
+        else:
+            super().cancel_translations()
+
+    def release_job(self, job):
+        super().release_job(job)
+        self.set_stt_event()
+
+    def schedule_retry(self, delay):
+        # the retry is scheduled in the event loop
+        if threading.current_thread() is not self.event_loop.thread:
+            self.event_loop.loop.call_soon_threadsafe(self.schedule_retry, delay)
+            return
+        if self.retry_timer is not None:
+            self.retry_timer.cancel()
+        self.retry_timer = self.event_loop.loop.call_later(delay, self.retry_transcript)
+
+    def cancel_retry(self):
+        if self.event_loop is not None and threading.current_thread() is not self.event_loop.thread:
+            self.event_loop.loop.call_soon_threadsafe(super().cancel_retry)
+        else:
+            super().cancel_retry()
+
+    def retry_transcript(self):
+        super().retry_transcript()
+        self.set_stt_event()
+
+    async def translate(self):
+        # same pipelining as ThreadManager.translate, the slots are waited for with stt_event
+        version = 0
+        while self.running:
+            while self.running and len(self.transl_jobs) >= TRANSLATE_MAX_IN_FLIGHT:
+                self.stt_event.clear()
+                await self.stt_event.wait()
+            version, output_stt, segments, pending_since, received_at = await self.wait_transcript(version)
+
+            # check if the transcription has changed
+            if not self.running or not output_stt or segments == self.prev_input_transl:
+                continue
+            self.prev_input_transl = segments
+
+            self.tracer.record("transl_sent", received_at)
+            job = self.start_job(TranslationJob(version, self.lang_audio, self.lang_transl, pending_since, received_at), output_stt, segments)
+            job.future.add_done_callback(lambda future, job=job: self.finish_job(job))
+
+    async def run(self):
+        for kind, client in [("speech", self.transc_client), ("translate", self.transl_client)]:
+            if client is None:
+                self.pooled_clients.append(kind)
+        self.transc_client = self.transc_client or client_pool.acquire(self.CLIENT_NAMES["speech"])
+        self.transl_client = self.transl_client or client_pool.acquire(self.CLIENT_NAMES["translate"])
+        self.stt_event = asyncio.Event()
+
+        translation = asyncio.ensure_future(self.translate())
+        try:
+            await self.speech_to_text()
+        finally:
+            translation.cancel()
+            self.cancel_translations()
+
+    def reconfigure(self, lang_audio, lang_transl):
+        super().reconfigure(lang_audio, lang_transl)
+        self.set_stt_event()
+
+    def start(self):
+        if self.finished is None and self.running:
+            self.event_loop = get_loop()
+            self.event_loop.sessions += 1
+            self.CLIENT_NAMES = self.event_loop.client_names
+            self.finished = threading.Event()
+            self.event_loop.loop.call_soon_threadsafe(self.create_task)
+            session_monitor.register(self)
+
+    def create_task(self):
+        # the task is created in the loop (not with run_coroutine_threadsafe) so that its done callback
+        # only runs once the coroutine has really exited
+        self.task = asyncio.ensure_future(self.run())
+        self.task.add_done_callback(self.on_done)
+
+    def cancel_task(self):
+        if self.task is not None:
+            self.task.cancel()
+
+    def on_done(self, task):
+        self.event_loop.sessions -= 1
+        if not task.cancelled() and task.exception() is not None:
+            print_logs(f"Session stopped: {task.exception()}")
+        self.finished.set()
+
+    def stop(self):
+        super().stop()
+        self.set_stt_event()
+        if self.finished is not None:
+            self.event_loop.loop.call_soon_threadsafe(self.cancel_task)
+
+    def join(self, timeout=None):
+        if self.finished is not None and not self.finished.wait(timeout):
+            return [self.event_loop.thread.name]
+        return []
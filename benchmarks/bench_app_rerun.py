@@ -0,0 +1,112 @@
+# Cold start and reruns of app.py, to track the cost of the script itself (no stream is connected):
+# - import time of the modules of app.py in a fresh interpreter, with the Google Cloud clients and scipy
+#   imported lazily (current) vs at module level (as before), and the heavy modules loaded at startup;
+# - wall time of a script rerun with Streamlit's AppTest, and of the static assets and language lists
+#   rebuilt at every rerun before vs cached.
+# Run from the repository root: python -m benchmarks.bench_app_rerun
+import json
+from pathlib import Path
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+
+N_IMPORTS = 5
+N_RERUNS = 30
+N_CALLS = 2000
+HEAVY_MODULES = ["google.cloud.speech", "google.cloud.translate_v3", "scipy.signal"]
+
+# modules imported by app.py before its first Streamlit call
+APP_IMPORTS = """
+import streamlit, streamlit_webrtc
+import utils.lang_list, utils.segmentation, web.display, utils.streamlit_utils, utils.logs, utils.tracing, utils.session_monitor
+import thread_manager, async_engine, worker_pool, broadcast, microphone_stream
+"""
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+{eager}
+{imports}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"elapsed": elapsed, "loaded": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def import_time(eager):
+    script = IMPORT_SCRIPT.format(
+        eager="\n".join(f"import {name}" for name in HEAVY_MODULES) if eager else "",
+        imports=APP_IMPORTS, heavy=HEAVY_MODULES,
+    )
+    results = [json.loads(subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout) for _ in range(N_IMPORTS)]
+    return np.median([r["elapsed"] for r in results]), results[-1]["loaded"]
+
+
+def rerun_times():
+    import streamlit_webrtc
+    from streamlit.testing.v1 import AppTest
+
+    # the WebRTC component needs the session manager of a real server: it is replaced by a context with no connection
+    streamlit_webrtc.webrtc_streamer = lambda **kwargs: SimpleNamespace(audio_processor=None, state=SimpleNamespace(playing=False))
+
+    app = AppTest.from_file(str(Path(__file__).parent.parent / "app.py"), default_timeout=30)
+    start = time.perf_counter()
+    app.run()
+    first = time.perf_counter() - start
+    assert not app.exception, app.exception
+
+    times = []
+    for _ in range(N_RERUNS):
+        start = time.perf_counter()
+        app.run()
+        times.append(time.perf_counter() - start)
+    return first, np.array(times)
+
+
+def legacy_static():
+    with open("web/theme.css", "r", encoding="utf-8") as f:
+        css = f"<style>{f.read()}</style>"
+    with open("web/logo2.png", "rb") as f:
+        logo = f.read()
+    from utils.lang_list import LANGUAGE_CODES
+    from utils.parameters import DEFAULT_AUDIO_LANG, DEFAULT_TRANS_LANG
+    lang_keys = list(LANGUAGE_CODES.keys())
+    return css, logo, lang_keys, lang_keys.index(DEFAULT_AUDIO_LANG), lang_keys.index(DEFAULT_TRANS_LANG)
+
+
+def cached_static():
+    from utils.streamlit_utils import static_asset, style_tag
+    from utils.lang_list import LANGUAGE_NAMES, LANGUAGE_INDEX
+    from utils.parameters import DEFAULT_AUDIO_LANG, DEFAULT_TRANS_LANG
+    return style_tag("web/theme.css"), static_asset("web/logo2.png"), LANGUAGE_NAMES, LANGUAGE_INDEX[DEFAULT_AUDIO_LANG], LANGUAGE_INDEX[DEFAULT_TRANS_LANG]
+
+
+def per_call(function):
+    function()
+    start = time.perf_counter()
+    for _ in range(N_CALLS):
+        function()
+    return (time.perf_counter() - start) / N_CALLS
+
+
+def main():
+    for name, eager in (("lazy", False), ("eager", True)):
+        elapsed, loaded = import_time(eager)
+        print(f"import {name:>5}: {1000 * elapsed:7.0f} ms (median of {N_IMPORTS}), heavy modules loaded: {', '.join(loaded) or 'none'}")
+
+    legacy, cached = legacy_static(), cached_static()
+    assert legacy[0] == cached[0] and legacy[1] == cached[1] and tuple(legacy[2]) == cached[2] and legacy[3:] == cached[3:]
+    print(f"static assets and language lists per rerun: {1e6 * per_call(legacy_static):.0f} us before, {1e6 * per_call(cached_static):.1f} us cached")
+
+    first, times = rerun_times()
+    print(
+        f"script run: first {1000 * first:.0f} ms, reruns p50 {1000 * np.percentile(times, 50):.1f} ms, "
+        f"p95 {1000 * np.percentile(times, 95):.1f} ms ({N_RERUNS} reruns)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# Sessions per process: two threads per session (ThreadManager) vs tasks on a shared event loop (AsyncThreadManager).
+# Run from the repository root: python -m benchmarks.bench_async_engine
+import threading
+import time
+
+import numpy as np
+
+import thread_manager
+from async_engine import AsyncThreadManager
+from microphone_stream import AudioProcessor
+from thread_manager import ThreadManager
+from utils.metrics import LatencyStats
+from utils.translation_cache import TranslationCache
+from benchmarks.fakes import (
+    FakeSpeechClient, FakeTranslationClient, FakeSpeechAsyncClient, FakeTranslationAsyncClient, encode_words, word_name,
+)
+
+
+SESSION_COUNTS = [10, 50, 200]
+N_WORDS = 8
+WORD_DURATION = 0.3
+FRAME_DURATION = 0.02
+STT_LATENCY = 0.02
+TRANSL_LATENCY = 0.05
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def run(engine, n_sessions):
+    thread_manager.translation_cache = TranslationCache()
+    if engine is AsyncThreadManager:
+        speech_client, transl_client = FakeSpeechAsyncClient(latency=STT_LATENCY), FakeTranslationAsyncClient(TRANSL_LATENCY)
+    else:
+        speech_client, transl_client = FakeSpeechClient(latency=STT_LATENCY), FakeTranslationClient(TRANSL_LATENCY)
+
+    processors = [AudioProcessor(vad=False) for _ in range(n_sessions)]
+    threads_before = threading.active_count()
+    rss_before = rss_mb()
+    managers = [
+        engine("en-US", "fr-FR", processor, transc_client=speech_client, transl_client=transl_client)
+        for processor in processors
+    ]
+    for manager in managers:
+        manager.start()
+
+    # one feeder for all the sessions, in real time, followed by silence to close the last sentence
+    audio = np.concatenate([encode_words(N_WORDS, WORD_DURATION), np.zeros(int(0.5 * thread_manager.SR), dtype=np.float32)])
+    frame_len = int(FRAME_DURATION * thread_manager.SR)
+    cpu_start, start = time.process_time(), time.time()
+    late_frames = 0
+    for n, i in enumerate(range(0, len(audio), frame_len)):
+        for processor in processors:
+            processor.fill_buffer(audio[i:i + frame_len])
+        delay = start + (n + 1) * FRAME_DURATION - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            late_frames += 1
+    time.sleep(0.5)
+    cpu = time.process_time() - cpu_start
+
+    engine_threads = threading.active_count() - threads_before
+    rss = rss_mb() - rss_before
+    last_word = word_name(N_WORDS)
+    complete = sum(1 for m in managers if m.output_transl[-1:] == [last_word] and m.output_stt[-1:] == [last_word])
+
+    latency = LatencyStats()
+    for manager in managers:
+        for value in manager.transl_latency._values:
+            latency.add(value)
+
+    for manager, processor in zip(managers, processors):
+        manager.stop()
+        processor.stop()
+    time.sleep(0.2)
+
+    return {
+        "threads": engine_threads,
+        "rss": rss,
+        "cpu": cpu,
+        "complete": complete / n_sessions,
+        "late": late_frames,
+        "latency": latency.summary(),
+    }
+
+
+def main():
+    print(f"{'engine':>8} {'sessions':>8} {'threads':>8} {'RSS MB':>7} {'CPU s':>6} {'complete':>9} {'late':>5} {'transl p50':>11} {'p95':>7}")
+    for n_sessions in SESSION_COUNTS:
+        for name, engine in [("threads", ThreadManager), ("asyncio", AsyncThreadManager)]:
+            r = run(engine, n_sessions)
+            print(
+                f"{name:>8} {n_sessions:>8} {r['threads']:>8} {r['rss']:>7.1f} {r['cpu']:>6.2f} {r['complete']:>9.0%} {r['late']:>5}"
+                f" {1000 * r['latency']['p50']:>9.0f}ms {1000 * r['latency']['p95']:>5.0f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
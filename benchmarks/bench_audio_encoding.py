@@ -0,0 +1,59 @@
+# Bytes sent to Speech-to-Text per second of audio and encoder CPU cost per session, for each AUDIO_ENCODING,
+# on synthesized speech sent chunk by chunk as the request generator does. The encoded streams are decoded back
+# with PyAV to check them (FLAC must be lossless).
+# Run from the repository root: python -m benchmarks.bench_audio_encoding
+import io
+import time
+
+import av
+import numpy as np
+
+from utils.audio_encoder import ENCODERS, create_encoder
+from utils.parameters import SR, CHUNK
+from benchmarks.replay import synthesize_speech
+
+
+UPLINK = 2_000_000  # bits per second of a shared cellular uplink
+N_REPEATS = 5
+
+
+def encode(encoding, pcm):
+    encoder = create_encoder(encoding)
+    chunks = []
+    start = time.process_time()
+    for i in range(0, len(pcm) - CHUNK + 1, CHUNK):
+        chunks.append(encoder.encode(pcm[i:i + CHUNK].tobytes()))
+    return b"".join(chunks), time.process_time() - start
+
+
+def check(encoding, data, pcm):
+    if encoding == "LINEAR16":
+        return np.array_equal(np.frombuffer(data, dtype=np.int16), pcm[:len(data) // 2])
+    with av.open(io.BytesIO(data)) as container:
+        stream = container.streams.audio[0]
+        decoded = np.concatenate([frame.to_ndarray().reshape(-1) for frame in container.decode(stream)])
+        duration = len(decoded) / stream.codec_context.sample_rate
+    if encoding == "FLAC":
+        return np.array_equal(decoded, pcm[:len(decoded)])
+    # the encoder keeps its lookahead (a few ms) until the next chunk
+    return abs(duration - len(pcm) // CHUNK * CHUNK / SR) < 0.05
+
+
+def main():
+    samples, _, _ = synthesize_speech(n_sentences=12, sample_rate=SR, channels=1)
+    pcm = samples[0]
+    audio_duration = len(pcm) // CHUNK * CHUNK / SR
+    print(f"{audio_duration:.1f} s of speech, {CHUNK / SR * 1000:.0f} ms chunks, uplink {UPLINK / 1e6:.0f} Mbit/s\n")
+
+    for encoding in ENCODERS:
+        data, cpu = min((encode(encoding, pcm) for _ in range(N_REPEATS)), key=lambda result: result[1])
+        bitrate = 8 * len(data) / audio_duration
+        print(
+            f"{encoding:>9}: {len(data) / audio_duration / 1000:6.1f} kB/s ({bitrate / 1000:6.1f} kbit/s) | "
+            f"encoder CPU {100 * cpu / audio_duration:5.2f} % of a core per session | "
+            f"sessions per uplink {UPLINK / bitrate:5.0f} | check {'ok' if check(encoding, data, pcm) else 'FAILED'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# API calls and CPU time against the number of viewers: one ThreadManager per viewer vs one broadcast session.
+# The cross-session dispatcher already merges the calls of the viewers of a same language, the saving shows in the
+# characters sent (what the Translation API bills).
+# Run from the repository root: python -m benchmarks.bench_broadcast
+import time
+
+import thread_manager
+from broadcast import BroadcastSession
+from microphone_stream import AudioProcessor
+from thread_manager import ThreadManager
+from utils.translation_cache import TranslationCache
+from benchmarks.fakes import FakeSpeechClient, FakeTranslationClient, encode_words
+
+
+VIEWER_COUNTS = [1, 5, 20]
+TARGET_LANGUAGES = ["fr-FR", "de-DE", "es-ES", "it-IT"]
+N_WORDS = 12
+WORD_DURATION = 0.25
+FRAME_DURATION = 0.02
+
+
+def feed(processors):
+    audio = encode_words(N_WORDS, WORD_DURATION)
+    frame_len = int(FRAME_DURATION * thread_manager.SR)
+    for i in range(0, len(audio), frame_len):
+        for processor in processors:
+            processor.fill_buffer(audio[i:i + frame_len])
+        time.sleep(FRAME_DURATION)
+    time.sleep(0.3)
+
+
+def run_per_viewer(n_viewers, speech_client, transl_client):
+    processors = [AudioProcessor(vad=False) for _ in range(n_viewers)]
+    managers = [
+        ThreadManager("en-US", TARGET_LANGUAGES[i % len(TARGET_LANGUAGES)], processor, transc_client=speech_client, transl_client=transl_client)
+        for i, processor in enumerate(processors)
+    ]
+    for manager in managers:
+        manager.start()
+
+    feed(processors)
+
+    for manager, processor in zip(managers, processors):
+        manager.stop()
+        processor.stop()
+
+
+def run_broadcast(n_viewers, speech_client, transl_client):
+    processor = AudioProcessor(vad=False)
+    session = BroadcastSession("bench", "en-US", processor, transc_client=speech_client, transl_client=transl_client)
+    viewers = [session.subscribe(TARGET_LANGUAGES[i % len(TARGET_LANGUAGES)]) for i in range(n_viewers)]
+    session.start()
+
+    feed([processor])
+
+    for viewer in viewers:
+        viewer.stop()
+    session.stop()
+    processor.stop()
+
+
+def main():
+    for n_viewers in VIEWER_COUNTS:
+        for name, run in [("per viewer", run_per_viewer), ("broadcast", run_broadcast)]:
+            # no translation cache: the viewers of a same language would otherwise share their translations
+            # through it, hiding what the broadcast session saves
+            thread_manager.translation_cache = TranslationCache(max_size=0, path=None)
+            speech_client, transl_client = FakeSpeechClient(), FakeTranslationClient(latency=0.02)
+
+            cpu0 = time.process_time()
+            run(n_viewers, speech_client, transl_client)
+            cpu = time.process_time() - cpu0
+
+            print(f"{n_viewers:3d} viewers | {name:>10}: {speech_client.calls:3d} STT streams | "
+                  f"{transl_client.calls:5d} translate calls | {transl_client.chars:6d} chars translated | cpu {cpu:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# Audio buffering of a session whose STT stream stalls (stops reading its requests) for a few seconds:
+# unbounded queue and requests as before vs the bounded stream queues with each overflow policy and the stall check.
+# Reports the peak audio queued for the streams, the largest StreamingRecognizeRequest, the chunks dropped,
+# the stalls detected, the words transcribed and the lag of the last words behind the live audio.
+# Run from the repository root: python -m benchmarks.bench_buffers
+import time
+
+import numpy as np
+
+import thread_manager
+from microphone_stream import AudioProcessor
+from thread_manager import ThreadManager
+from utils.audio_queue import AudioQueue
+from utils.session_monitor import session_monitor
+from utils.parameters import SR, CHUNK, STT_MAX_REQUEST_BYTES
+from benchmarks.fakes import StallingSpeechClient, FakeTranslationClient, encode_words, word_name
+
+
+N_WORDS = 60
+WORD_DURATION = 0.3
+FRAME_DURATION = 0.02
+STALL_AFTER, STALL_DURATION = 3, 8
+STALL_TIMEOUT = 2           # instead of STT_STALL_TIMEOUT, for a short run
+CHECK_INTERVAL = 0.25
+QUEUE_MAX_TIME = 1.5        # instead of AUDIO_QUEUE_MAX_TIME, so that the queue overflows before the stall is detected
+LIVE_TIME = 0.5
+MODES = ["unbounded", "drop_oldest", "drop_newest", "skip_to_live"]
+
+
+class UnboundedQueue(AudioQueue):
+    def __init__(self):
+        super().__init__(max_time=float("inf"), max_bytes=float("inf"))
+
+
+class BenchAudioProcessor(AudioProcessor):
+    # keeps the stream queues it creates, with the settings of the mode
+    def __init__(self, mode):
+        super().__init__(vad=False)
+        self.pipeline.stop()
+        self.mode = mode
+        self.queues = []
+
+    def subscribe(self, since=None, buffer=None):
+        if buffer is None:
+            buffer = UnboundedQueue() if self.mode == "unbounded" else AudioQueue(QUEUE_MAX_TIME, policy=self.mode, live_time=LIVE_TIME)
+            self.queues.append(buffer)
+        return super().subscribe(since, buffer)
+
+    def generator(self, buffer, max_bytes=STT_MAX_REQUEST_BYTES):
+        # the whole backlog was sent in one request before
+        return super().generator(buffer, float("inf") if self.mode == "unbounded" else max_bytes)
+
+
+def run(mode):
+    thread_manager.STT_STALL_TIMEOUT = float("inf") if mode == "unbounded" else STALL_TIMEOUT
+    processor = BenchAudioProcessor(mode)
+    speech_client = StallingSpeechClient(STALL_AFTER, STALL_DURATION)
+    session = ThreadManager("en-US", "fr-FR", processor, transc_client=speech_client, transl_client=FakeTranslationClient())
+    session.start()
+
+    audio = np.concatenate([encode_words(N_WORDS, WORD_DURATION), np.zeros(SR // 2, dtype=np.float32)])
+    samples_per_word = int(WORD_DURATION * SR)
+    frame_len = int(FRAME_DURATION * SR)
+    filled, seen, peak_memory = {}, {}, 0
+
+    start = time.perf_counter()
+    for n, i in enumerate(range(0, len(audio), frame_len)):
+        processor.fill_buffer(audio[i:i + frame_len])
+        now = time.perf_counter()
+        for k in range(i // samples_per_word, min(N_WORDS, (i + frame_len) // samples_per_word + 1)):
+            if k * samples_per_word + CHUNK <= i + frame_len:
+                filled.setdefault(word_name(k + 1), now)
+        for word in session.output_stt:
+            seen.setdefault(word, now)
+        peak_memory = max(peak_memory, sum(session.memory.values()))
+        time.sleep(max(0, start + (n + 1) * FRAME_DURATION - time.perf_counter()))
+
+    # the unbounded queue is only sent once the stall is over
+    deadline = time.perf_counter() + STALL_AFTER + STALL_DURATION
+    while time.perf_counter() < deadline and word_name(N_WORDS) not in seen:
+        for word in session.output_stt:
+            seen.setdefault(word, time.perf_counter())
+        time.sleep(0.01)
+
+    session.stop()
+    session.join(1)
+    processor.stop()
+
+    # lag of the words of the last second of audio
+    last_words = [word_name(k) for k in range(N_WORDS - int(1 / WORD_DURATION), N_WORDS + 1)]
+    lags = [seen[word] - filled[word] for word in last_words if word in seen]
+    return {
+        "peak_queued": max(queue.stats["max_bytes"] for queue in processor.queues),
+        "max_request": speech_client.max_request,
+        "dropped": sum(queue.stats["dropped"] for queue in processor.queues),
+        "stalls": session.stream_stats["stalls"],
+        "words": len(filled.keys() & seen.keys()) / N_WORDS,
+        "lag": max(lags) if lags else float("nan"),
+        "peak_memory": peak_memory,
+    }
+
+
+def main():
+    session_monitor.interval = CHECK_INTERVAL
+    print(
+        f"{N_WORDS * WORD_DURATION:.0f} s of speech, the STT stream stalls after {STALL_AFTER} s for {STALL_DURATION} s "
+        f"(stall check after {STALL_TIMEOUT} s, queues of {QUEUE_MAX_TIME} s, {LIVE_TIME} s kept when skipping to live)"
+    )
+    print("        mode | peak queued (kB) | largest request (kB) | dropped chunks | stalls | words seen | lag of the last words (s) | peak session buffers (kB)")
+    for mode in MODES:
+        result = run(mode)
+        print(
+            f"{mode:>12} | {result['peak_queued'] / 1000:16.1f} | {result['max_request'] / 1000:20.1f} | {result['dropped']:14d} | "
+            f"{result['stalls']:6d} | {100 * result['words']:8.1f} % | {result['lag']:25.2f} | {result['peak_memory'] / 1000:25.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# ThreadManager creation time on startup and reruns: one client per session vs the shared client pool.
+# Stub clients simulate the gRPC channel setup and credential loading.
+# Also checks that the sessions using a client discarded as unhealthy switch to the new one, and that it is then closed.
+# Run from the repository root: python -m benchmarks.bench_client_pool
+import time
+from types import SimpleNamespace
+
+import thread_manager
+from thread_manager import ThreadManager
+from utils.client_pool import ClientPool
+from benchmarks.fakes import StubAudioProcessor
+
+
+N_RERUNS = 20
+CLIENT_SETUP_TIME = 0.05
+
+
+class StubClient:
+    def __init__(self):
+        time.sleep(CLIENT_SETUP_TIME)
+        self.transport = SimpleNamespace(closed=False)
+        self.transport.close = lambda: setattr(self.transport, "closed", True)
+
+
+def rerun(manager_factory):
+    # what app.py does on each script run: stop the previous session and create a new one
+    timings, manager = [], None
+    for _ in range(N_RERUNS):
+        t0 = time.perf_counter()
+        if manager is not None:
+            manager.stop()
+        manager = manager_factory()
+        timings.append(time.perf_counter() - t0)
+    manager.stop()
+    return timings
+
+
+def main():
+    per_session = rerun(lambda: ThreadManager("en-US", "fr-FR", StubAudioProcessor(), transc_client=StubClient(), transl_client=StubClient()))
+
+    thread_manager.client_pool = pool = ClientPool()
+    pool.register("speech", StubClient)
+    pool.register("translate", StubClient)
+    pooled = rerun(lambda: ThreadManager("en-US", "fr-FR", StubAudioProcessor()))
+    pool.shutdown()
+
+    for name, timings in [("per session", per_session), ("pooled", pooled)]:
+        print(f"{name:>12}: startup {timings[0] * 1000:7.1f} ms | "
+              f"rerun {sum(timings[1:]) / (len(timings) - 1) * 1000:7.1f} ms")
+
+    # two sessions share a client that fails CLIENT_MAX_ERRORS times in a row
+    thread_manager.client_pool = pool = ClientPool()
+    pool.register("speech", StubClient)
+    pool.register("translate", StubClient)
+    managers = [ThreadManager("en-US", "fr-FR", StubAudioProcessor()) for _ in range(2)]
+    broken = managers[0].transl_client
+    for _ in range(pool.max_errors):
+        managers[0].report_client("translate", success=False)
+    closed_while_used = broken.transport.closed
+    managers[1].report_client("translate", success=False)
+    renewed = all(manager.transl_client is not broken for manager in managers)
+    for manager in managers:
+        manager.stop()
+    print(f"unhealthy client: sessions renewed {renewed} | closed while used {closed_while_used} | closed once renewed {broken.transport.closed}")
+    assert renewed and not closed_while_used and broken.transport.closed
+    pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
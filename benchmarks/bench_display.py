@@ -0,0 +1,62 @@
+# Subtitle pane rendering: chained str.replace + re.sub vs precompiled template.
+# Also checks that both produce byte-identical HTML.
+# Run from the repository root: python -m benchmarks.bench_display
+import re
+import time
+
+from utils.parameters import REFRESH_RATE_SLOW
+from web.display import TEMPLATE, get_html_subt, render_subt
+
+
+N_RENDERS = 20000
+
+
+def legacy_get_html_subt(prev_subt, subt, line_scroll, subt_type, subt_name):
+    html = TEMPLATE
+
+    html = html.replace("{{SUBT_NAME}}", subt_name)
+    html = html.replace("{{SUBT_TYPE}}", subt_type)
+    html = html.replace("{{ANIM_DURATION}}", str(REFRESH_RATE_SLOW))
+    html = html.replace("{{ANIMATE_CLASS}}", "animate" if line_scroll else "")
+    html = html.replace("{{PREV_SUBT}}", prev_subt if len(prev_subt) > 0 else "▪▪▪")
+    html = html.replace("{{SUBT}}", subt if len(subt) > 0 else "▪▪▪")
+
+    return re.sub(r'^[ \t]+', '', html, flags=re.MULTILINE)
+
+
+def inputs(n):
+    words = "bonjour à tous et bienvenue dans cette présentation sur la traduction en temps réel".split(" ")
+    for i in range(n):
+        subt = " ".join(words[: i % len(words)])
+        yield (" ".join(words[-5:]) if i % 3 else "", subt, i % 7 == 0, "transc" if i % 2 else "transl",
+               "Transcription")
+
+
+def check_golden():
+    cases = list(inputs(200)) + [("", "", False, "transc", "Transcription"), ("a\n    b", "  c", True, "transl", "Translation")]
+    for args in cases:
+        assert get_html_subt(*args) == legacy_get_html_subt(*args), args
+
+
+def bench(render, cases):
+    t0 = time.perf_counter()
+    for args in cases:
+        render(*args)
+    return len(cases) / (time.perf_counter() - t0)
+
+
+def main():
+    check_golden()
+
+    # the UI re-renders the same panes most of the time
+    cases = [args for args in inputs(N_RENDERS // 10) for _ in range(10)]
+    uncached = [args[:2] + (bool(args[2]),) + args[3:] for args in cases]
+    render_subt.cache_clear()
+
+    print(f"        legacy: {bench(legacy_get_html_subt, cases):10,.0f} renders/s")
+    print(f"      compiled: {bench(render_subt.__wrapped__, uncached):10,.0f} renders/s")
+    print(f"compiled+cache: {bench(get_html_subt, cases):10,.0f} renders/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# Frames processed per second by AudioProcessor.fill_buffer: list-based buffer vs RingBuffer.
+# Run from the repository root: python -m benchmarks.bench_fill_buffer
+import queue
+import time
+
+import numpy as np
+
+from utils.parameters import SR, CHUNK, RING_BUFFER_SIZE
+from utils.ring_buffer import RingBuffer
+
+
+FRAME_SAMPLES = SR // 50  # 20 ms WebRTC frame after resampling
+N_FRAMES = 20000
+
+
+class ListFill:
+    def __init__(self):
+        self.buffer = queue.Queue()
+        self._temp_buffer = []
+
+    def fill_buffer(self, audio):
+        audio_int16 = (audio * 32767).astype(np.int16)
+        self._temp_buffer.extend(audio_int16)
+
+        if len(self._temp_buffer) >= CHUNK:
+            segment_np = np.array(self._temp_buffer, dtype=np.int16)
+            self.buffer.put(segment_np.tobytes())
+            self._temp_buffer = []
+
+
+class RingFill:
+    def __init__(self):
+        self.buffer = queue.Queue()
+        self._temp_buffer = RingBuffer(RING_BUFFER_SIZE)
+
+    def fill_buffer(self, audio):
+        audio_int16 = (audio * 32767).astype(np.int16)
+        self._temp_buffer.write(audio_int16)
+
+        while len(self._temp_buffer) >= CHUNK:
+            self.buffer.put(self._temp_buffer.read_bytes(CHUNK))
+
+
+def run(processor, frames):
+    t0 = time.perf_counter()
+    for frame in frames:
+        processor.fill_buffer(frame)
+    return len(frames) / (time.perf_counter() - t0)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    frames = [rng.uniform(-0.5, 0.5, FRAME_SAMPLES).astype(np.float32) for _ in range(N_FRAMES)]
+
+    for name, cls in [("list", ListFill), ("ring", RingFill)]:
+        fps = run(cls(), frames)
+        print(f"{name:>5}: {fps:12,.0f} frames/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# Replays WAV files through the whole pipeline with fake services and compares the metrics to the stored baselines.
+# Run from the repository root:
+#   python -m benchmarks.bench_replay                  (synthesized speech at several sample rates / layouts)
+#   python -m benchmarks.bench_replay file.wav ...     (a file.json script next to the WAV gives the STT responses)
+#   python -m benchmarks.bench_replay --save           (store the results as the new baselines)
+import argparse
+import json
+from pathlib import Path
+import sys
+import tempfile
+
+from benchmarks.replay import replay, load_wav, write_wav, load_script, synthesize_speech, to_frames
+
+
+BASELINES_PATH = Path(__file__).parent / "baselines.json"
+
+# metrics compared to the baselines, with the direction of a regression and the absolute slack
+CHECKED_METRICS = {
+    "dsp_x_realtime": ("lower", 0),
+    "stt_to_transl_p50_ms": ("higher", 20),
+    "stt_to_transl_p95_ms": ("higher", 40),
+    "stt_calls": ("higher", 0),
+    "translate_calls": ("higher", 5),
+    "translate_chars": ("higher", 200),
+    "render_ms": ("higher", 20),
+    "cpu_s": ("higher", 0.1),
+    "memory_kb": ("higher", 256),
+    "complete": ("lower", 0),
+    "dropped_frames": ("higher", 0),
+}
+
+# synthesized audio: (sample rate, layout, sample format)
+SCENARIOS = {
+    "mono16k_s16": (16000, "mono", "int16"),
+    "stereo48k_s16": (48000, "stereo", "int16"),
+    "mono44k_flt": (44100, "mono", "float32"),
+}
+
+
+def scenarios(wav_paths):
+    if wav_paths:
+        for path in wav_paths:
+            samples, sample_rate = load_wav(path)
+            layout = "stereo" if samples.shape[0] == 2 else "mono"
+            yield f"{Path(path).stem}_{sample_rate // 1000}k_{layout}", to_frames(samples, sample_rate, layout), load_script(path, samples.shape[1] / sample_rate)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, (sample_rate, layout, dtype) in SCENARIOS.items():
+            samples, sample_rate, script = synthesize_speech(sample_rate=sample_rate, channels=2 if layout == "stereo" else 1)
+            path = Path(tmp) / f"{name}.wav"
+            write_wav(path, samples, sample_rate)
+            samples, sample_rate = load_wav(path)
+            yield name, to_frames(samples, sample_rate, layout, dtype), script
+
+
+def regressions(metrics, baseline, tolerance):
+    for metric, (direction, slack) in CHECKED_METRICS.items():
+        if metric not in baseline:
+            continue
+        value, reference = metrics[metric], baseline[metric]
+        margin = abs(reference) * tolerance + slack
+        if (direction == "higher" and value > reference + margin) or (direction == "lower" and value < reference - margin):
+            yield f"{metric}: {value:.2f} (baseline {reference:.2f})"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("wav", nargs="*", help="16-bit PCM WAV files")
+    parser.add_argument("--sessions", type=int, default=1)
+    parser.add_argument("--speed", type=float, default=10.0, help="replay speed (x real time)")
+    parser.add_argument("--vad", action="store_true", help="enable the VAD (the scripts assume all the audio is sent)")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="relative change reported as a regression")
+    parser.add_argument("--save", action="store_true", help="store the results as the baselines")
+    args = parser.parse_args()
+
+    baselines = json.loads(BASELINES_PATH.read_text()) if BASELINES_PATH.exists() else {}
+    results, failed = {}, False
+
+    for name, frames, script in scenarios(args.wav):
+        metrics = replay(frames, script, n_sessions=args.sessions, speed=args.speed, vad=args.vad)
+        # memory is measured in a second run, tracemalloc slows everything down
+        metrics["memory_kb"] = replay(frames, script, n_sessions=args.sessions, speed=args.speed, vad=args.vad, trace_memory=True)["memory_kb"]
+        key = f"{name}@{args.sessions}"
+        results[key] = metrics
+
+        print(f"\n{key} ({len(frames) * 0.02:.1f} s of audio)")
+        for metric, value in metrics.items():
+            print(f"  {metric:>22}: {value:10.2f}")
+
+        if key in baselines and not args.save:
+            found = list(regressions(metrics, baselines[key], args.tolerance))
+            for regression in found:
+                print(f"  REGRESSION {regression}")
+            failed = failed or bool(found)
+
+    if args.save:
+        baselines.update(results)
+        BASELINES_PATH.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+        print(f"\nBaselines saved to {BASELINES_PATH}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# Resampling throughput: per-frame resample_poly vs StreamingResampler.
+# Also checks that the streaming output is the same whether the audio is fed in one block or frame by frame.
+# Run from the repository root: python -m benchmarks.bench_resampler
+import time
+
+import numpy as np
+from scipy.signal import resample_poly
+
+from utils.parameters import SR
+from utils.resampler import StreamingResampler
+
+
+INPUT_RATES = [48000, 44100, 32000]
+DURATION = 10  # seconds of audio
+FRAME_MS = 20
+
+
+def stream(audio, sr_in, frame_len):
+    resampler = StreamingResampler(SR)
+    out = [resampler.process(audio[i:i + frame_len], sr_in) for i in range(0, len(audio), frame_len)]
+    out.append(resampler.flush())
+    return np.concatenate(out)
+
+
+def check_block_vs_frames(audio, sr_in, frame_len):
+    resampler = StreamingResampler(SR)
+    block = np.concatenate((resampler.process(audio, sr_in), resampler.flush()))
+    frames = stream(audio, sr_in, frame_len)
+    reference = resample_poly(audio, up=SR, down=sr_in)
+
+    assert len(block) == len(frames) == len(reference)
+    assert np.allclose(block, frames, atol=1e-6)
+    assert np.allclose(block, reference, atol=1e-5)
+
+
+def main():
+    rng = np.random.default_rng(0)
+
+    for sr_in in INPUT_RATES:
+        audio = rng.uniform(-0.5, 0.5, sr_in * DURATION).astype(np.float32)
+        frame_len = sr_in * FRAME_MS // 1000
+        check_block_vs_frames(audio, sr_in, frame_len)
+
+        t0 = time.perf_counter()
+        for i in range(0, len(audio), frame_len):
+            resample_poly(audio[i:i + frame_len], up=SR, down=sr_in)
+        t_poly = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        stream(audio, sr_in, frame_len)
+        t_stream = time.perf_counter() - t0
+
+        n_frames = len(audio) // frame_len
+        print(f"{sr_in} Hz -> {SR} Hz: resample_poly {n_frames / t_poly:10,.0f} frames/s | "
+              f"streaming {n_frames / t_stream:10,.0f} frames/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# Segmentation checks per language family and throughput on long CJK transcripts,
+# full re-segmentation of every interim result vs IncrementalSegmenter.
+# Run from the repository root: python -m benchmarks.bench_segmentation
+import random
+import sys
+import time
+
+from utils.segmentation import SpaceSegmenter, GraphemeSegmenter, DictionarySegmenter, IncrementalSegmenter, get_segmenter
+
+
+JA_WORDS = ["今日", "天気", "とても", "いい", "です", "ね", "明日", "東京", "に", "行き", "ます", "電車", "で", "会議", "が", "あり"]
+ZH_WORDS = ["今天", "天气", "很", "好", "我们", "明天", "去", "北京", "开会", "坐", "火车", "吗", "的", "人"]
+TH_WORDS = ["วันนี้", "อากาศ", "ดี", "มาก", "พรุ่งนี้", "เรา", "จะ", "ไป", "กรุงเทพ", "ประชุม", "ครับ"]
+
+CHECKS = {
+    # language family: (segmenter, text, expected tokens)
+    "latin (spaces)": (SpaceSegmenter(), "bonjour à tous", ["bonjour", "à", "tous"]),
+    "japanese (graphemes)": (GraphemeSegmenter(), "今日はiPhone15を買いました。", ["今", "日", "は", "iPhone15", "を", "買", "い", "ま", "し", "た。"]),
+    "japanese (dictionary)": (DictionarySegmenter(JA_WORDS), "今日は天気がいいですね。", ["今日", "は", "天気", "が", "いい", "です", "ね。"]),
+    "chinese (graphemes)": (GraphemeSegmenter(), "我们去北京，好吗？", ["我", "们", "去", "北", "京，", "好", "吗？"]),
+    "chinese (dictionary)": (DictionarySegmenter(ZH_WORDS), "我们明天去北京开会。", ["我们", "明天", "去", "北京", "开会。"]),
+    "thai (graphemes)": (GraphemeSegmenter(), "ดีมาก", ["ดี", "ม", "า", "ก"]),
+    "thai (dictionary)": (DictionarySegmenter(TH_WORDS), "วันนี้อากาศดีมาก ครับ", ["วันนี้", "อากาศ", "ดี", "มาก ", "ครับ"]),
+    "combining marks": (GraphemeSegmenter(), "\u3055\u3099くら e\u0301", ["\u3055\u3099", "く", "ら ", "e\u0301"]),
+    "emoji": (GraphemeSegmenter(), "猫🐈‍⬛🇯🇵", ["猫", "🐈‍⬛", "🇯🇵"]),
+}
+
+N_CHARS = 20000
+CHARS_PER_RESPONSE = 3
+INTERIM_LEN = 2000
+
+
+def random_text(words, n_chars, rng):
+    text = ""
+    while len(text) < n_chars:
+        text += rng.choice(words) + rng.choice(["", "", "", "、", "。", "iPhone", "2024"])
+    return text
+
+
+def check_incremental(segmenter, words, rng):
+    # random edits of a growing interim result, as the STT revises its last words
+    incremental = IncrementalSegmenter(segmenter)
+    text = ""
+    for _ in range(2000):
+        if rng.random() < 0.3:
+            text = text[:rng.randint(0, len(text))]
+        text += random_text(words, rng.randint(1, 6), rng)
+        if incremental.split(text) != segmenter.segment(text):
+            return False
+    return True
+
+
+def throughput(segment, texts):
+    start = time.perf_counter()
+    n_tokens = sum(len(segment(text)) for text in texts)
+    return n_tokens / (time.perf_counter() - start)
+
+
+def main():
+    rng = random.Random(0)
+    get_segmenter("ja-JP")  # unicode classes are built on first use
+
+    print("checks:")
+    failed = False
+    for family, (segmenter, text, expected) in CHECKS.items():
+        tokens = segmenter.segment(text)
+        ok = tokens == expected and segmenter.join(tokens) == text
+        failed = failed or not ok
+        print(f"  {family:>26}: {'ok' if ok else f'FAILED {tokens}'}")
+
+    for name, segmenter, words in [
+        ("spaces", SpaceSegmenter(), ["the ", "weather ", "is ", "nice"]),
+        ("graphemes", GraphemeSegmenter(), JA_WORDS),
+        ("dictionary ja", DictionarySegmenter(JA_WORDS), JA_WORDS),
+        ("dictionary th", DictionarySegmenter(TH_WORDS), TH_WORDS),
+    ]:
+        ok = check_incremental(segmenter, words, rng)
+        failed = failed or not ok
+        print(f"  {'incremental ' + name:>26}: {'ok' if ok else 'FAILED'}")
+
+    print(f"\nlong transcript ({N_CHARS} chars, one segmentation):")
+    text = random_text(JA_WORDS, N_CHARS, rng)
+    for name, segmenter in [("graphemes", GraphemeSegmenter()), ("dictionary", DictionarySegmenter(JA_WORDS))]:
+        print(f"  {name:>11}: {throughput(segmenter.segment, [text]) / 1e6:6.2f} M tokens/s")
+
+    print(f"\ngrowing interim result ({INTERIM_LEN} chars, +{CHARS_PER_RESPONSE} chars per response):")
+    interims = [text[:n] for n in range(CHARS_PER_RESPONSE, INTERIM_LEN, CHARS_PER_RESPONSE)]
+    for name, segmenter in [("graphemes", GraphemeSegmenter()), ("dictionary", DictionarySegmenter(JA_WORDS))]:
+        full = throughput(segmenter.segment, interims)
+        incremental = throughput(IncrementalSegmenter(segmenter).split, interims)
+        print(f"  {name:>11}: full {full / 1e6:6.2f} M tokens/s | incremental {incremental / 1e6:6.2f} M tokens/s")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# Checks the STT session handoff against a fake SpeechClient enforcing a short stream limit:
+# every word must be transcribed exactly once across sessions, and in silence (no response to hand off on)
+# the streams must be reopened before the limit without any client error.
+# Run from the repository root: python -m benchmarks.bench_stt_handoff
+import time
+
+import numpy as np
+
+import thread_manager
+from microphone_stream import AudioProcessor
+from thread_manager import ThreadManager
+from benchmarks.fakes import FakeSpeechClient, FakeTranslationClient, encode_words, word_name
+
+
+STREAMING_LIMIT = 3
+STREAM_HANDOFF_TIME = 1
+N_WORDS = 60
+WORD_DURATION = 0.3
+FRAME_DURATION = 0.02
+SILENCE_DURATION = 10
+CHECK_INTERVAL = 0.2
+
+
+def speech():
+    speech_client = FakeSpeechClient(stream_limit=STREAMING_LIMIT + 1)
+    processor = AudioProcessor(vad=False)   # the fake audio encodes words, not speech
+    manager = ThreadManager("en-US", "fr-FR", processor, transc_client=speech_client, transl_client=FakeTranslationClient())
+    manager.thread_stt.start()
+
+    # feed the audio in real time, followed by one second of silence to close the last sentence
+    audio = encode_words(N_WORDS, WORD_DURATION)
+    frame_len = int(FRAME_DURATION * thread_manager.SR)
+    for i in range(0, len(audio), frame_len):
+        processor.fill_buffer(audio[i:i + frame_len])
+        time.sleep(FRAME_DURATION)
+    processor.fill_buffer(0 * audio[: thread_manager.SR])
+    time.sleep(0.5)
+
+    manager.stop()
+    processor.stop()
+    manager.thread_stt.join(timeout=2)
+
+    expected = [word_name(i + 1) for i in range(N_WORDS)]
+    transcript = manager.transcript.prefix
+    missing = [w for w in expected if w not in transcript]
+    duplicated = [w for w in set(transcript) if transcript.count(w) > 1]
+
+    in_order = transcript == sorted(transcript, key=expected.index)
+    print(f"speech: {speech_client.calls} sessions")
+    print(f"  words: {len(transcript)}/{N_WORDS} | missing: {missing} | duplicated: {sorted(duplicated)}")
+    print(f"  in order: {in_order}")
+    assert not missing and not duplicated and in_order
+
+
+def silence():
+    speech_client = FakeSpeechClient(stream_limit=STREAMING_LIMIT + 1)
+    processor = AudioProcessor(vad=False)
+    manager = ThreadManager("en-US", "fr-FR", processor, transc_client=speech_client, transl_client=FakeTranslationClient())
+    errors = []
+    manager.report_client = lambda kind, success: errors.append(kind) if not success else None
+    manager.thread_stt.start()
+
+    # no response ever arrives: the session monitor has to close the streams reaching the limit
+    frame_len = int(FRAME_DURATION * thread_manager.SR)
+    last_check = time.time()
+    for _ in range(int(SILENCE_DURATION / FRAME_DURATION)):
+        processor.fill_buffer(np.zeros(frame_len, dtype=np.float32))
+        time.sleep(FRAME_DURATION)
+        if time.time() - last_check > CHECK_INTERVAL:
+            manager.check_stall()
+            last_check = time.time()
+
+    manager.stop()
+    processor.stop()
+    manager.thread_stt.join(timeout=2)
+
+    print(f"silence: {speech_client.calls} sessions in {SILENCE_DURATION} s | reopened at the limit: {manager.stream_stats['expired']} | client errors: {len(errors)}")
+    assert speech_client.calls >= SILENCE_DURATION // STREAMING_LIMIT and not errors
+
+
+def main():
+    thread_manager.STREAMING_LIMIT = STREAMING_LIMIT
+    thread_manager.STREAM_HANDOFF_TIME = STREAM_HANDOFF_TIME
+    thread_manager.TIME_BETWEEN_SENTENCES = float("inf")    # keep every final transcript in the prefix
+
+    speech()
+    silence()
+
+
+if __name__ == "__main__":
+    main()
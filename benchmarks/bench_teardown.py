@@ -0,0 +1,137 @@
+# Session teardown with a translation and an STT stream in flight, and the time to the first subtitle after
+# a language switch: stop + new session (previous reruns) vs reconfigure() of the running session.
+# Run from the repository root: python -m benchmarks.bench_teardown
+import threading
+import time
+
+import numpy as np
+
+import thread_manager
+from async_engine import AsyncThreadManager
+from microphone_stream import AudioProcessor
+from thread_manager import ThreadManager
+from utils.parameters import SR, TEARDOWN_TIMEOUT
+from utils.translation_cache import TranslationCache
+from benchmarks.fakes import (
+    FakeSpeechClient, FakeTranslationClient, FakeSpeechAsyncClient, FakeTranslationAsyncClient, encode_words,
+)
+
+
+FRAME_DURATION = 0.02
+WORD_DURATION = 0.3
+STT_LATENCY = 0.02
+SLOW_TRANSL_LATENCY = 3.0
+TRANSL_LATENCY = 0.05
+WARMUP = 1.5
+N_TRIALS = 3
+
+
+class Feeder:
+    # real time audio of consecutive words, as the WebRTC frames would fill the buffer
+    def __init__(self, processor):
+        self.processor = processor
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        audio = encode_words(1000, WORD_DURATION)
+        frame_len = int(FRAME_DURATION * SR)
+        start = time.time()
+        for n, i in enumerate(range(0, len(audio), frame_len)):
+            if not self.running:
+                break
+            self.processor.fill_buffer(audio[i:i + frame_len])
+            time.sleep(max(0, start + (n + 1) * FRAME_DURATION - time.time()))
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+
+
+def clients(engine, transl_latency):
+    if engine is AsyncThreadManager:
+        return FakeSpeechAsyncClient(latency=STT_LATENCY), FakeTranslationAsyncClient(transl_latency)
+    return FakeSpeechClient(latency=STT_LATENCY), FakeTranslationClient(transl_latency)
+
+
+def wait_for(condition, timeout=5):
+    start = time.perf_counter()
+    while not condition():
+        if time.perf_counter() - start > timeout:
+            return float("nan")
+        time.sleep(0.002)
+    return time.perf_counter() - start
+
+
+def teardown(engine):
+    # stop() while a (slow) translation is waited on and the STT stream is open
+    thread_manager.translation_cache = TranslationCache()
+    processor = AudioProcessor(vad=False)
+    feeder = Feeder(processor)
+    speech_client, transl_client = clients(engine, SLOW_TRANSL_LATENCY)
+    manager = engine("en-US", "fr-FR", processor, transc_client=speech_client, transl_client=transl_client)
+    manager.start()
+    time.sleep(WARMUP)
+
+    start = time.perf_counter()
+    manager.stop()
+    alive = manager.join(TEARDOWN_TIMEOUT)
+    elapsed = time.perf_counter() - start
+
+    feeder.stop()
+    processor.stop()
+    return elapsed, alive
+
+
+def language_switch(engine, change, reconfigure):
+    # time from the switch to the first subtitle in the new language
+    thread_manager.translation_cache = TranslationCache()
+    processor = AudioProcessor(vad=False)
+    feeder = Feeder(processor)
+    speech_client, transl_client = clients(engine, TRANSL_LATENCY)
+    manager = engine("en-US", "fr-FR", processor, transc_client=speech_client, transl_client=transl_client)
+    manager.start()
+    time.sleep(WARMUP)
+
+    lang_audio, lang_transl = ("en-GB", "fr-FR") if change == "audio" else ("en-US", "de-DE")
+    start = time.perf_counter()
+    if reconfigure:
+        manager.reconfigure(lang_audio, lang_transl)
+    else:
+        manager.stop()
+        manager.join(TEARDOWN_TIMEOUT)
+        manager = engine(lang_audio, lang_transl, processor, transc_client=speech_client, transl_client=transl_client)
+        manager.start()
+    setup = time.perf_counter() - start
+
+    if change == "audio":
+        elapsed = setup + wait_for(lambda: manager.output_stt)
+    else:
+        elapsed = setup + wait_for(lambda: f"[{lang_transl}]" in manager.output_transl)
+
+    manager.stop()
+    manager.join(TEARDOWN_TIMEOUT)
+    feeder.stop()
+    processor.stop()
+    return elapsed
+
+
+def main():
+    print(f"teardown with a {SLOW_TRANSL_LATENCY:.0f} s translation in flight (deadline {TEARDOWN_TIMEOUT} s):")
+    for engine in [ThreadManager, AsyncThreadManager]:
+        results = [teardown(engine) for _ in range(N_TRIALS)]
+        times = sorted(1000 * elapsed for elapsed, _ in results)
+        alive = sum(len(alive) for _, alive in results)
+        print(f"  {engine.__name__:>18}: median {times[len(times) // 2]:6.1f} ms | max {times[-1]:6.1f} ms | threads left {alive}")
+
+    print("\nfirst subtitle after a language switch (median ms):")
+    for engine in [ThreadManager, AsyncThreadManager]:
+        for change in ["translation", "audio"]:
+            rebuild = np.median([language_switch(engine, change, reconfigure=False) for _ in range(N_TRIALS)])
+            reconfigure = np.median([language_switch(engine, change, reconfigure=True) for _ in range(N_TRIALS)])
+            print(f"  {engine.__name__:>18} {change:>11}: new session {1000 * rebuild:6.1f} | reconfigure {1000 * reconfigure:6.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# Stage latencies of one session fed through AudioProcessor.recv with fake services,
+# and the cost of the tracing on the audio path when it is disabled / enabled.
+# Run from the repository root: python -m benchmarks.bench_tracing
+import time
+
+import numpy as np
+
+from microphone_stream import AudioProcessor
+from thread_manager import ThreadManager
+from utils.parameters import SR
+from utils.tracing import process_tracer, format_markdown, format_prometheus
+from benchmarks.fakes import FakeFrame, FakeSpeechClient, FakeTranslationClient, encode_words
+
+
+N_WORDS = 12
+WORD_DURATION = 0.3
+FRAME_DURATION = 0.02
+STT_LATENCY = 0.05
+TRANSL_LATENCY = 0.08
+N_OVERHEAD_FRAMES = 20000
+
+
+def frames(audio):
+    frame_len = int(FRAME_DURATION * SR)
+    return [FakeFrame(audio[i:i + frame_len]) for i in range(0, len(audio), frame_len)]
+
+
+def run_session():
+    process_tracer.enabled = True
+    processor = AudioProcessor(vad=False)
+    processor.tracer.enabled = True
+    manager = ThreadManager(
+        "en-US", "fr-FR", processor,
+        transc_client=FakeSpeechClient(latency=STT_LATENCY), transl_client=FakeTranslationClient(TRANSL_LATENCY),
+    )
+    manager.start()
+
+    # real time, followed by silence to close the last sentence
+    audio = np.concatenate([encode_words(N_WORDS, WORD_DURATION), np.zeros(SR // 2, dtype=np.float32)])
+    for frame in frames(audio):
+        processor.recv(frame)
+        time.sleep(FRAME_DURATION)
+    time.sleep(0.5)
+
+    manager.stop()
+    processor.stop()
+    return processor.tracer
+
+
+def overhead(enabled):
+    # recv + DSP of each frame, run synchronously
+    processor = AudioProcessor(vad=False)
+    processor.pipeline.stop()
+    processor.tracer.enabled = enabled
+    batch = []
+    processor.pipeline.put = batch.append
+
+    audio = encode_words(N_OVERHEAD_FRAMES * int(FRAME_DURATION * SR) // int(WORD_DURATION * SR) + 1, WORD_DURATION)
+    start = time.perf_counter()
+    for frame in frames(audio)[:N_OVERHEAD_FRAMES]:
+        processor.recv(frame)
+        processor.process_frames(batch)
+        batch.clear()
+    return (time.perf_counter() - start) / N_OVERHEAD_FRAMES
+
+
+def main():
+    tracer = run_session()
+    print(format_markdown({"session": tracer, "process": process_tracer}))
+    print()
+    print("\n".join(format_prometheus().split("\n")[:6]), "\n...")
+
+    disabled = min(overhead(False) for _ in range(3))
+    enabled = min(overhead(True) for _ in range(3))
+    print(f"\nrecv + DSP per frame: disabled {disabled * 1e6:.1f} us | enabled {enabled * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
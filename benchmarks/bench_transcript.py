@@ -0,0 +1,74 @@
+# Cost per STT response of the transcript assembly during a long monologue (no final segment expires):
+# rebuilding the prefix and re-splitting the transcript on every response vs the incremental Transcript,
+# unbounded and with the words kept by the sessions (TRANSCRIPT_MAX_WORDS): the published revisions are copies,
+# so the cost still grows with the words kept, see Transcript.
+# Run from the repository root: python -m benchmarks.bench_transcript
+import time
+
+from utils.segmentation import IncrementalSegmenter, SpaceSegmenter
+from utils.transcript import Transcript
+from utils.parameters import TRANSCRIPT_MAX_WORDS
+
+
+SENTENCE_COUNTS = [100, 1000, 3000]
+WORDS_PER_SENTENCE = 12
+
+
+def responses(n_sentences):
+    # interim results growing word by word, then the final result of the sentence
+    for s in range(n_sentences):
+        words = [f"s{s}w{i}" for i in range(WORDS_PER_SENTENCE)]
+        for i in range(1, WORDS_PER_SENTENCE + 1):
+            yield " ".join(words[:i]), False
+        yield " ".join(words), True
+
+
+def rebuild(n_sentences, max_age=float("inf")):
+    # previous assembly in ThreadManager.process_response
+    latest_final_transcs, prefix_stt_output = [], []
+    output_stt = []
+    for transcript, is_final in responses(n_sentences):
+        output = transcript.split(" ")
+        if is_final:
+            latest_final_transcs.append([output, time.time()])
+            latest_final_transcs = [
+                transc_data for transc_data in latest_final_transcs
+                if time.time() - transc_data[1] <= max_age
+            ]
+            prefix_stt_output = [w for transc, _ in latest_final_transcs for w in transc]
+        output_stt = prefix_stt_output + ([] if is_final else output)
+        segments = ([transc for transc, _ in latest_final_transcs], [] if is_final else output)
+    return output_stt, segments
+
+
+def incremental(n_sentences, max_age=float("inf"), max_words=None):
+    transcript, tokenizer = Transcript(max_age, max_words), IncrementalSegmenter(SpaceSegmenter())
+    output_stt = []
+    for text, is_final in responses(n_sentences):
+        output = tokenizer.split(text)
+        if is_final:
+            transcript.add_final(output, time.time())
+        else:
+            transcript.set_interim(output)
+        output_stt, segments = transcript.output, transcript.segments
+    return output_stt, segments
+
+
+def main():
+    for n_sentences in SENTENCE_COUNTS:
+        n_responses = n_sentences * (WORDS_PER_SENTENCE + 1)
+        results = {}
+        for name, assemble in [
+            ("rebuild", rebuild),
+            ("incremental", incremental),
+            (f"incremental, {TRANSCRIPT_MAX_WORDS} words kept", lambda n: incremental(n, max_words=TRANSCRIPT_MAX_WORDS)),
+        ]:
+            start = time.perf_counter()
+            results[name] = assemble(n_sentences)
+            elapsed = time.perf_counter() - start
+            print(f"{n_sentences:>5} sentences | {name:>32}: {1e6 * elapsed / n_responses:8.1f} us/response")
+        assert results["rebuild"] == results["incremental"], "the incremental transcript differs from the rebuilt one"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# translate_text calls and request latency under load: one call per session request vs the shared dispatcher.
+# Run from the repository root: python -m benchmarks.bench_translation_batching
+import random
+import threading
+import time
+
+from utils.metrics import LatencyStats
+from utils.translation_dispatcher import TranslationDispatcher
+from benchmarks.fakes import FakeTranslationClient
+
+
+N_SESSIONS = 100
+REQUESTS_PER_SESSION = 20
+TARGET_LANGUAGES = ["fr-FR", "de-DE", "es-ES"]
+PARENT = "projects/bench/locations/global"
+
+
+def direct(client, source, target, texts):
+    response = client.translate_text(contents=texts, target_language_code=target, source_language_code=source, parent=PARENT)
+    return [translation.translated_text for translation in response.translations]
+
+
+def run(translate):
+    client = FakeTranslationClient(latency=lambda: random.uniform(0.02, 0.05))
+    latency = LatencyStats()
+
+    def session(i):
+        target = TARGET_LANGUAGES[i % len(TARGET_LANGUAGES)]
+        for j in range(REQUESTS_PER_SESSION):
+            texts = [f"session {i} sentence {j}"]
+            t0 = time.perf_counter()
+            assert translate(client, "en-US", target, texts) == [f"[{target}] {texts[0]}"]
+            latency.add(time.perf_counter() - t0)
+            time.sleep(random.uniform(0.01, 0.1))
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(N_SESSIONS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return client.calls, latency
+
+
+def main():
+    random.seed(0)
+    dispatcher = TranslationDispatcher()
+
+    for name, translate in [
+        ("direct", direct),
+        ("batched", lambda client, source, target, texts: dispatcher.translate(client, PARENT, source, target, texts)),
+    ]:
+        calls, latency = run(translate)
+        summary = latency.summary()
+        print(f"{name:>8}: {calls:5d} translate_text calls | request p50 {summary['p50'] * 1000:5.1f} ms, "
+              f"p95 {summary['p95'] * 1000:5.1f} ms")
+
+    delay = dispatcher.queue_delay.summary()
+    print(f"batch sizes: {dispatcher.batch_sizes.summary()}")
+    print(f"queueing delay: p50 {delay['p50'] * 1000:.1f} ms, p95 {delay['p95'] * 1000:.1f} ms, p99 {delay['p99'] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# Latency from a transcript update to the displayed translation: 100 ms polling loop vs event-driven trigger.
+# Run from the repository root: python -m benchmarks.bench_translation_latency
+import random
+import time
+
+import thread_manager
+from thread_manager import ThreadManager
+from utils.translation_cache import TranslationCache
+from benchmarks.fakes import FakeTranslationClient, StubAudioProcessor
+
+
+N_UPDATES = 200
+TRANSLATION_DELAY = 0.03
+POLLING_RATE = 0.1
+
+
+class PollingThreadManager(ThreadManager):
+    # translation loop as it was before transcript revisions were published
+    def translate(self):
+        prev_input = None
+        while self.running:
+            with self.stt_cond:
+                output_stt, pending_since = self.output_stt, self.first_pending_time
+                self.first_pending_time = None
+            if output_stt and output_stt != prev_input:
+                prev_input = output_stt
+                self.output_transl = self.translate_texts([" ".join(output_stt)])[0].split(" ")
+                self.transl_latency.add(time.time() - pending_since)
+            time.sleep(POLLING_RATE)
+
+
+def run(manager_cls):
+    random.seed(0)
+    thread_manager.translation_cache = TranslationCache()   # measure the API traffic without cache hits
+    transl_client = FakeTranslationClient(latency=TRANSLATION_DELAY)
+    manager = manager_cls("en-US", "fr-FR", audio_processor=StubAudioProcessor(), transc_client=object(), transl_client=transl_client)
+    manager.thread_transl.start()
+
+    cpu0 = time.process_time()
+    words = []
+    for i in range(N_UPDATES):
+        words = words + [f"w{i}"] if random.random() < 0.7 else words[:-1] + [f"w{i}"]
+        manager.publish_transcript(words, ([], words))
+        # bursts of interim results followed by pauses
+        time.sleep(random.choice([0.005, 0.01, 0.05, 0.2]))
+    time.sleep(0.3)
+    cpu = time.process_time() - cpu0
+
+    manager.stop()
+    manager.thread_transl.join()
+    return manager.transl_latency, transl_client.calls, cpu
+
+
+def main():
+    results = {}
+    for name, cls in [("polling", PollingThreadManager), ("event", ThreadManager)]:
+        latency, calls, cpu = run(cls)
+        summary = latency.summary()
+        results[name] = summary["p50"], summary["p95"], calls
+        print(f"{name:>8}: p50 {summary['p50'] * 1000:6.1f} ms | p95 {summary['p95'] * 1000:6.1f} ms | "
+              f"{calls} translate calls | cpu {cpu:.2f} s")
+
+    # a revision is translated at once when no request is in flight: the latency is well below the polling loop's,
+    # at the cost of more calls, but the revisions published during a request are still coalesced
+    (polling_p50, polling_p95, polling_calls), (event_p50, event_p95, event_calls) = results["polling"], results["event"]
+    assert event_p50 < polling_p50 / 2, f"p50 {event_p50 * 1000:.1f} ms vs {polling_p50 * 1000:.1f} ms when polling"
+    assert event_p95 < polling_p95, f"p95 {event_p95 * 1000:.1f} ms vs {polling_p95 * 1000:.1f} ms when polling"
+    assert event_calls < 0.8 * N_UPDATES, f"{event_calls} translate calls for {N_UPDATES} revisions ({polling_calls} when polling)"
+
+
+if __name__ == "__main__":
+    main()
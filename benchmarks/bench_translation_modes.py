@@ -0,0 +1,47 @@
+# Characters sent to the translation API per minute, full-transcript vs incremental translation.
+# Run from the repository root: python -m benchmarks.bench_translation_modes
+import time
+
+import thread_manager
+from microphone_stream import AudioProcessor
+from thread_manager import ThreadManager
+from utils.translation_cache import TranslationCache
+from benchmarks.fakes import FakeSpeechClient, FakeTranslationClient, encode_words
+
+
+N_WORDS = 40
+WORD_DURATION = 0.25
+FRAME_DURATION = 0.02
+
+
+def run(incremental):
+    thread_manager.INCREMENTAL_TRANSLATION = incremental
+    thread_manager.translation_cache = TranslationCache()   # measure the API traffic without cache hits
+
+    processor = AudioProcessor(vad=False)   # the fake audio encodes words, not speech
+    transl_client = FakeTranslationClient(latency=0.05)
+    manager = ThreadManager("en-US", "fr-FR", processor, transc_client=FakeSpeechClient(), transl_client=transl_client)
+    manager.start()
+
+    audio = encode_words(N_WORDS, WORD_DURATION)
+    frame_len = int(FRAME_DURATION * thread_manager.SR)
+    for i in range(0, len(audio), frame_len):
+        processor.fill_buffer(audio[i:i + frame_len])
+        time.sleep(FRAME_DURATION)
+    time.sleep(0.5)
+
+    manager.stop()
+    processor.stop()
+
+    mode = "incremental" if incremental else "full"
+    print(f"{mode:>12}: {manager.transl_chars_per_minute:10,.0f} chars/min | "
+          f"{transl_client.calls} requests | {transl_client.chars} chars")
+
+
+def main():
+    for incremental in (False, True):
+        run(incremental)
+
+
+if __name__ == "__main__":
+    main()
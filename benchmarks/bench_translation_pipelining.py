@@ -0,0 +1,82 @@
+# Translation lag with a variable-latency translation client: serial requests (1 in flight) vs pipelined ones.
+# Lag of a transcript revision: time from its publication to the display of a translation of it (or of a newer one).
+# Run from the repository root: python -m benchmarks.bench_translation_pipelining
+import random
+import time
+
+import thread_manager
+from thread_manager import ThreadManager
+from utils.metrics import LatencyStats
+from utils.translation_cache import TranslationCache
+from benchmarks.fakes import FakeTranslationClient, StubAudioProcessor
+
+
+N_REVISIONS = 300
+WORD_INTERVAL = 0.1     # a new interim word every 100 ms
+WORDS_PER_SENTENCE = 8
+LATENCY_RANGE = (0.15, 0.4)
+IN_FLIGHT = [1, 2, 3, 5]
+
+
+class LagThreadManager(ThreadManager):
+    # records the lag of every revision covered by a newly displayed translation
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.published = {}     # revision -> publication time
+        self.lag = LatencyStats(window=N_REVISIONS)
+        self.displayed = []
+
+    def publish_transcript(self, output_stt, segments, received_at=None):
+        super().publish_transcript(output_stt, segments, received_at)
+        self.published.setdefault(self.stt_version, time.perf_counter())
+
+    def notify_update(self):
+        super().notify_update()
+        if not self.displayed or self.displayed[-1] != self.transl_version:
+            now = time.perf_counter()
+            self.displayed.append(self.transl_version)
+            for version in [v for v in self.published if v <= self.transl_version]:
+                self.lag.add(now - self.published.pop(version))
+
+
+def run(in_flight):
+    random.seed(0)
+    thread_manager.translation_cache = TranslationCache()
+    thread_manager.TRANSLATE_MAX_IN_FLIGHT = in_flight
+    rng = random.Random(1)
+    transl_client = FakeTranslationClient(latency=lambda: rng.uniform(*LATENCY_RANGE))
+    manager = LagThreadManager("en-US", "fr-FR", StubAudioProcessor(), transc_client=object(), transl_client=transl_client)
+    manager.thread_transl.start()
+
+    finals, interim = [], []
+    start = time.perf_counter()
+    for i in range(N_REVISIONS):
+        interim = interim + [f"w{i}"]
+        if len(interim) == WORDS_PER_SENTENCE:
+            finals, interim = finals[-1:] + [interim], []
+        output = [w for sentence in finals for w in sentence] + interim
+        manager.publish_transcript(output, ([list(s) for s in finals], list(interim)))
+        time.sleep(max(0, start + (i + 1) * WORD_INTERVAL - time.perf_counter()))
+    time.sleep(LATENCY_RANGE[1] * 2)
+
+    manager.stop()
+    manager.thread_transl.join()
+    in_order = all(a < b for a, b in zip(manager.displayed, manager.displayed[1:]))
+    return manager, transl_client.calls, in_order
+
+
+def main():
+    print(f"{N_REVISIONS} revisions every {WORD_INTERVAL * 1000:.0f} ms, translation latency {LATENCY_RANGE[0] * 1000:.0f}-{LATENCY_RANGE[1] * 1000:.0f} ms")
+    print("in flight |   lag p50    p95    p99    max (ms) | calls | cancelled | discarded | displayed in order")
+    for in_flight in IN_FLIGHT:
+        manager, calls, in_order = run(in_flight)
+        lag = manager.lag
+        print(
+            f"{in_flight:9d} | {1000 * lag.percentile(50):9.0f} {1000 * lag.percentile(95):6.0f} {1000 * lag.percentile(99):6.0f} "
+            f"{1000 * lag.percentile(100):6.0f}      | {calls:5d} | {manager.transl_stats['cancelled']:9d} | "
+            f"{manager.transl_stats['discarded']:9d} | {in_order}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# STT latency jitter against the number of sessions: every session in the Streamlit process (ThreadManager)
+# vs sessions in worker processes (RemoteSession), while the Streamlit process has bursts of GIL-bound work
+# (HTML rendering, resampling). Latency: from the chunk holding the start of a word being filled by the
+# AudioProcessor to the word showing in output_stt of the Streamlit process. A worker is then killed in the
+# middle of a run: the sessions of the other worker must not miss any word.
+# Run from the repository root: python -m benchmarks.bench_workers
+import threading
+import time
+
+import numpy as np
+
+from microphone_stream import AudioProcessor
+from thread_manager import ThreadManager
+from worker_pool import WorkerPool, RemoteSession
+from utils.metrics import LatencyStats
+from utils.parameters import SR, CHUNK
+from benchmarks.fakes import FakeSpeechClient, FakeTranslationClient, encode_words, word_name
+
+
+SESSION_COUNTS = [5, 20, 50]
+CRASH_SESSIONS = 10
+CRASH_AFTER = 3
+N_WORKERS = 2
+N_WORDS = 30
+WORD_DURATION = 0.3
+FRAME_DURATION = 0.02
+STT_LATENCY = 0.02
+TRANSL_LATENCY = 0.05
+BURST, BURST_PERIOD = 0.02, 0.05    # seconds of GIL-bound work in the Streamlit process, every period
+POLL_INTERVAL = 0.005
+
+
+def fake_clients():
+    # built in each worker process
+    return FakeSpeechClient(latency=STT_LATENCY), FakeTranslationClient(TRANSL_LATENCY)
+
+
+def burn(stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        while time.perf_counter() - start < BURST:
+            sum(range(1000))
+        time.sleep(BURST_PERIOD - BURST)
+
+
+def run(n_sessions, pool=None, kill_after=None):
+    processors = [AudioProcessor(vad=False) for _ in range(n_sessions)]
+    for processor in processors:
+        processor.pipeline.stop()
+    if pool is None:
+        speech_client, transl_client = fake_clients()
+        sessions = [ThreadManager("en-US", "fr-FR", p, transc_client=speech_client, transl_client=transl_client) for p in processors]
+    else:
+        sessions = [RemoteSession("en-US", "fr-FR", p, pool=pool) for p in processors]
+    for session in sessions:
+        session.start()
+
+    stop = threading.Event()
+    burner = threading.Thread(target=burn, args=(stop,), daemon=True)
+    burner.start()
+
+    # time at which the first chunk of each word was filled, and first appearance of each word per session
+    audio = np.concatenate([encode_words(N_WORDS, WORD_DURATION), np.zeros(SR // 2, dtype=np.float32)])
+    samples_per_word = int(WORD_DURATION * SR)
+    word_filled, seen = {}, [dict() for _ in sessions]
+
+    def watch():
+        while not stop.is_set():
+            now = time.perf_counter()
+            for session, words in zip(sessions, seen):
+                for word in session.output_stt:
+                    words.setdefault(word, now)
+            time.sleep(POLL_INTERVAL)
+
+    watcher = threading.Thread(target=watch, daemon=True)
+    watcher.start()
+
+    frame_len = int(FRAME_DURATION * SR)
+    start = time.perf_counter()
+    for n, i in enumerate(range(0, len(audio), frame_len)):
+        if kill_after is not None and i == int(kill_after * SR) // frame_len * frame_len:
+            pool.workers[0].process.kill()
+        for processor in processors:
+            processor.fill_buffer(audio[i:i + frame_len])
+        now = time.perf_counter()
+        for k in range(i // samples_per_word, min(N_WORDS, (i + frame_len) // samples_per_word + 1)):
+            if k * samples_per_word + CHUNK <= i + frame_len:
+                word_filled.setdefault(word_name(k + 1), now)
+        time.sleep(max(0, start + (n + 1) * FRAME_DURATION - time.perf_counter()))
+    time.sleep(1)
+    stop.set()
+    watcher.join()
+    burner.join()
+
+    latency = LatencyStats(window=len(sessions) * N_WORDS)
+    for words in seen:
+        for word, filled in word_filled.items():
+            if word in words:
+                latency.add(words[word] - filled)
+    workers = [session.worker if pool is not None else None for session in sessions]
+    complete = [len(word_filled.keys() & words.keys()) / N_WORDS for words in seen]
+
+    for session, processor in zip(sessions, processors):
+        session.stop()
+        session.join(1)
+        processor.stop()
+    return latency, complete, workers
+
+
+def main():
+    pool = WorkerPool(N_WORKERS, clients=fake_clients)
+    # let the workers import the app modules
+    RemoteSession("en-US", "fr-FR", AudioProcessor(vad=False), pool=pool).stop()
+    time.sleep(5)
+
+    print(f"STT latency (ms), {BURST * 1000:.0f} ms GIL bursts every {BURST_PERIOD * 1000:.0f} ms in the Streamlit process:")
+    for n_sessions in SESSION_COUNTS:
+        for mode, mode_pool in [("single process", None), (f"{N_WORKERS} workers", pool)]:
+            latency, complete, _ = run(n_sessions, mode_pool)
+            p50, p99 = latency.percentile(50), latency.percentile(99)
+            print(
+                f"  {n_sessions:3d} sessions, {mode:>14}: p50 {1000 * p50:6.1f} | p99 {1000 * p99:6.1f} | "
+                f"jitter (p99 - p50) {1000 * (p99 - p50):6.1f} | words seen {100 * np.mean(complete):5.1f} %"
+            )
+
+    print(f"\n{CRASH_SESSIONS} sessions, {pool.workers[0].name} killed after {CRASH_AFTER} s:")
+    _, complete, workers = run(CRASH_SESSIONS, pool, kill_after=CRASH_AFTER)
+    for worker in pool.workers:
+        seen = [c for c, w in zip(complete, workers) if w is worker]
+        print(f"  {worker.name}: {len(seen)} sessions | words seen {100 * np.mean(seen):5.1f} % | restarts {worker.restarts}")
+    pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+# Local stand-ins for the Google Cloud clients, used by the benchmarks.
+from datetime import timedelta
+from types import SimpleNamespace
+import asyncio
+import queue
+import threading
+import time
+
+import numpy as np
+
+from utils.parameters import SR
+from utils.tracing import Tracer
+
+
+def encode_words(n_words, word_duration=0.3, first_word=0):
+    # audio where every sample holds the (1-based) id of the word being spoken,
+    # so that FakeSpeechClient can "recognize" it; float samples as produced by the DSP
+    samples_per_word = int(word_duration * SR)
+    ids = np.repeat(np.arange(first_word + 1, first_word + n_words + 1), samples_per_word)
+    return ((ids + 0.5) / 32767).astype(np.float32)
+
+
+def word_name(word_id):
+    return f"w{word_id - 1}"
+
+
+class FakeFrame:
+    # stand-in for av.AudioFrame as given to AudioProcessor.recv (packed samples, shape (channels, n))
+    def __init__(self, samples, sample_rate=SR, layout="mono"):
+        self.samples = samples.reshape(1, -1)
+        self.sample_rate = sample_rate
+        self.layout = SimpleNamespace(name=layout)
+
+    def to_ndarray(self):
+        return self.samples
+
+
+class StubAudioProcessor:
+    # for the sessions that only translate published transcripts
+    tracer = Tracer()
+
+    def memory_usage(self):
+        return {}
+
+
+class StreamLimitExceeded(Exception):
+    pass
+
+
+class StreamCancelled(Exception):
+    pass
+
+
+class FakeStreamingCall:
+    def __init__(self, requests, stream_limit, latency, words_per_sentence):
+        self.stream_limit, self.latency, self.words_per_sentence = stream_limit, latency, words_per_sentence
+        self.start_time = time.time()
+
+        self._responses = queue.Queue()
+        self._n_samples = 0
+        self._sentence = []     # [word_id, start_sample, end_sample]
+
+        threading.Thread(target=self._consume, args=(requests,), daemon=True).start()
+
+    def _consume(self, requests):
+        try:
+            for request in requests:
+                if self.stream_limit is not None and time.time() - self.start_time > self.stream_limit:
+                    raise StreamLimitExceeded("Exceeded maximum allowed stream duration")
+                self._recognize(np.frombuffer(request.audio_content, dtype=np.int16))
+            self._responses.put(None)
+        except Exception as e:
+            self._responses.put(e)
+
+    def _recognize(self, samples):
+        # runs of identical samples are words (or silence)
+        offset = self._n_samples
+        ends = np.append(np.flatnonzero(np.diff(samples)) + 1, len(samples))
+        starts = np.insert(ends[:-1], 0, 0)
+        for start, end in zip(starts, ends):
+            word_id = int(samples[start])
+            self._n_samples = offset + int(start)
+            if not self._sentence or self._sentence[-1][0] != word_id:
+                # end of sentence after `words_per_sentence` words or on silence
+                if len(self._sentence) == self.words_per_sentence or (self._sentence and word_id == 0):
+                    self._emit(is_final=True)
+                    self._sentence = []
+                if word_id > 0:
+                    self._sentence.append([word_id, self._n_samples, self._n_samples])
+            if self._sentence and word_id > 0:
+                self._sentence[-1][2] = offset + int(end)
+        self._n_samples = offset + len(samples)
+
+        if self._sentence:
+            self._emit(is_final=False)
+
+    def _emit(self, is_final):
+        words = [
+            SimpleNamespace(
+                word=word_name(word_id),
+                start_time=timedelta(seconds=start / SR),
+                end_time=timedelta(seconds=end / SR),
+            )
+            for word_id, start, end in self._sentence
+        ]
+        alternative = SimpleNamespace(
+            transcript=" ".join(w.word for w in words),
+            words=words if is_final else [],
+        )
+        result = SimpleNamespace(
+            alternatives=[alternative],
+            is_final=is_final,
+            result_end_time=timedelta(seconds=self._n_samples / SR),
+        )
+        self._deliver(SimpleNamespace(results=[result]))
+
+    def _deliver(self, response):
+        if self.latency:
+            time.sleep(self.latency)
+        self._responses.put(response)
+
+    def cancel(self):
+        # like a gRPC call, the iteration over the responses stops at once
+        self._responses.put(StreamCancelled("Locally cancelled by application"))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        response = self._responses.get()
+        if response is None:
+            raise StopIteration
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+class FakeAsyncStreamingCall(FakeStreamingCall):
+    # same recognition as FakeStreamingCall, consuming an async iterator of requests
+    # (starting with the streaming config) from a task of the running loop
+    def __init__(self, requests, stream_limit, latency, words_per_sentence):
+        self.stream_limit, self.latency, self.words_per_sentence = stream_limit, latency, words_per_sentence
+        self.start_time = time.time()
+
+        self._responses = asyncio.Queue()
+        self._n_samples = 0
+        self._sentence = []
+
+        self._task = asyncio.ensure_future(self._consume(requests))
+
+    async def _consume(self, requests):
+        try:
+            async for request in requests:
+                if not getattr(request, "audio_content", None):
+                    continue
+                if self.stream_limit is not None and time.time() - self.start_time > self.stream_limit:
+                    raise StreamLimitExceeded("Exceeded maximum allowed stream duration")
+                self._recognize(np.frombuffer(request.audio_content, dtype=np.int16))
+            self._deliver(None)
+        except Exception as e:
+            self._deliver(e)
+
+    def _deliver(self, response):
+        if self.latency:
+            asyncio.get_running_loop().call_later(self.latency, self._responses.put_nowait, response)
+        else:
+            self._responses.put_nowait(response)
+
+    def cancel(self):
+        self._task.cancel()
+        self._responses.put_nowait(asyncio.CancelledError())
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        response = await self._responses.get()
+        if response is None:
+            raise StopAsyncIteration
+        if isinstance(response, BaseException):
+            raise response
+        return response
+
+
+class ScriptedStreamingCall(FakeStreamingCall):
+    # emits the responses of a script once the stream has received the audio up to their end time;
+    # script entries: {"end": seconds, "transcript": str, "is_final": bool, "words": [[word, start, end], ...]}
+    def __init__(self, requests, script, latency):
+        self.script = list(script)
+        self._next = 0
+        super().__init__(requests, None, latency, None)
+
+    def _recognize(self, samples):
+        self._n_samples += len(samples)
+        while self._next < len(self.script) and self.script[self._next]["end"] <= self._n_samples / SR:
+            entry = self.script[self._next]
+            self._next += 1
+
+            words = [
+                SimpleNamespace(word=word, start_time=timedelta(seconds=start), end_time=timedelta(seconds=end))
+                for word, start, end in entry.get("words", [])
+            ]
+            alternative = SimpleNamespace(transcript=entry["transcript"], words=words if entry["is_final"] else [])
+            result = SimpleNamespace(
+                alternatives=[alternative],
+                is_final=entry["is_final"],
+                result_end_time=timedelta(seconds=entry["end"]),
+            )
+            self._deliver(SimpleNamespace(results=[result]))
+
+
+class ScriptedAsyncStreamingCall(FakeAsyncStreamingCall):
+    # ScriptedStreamingCall for the asyncio engine
+    def __init__(self, requests, script, latency):
+        self.script = list(script)
+        self._next = 0
+        super().__init__(requests, None, latency, None)
+
+    _recognize = ScriptedStreamingCall._recognize
+
+
+class StallingStreamingCall(FakeStreamingCall):
+    # stops reading the requests (and answering) from `stall_after` to `stall_after + stall_duration` seconds,
+    # or until it is cancelled; records the size of the largest request
+    def __init__(self, requests, client, latency, words_per_sentence):
+        self.client = client
+        self._cancelled = threading.Event()
+        super().__init__(requests, None, latency, words_per_sentence)
+
+    def _recognize(self, samples):
+        client = self.client
+        client.max_request = max(client.max_request, 2 * len(samples))
+        if client.stall_after is not None and time.time() - self.start_time > client.stall_after:
+            stall_end = self.start_time + client.stall_after + client.stall_duration
+            client.stall_after = None
+            if self._cancelled.wait(max(0, stall_end - time.time())):
+                return
+        super()._recognize(samples)
+
+    def cancel(self):
+        self._cancelled.set()
+        super().cancel()
+
+
+class FakeSpeechClient:
+    def __init__(self, stream_limit=None, latency=0.0, words_per_sentence=4):
+        self.stream_limit, self.latency, self.words_per_sentence = stream_limit, latency, words_per_sentence
+        self.calls = 0
+
+    def streaming_recognize(self, config, requests):
+        self.calls += 1
+        return FakeStreamingCall(requests, self.stream_limit, self.latency, self.words_per_sentence)
+
+
+class ScriptedSpeechClient:
+    def __init__(self, script, latency=0.0):
+        self.script, self.latency = script, latency
+        self.calls = 0
+
+    def streaming_recognize(self, config, requests):
+        self.calls += 1
+        return ScriptedStreamingCall(requests, self.script, self.latency)
+
+
+class StallingSpeechClient:
+    # the first stream stalls once, see StallingStreamingCall
+    def __init__(self, stall_after, stall_duration, latency=0.0, words_per_sentence=4):
+        self.stall_after, self.stall_duration = stall_after, stall_duration
+        self.latency, self.words_per_sentence = latency, words_per_sentence
+        self.max_request = 0
+        self.calls = 0
+
+    def streaming_recognize(self, config, requests):
+        self.calls += 1
+        return StallingStreamingCall(requests, self, self.latency, self.words_per_sentence)
+
+
+class FakeTranslationClient:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        self.chars = 0
+        self._lock = threading.Lock()
+
+    def translate_text(self, contents, target_language_code, source_language_code=None, parent=None, **kwargs):
+        with self._lock:
+            self.calls += 1
+            self.chars += sum(len(text) for text in contents)
+        if self.latency:
+            time.sleep(self.latency() if callable(self.latency) else self.latency)
+
+        translations = [SimpleNamespace(translated_text=f"[{target_language_code}] {text}" if text else "") for text in contents]
+        return SimpleNamespace(translations=translations)
+
+
+class FakeSpeechAsyncClient(FakeSpeechClient):
+    async def streaming_recognize(self, requests):
+        self.calls += 1
+        return FakeAsyncStreamingCall(requests, self.stream_limit, self.latency, self.words_per_sentence)
+
+
+class ScriptedSpeechAsyncClient(ScriptedSpeechClient):
+    async def streaming_recognize(self, requests):
+        self.calls += 1
+        return ScriptedAsyncStreamingCall(requests, self.script, self.latency)
+
+
+class FakeTranslationAsyncClient(FakeTranslationClient):
+    async def translate_text(self, contents, target_language_code, source_language_code=None, parent=None, **kwargs):
+        self.calls += 1
+        self.chars += sum(len(text) for text in contents)
+        if self.latency:
+            await asyncio.sleep(self.latency() if callable(self.latency) else self.latency)
+
+        translations = [SimpleNamespace(translated_text=f"[{target_language_code}] {text}" if text else "") for text in contents]
+        return SimpleNamespace(translations=translations)
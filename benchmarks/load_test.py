@@ -0,0 +1,221 @@
+# Load test: N concurrent speakers in one process, each an AudioProcessor fed with WebRTC-like frames at real-time
+# pace from its own thread (as aiortc calls recv for each connection) and a session of the chosen engine, with
+# fake Speech-to-Text / Translation services of configurable latency and a render loop per session as in app.py.
+# Sweeps the number of sessions and reports, for each count: how late recv is called and the frames dropped by the
+# DSP and stream queues, the queue depths, the audio-to-subtitle latency (tracing), the CPU and threads per session.
+# A count is sustained when no frame or chunk is dropped, every session got its last sentence and the p95 latency of the
+# translated subtitles stays under --max-latency.
+# Run from the repository root:
+#   python -m benchmarks.load_test                                 (synthesized 48 kHz stereo speech)
+#   python -m benchmarks.load_test --sessions 10,50,100 file.wav   (a file.json script next to the WAV gives the STT responses)
+#   python -m benchmarks.load_test --engine asyncio --json results.json
+import argparse
+import json
+import threading
+import time
+
+import numpy as np
+
+import thread_manager
+from async_engine import AsyncThreadManager
+from microphone_stream import AudioProcessor
+from thread_manager import ThreadManager
+from utils.metrics import LatencyStats
+from utils.translation_cache import TranslationCache
+from utils.tracing import Tracer
+from benchmarks.replay import FRAME_DURATION, Renderer, load_wav, load_script, synthesize_speech, to_frames
+from benchmarks.fakes import ScriptedSpeechClient, ScriptedSpeechAsyncClient, FakeTranslationClient, FakeTranslationAsyncClient
+
+
+ENGINES = {"threads": ThreadManager, "asyncio": AsyncThreadManager}
+SAMPLE_INTERVAL = 0.1   # seconds between two samples of the queue depths and thread count
+
+
+class Speaker:
+    # one WebRTC connection: the frames are given to recv at real-time pace, starting at `offset` seconds
+    def __init__(self, processor, frames, start, offset):
+        self.processor, self.frames = processor, frames
+        self.start = start + offset
+        self.lateness = LatencyStats(window=len(frames))
+        self.recv_time = LatencyStats(window=len(frames))
+        self.thread = threading.Thread(target=self.run, name="load_speaker", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        for i, frame in enumerate(self.frames):
+            due = self.start + i * FRAME_DURATION
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            t0 = time.perf_counter()
+            self.lateness.add(max(0.0, t0 - due))
+            self.processor.recv(frame)
+            self.recv_time.add(time.perf_counter() - t0)
+
+
+class Sampler:
+    # queue depths and thread count during the run
+    def __init__(self, processors):
+        self.processors = processors
+        self.dsp_depth, self.stream_queued, self.threads = [], [], []
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="load_sampler", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while self.running:
+            self.dsp_depth.append(max(p.pipeline.depth for p in self.processors))
+            self.stream_queued.append(max(sum(b.duration for b in list(p.subscribers)) for p in self.processors))
+            self.threads.append(threading.active_count())
+            time.sleep(SAMPLE_INTERVAL)
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+
+
+def clients(engine, script, stt_latency, transl_latency):
+    if engine is AsyncThreadManager:
+        return ScriptedSpeechAsyncClient(script, latency=stt_latency), FakeTranslationAsyncClient(transl_latency)
+    return ScriptedSpeechClient(script, latency=stt_latency), FakeTranslationClient(transl_latency)
+
+
+def run(n_sessions, frames, script, engine=ThreadManager, stt_latency=0.1, transl_latency=0.1):
+    thread_manager.translation_cache = TranslationCache()
+    speech_client, transl_client = clients(engine, script, stt_latency, transl_latency)
+    threads_before = threading.active_count()
+
+    # the stages of all the sessions of the run
+    tracer = Tracer(enabled=True)
+    processors = [AudioProcessor(vad=False) for _ in range(n_sessions)]
+    for processor in processors:
+        processor.tracer = Tracer(parent=tracer, enabled=True)
+    managers = [engine("en-US", "fr-FR", p, transc_client=speech_client, transl_client=transl_client) for p in processors]
+    for manager in managers:
+        manager.start()
+    renderers = [Renderer(manager) for manager in managers]
+    sampler = Sampler(processors)
+
+    # the connections are spread over a frame period
+    cpu_start, start = time.process_time(), time.perf_counter()
+    speakers = [Speaker(p, frames, start, i * FRAME_DURATION / n_sessions) for i, p in enumerate(processors)]
+    for speaker in speakers:
+        speaker.thread.join()
+
+    # wait for the last translation
+    last_final = next(entry for entry in reversed(script) if entry["is_final"])["transcript"].split(" ")
+    deadline = time.perf_counter() + 5
+    while time.perf_counter() < deadline and not all(m.output_transl[-len(last_final):] == last_final for m in managers):
+        time.sleep(0.01)
+    wall = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    sampler.stop()
+
+    complete = sum(m.output_transl[-len(last_final):] == last_final for m in managers)
+    enqueued = sum(p.pipeline.stats["enqueued"] for p in processors)
+    dsp_dropped = sum(p.pipeline.stats["dropped"] for p in processors)
+    stream_dropped = sum(m.stream_stats["dropped"] for m in managers) + sum(b.stats["dropped"] for p in processors for b in list(p.subscribers))
+    lateness, recv_time = LatencyStats(window=n_sessions * len(frames)), LatencyStats(window=n_sessions * len(frames))
+    for speaker in speakers:
+        for value in speaker.lateness._values:
+            lateness.add(value)
+        for value in speaker.recv_time._values:
+            recv_time.add(value)
+    stages = tracer.summary()
+
+    def stage(name, q):
+        return 1000 * stages[name][f"p{q}"] if name in stages else float("nan")
+
+    metrics = {
+        "sessions": n_sessions,
+        "recv_late_p95_ms": 1000 * lateness.percentile(95),
+        "recv_late_max_ms": 1000 * max(lateness._values, default=0.0),
+        "recv_p99_us": 1e6 * recv_time.percentile(99),
+        "frame_drop_rate": dsp_dropped / enqueued if enqueued else 0.0,
+        "stream_dropped_chunks": stream_dropped,
+        "dsp_depth_max": max(p.pipeline.stats["max_depth"] for p in processors),
+        "dsp_depth_mean": float(np.mean(sampler.dsp_depth)) if sampler.dsp_depth else 0.0,
+        "stream_queued_max_s": max(sampler.stream_queued, default=0.0),
+        "transc_p50_ms": stage("render_transc", 50),
+        "transc_p95_ms": stage("render_transc", 95),
+        "transl_p50_ms": stage("render_transl", 50),
+        "transl_p95_ms": stage("render_transl", 95),
+        "transl_p99_ms": stage("render_transl", 99),
+        "cpu_per_session": cpu / wall / n_sessions,
+        "cpu_total": cpu / wall,
+        "threads_max": max(sampler.threads, default=0),
+        "threads_per_session": (max(sampler.threads, default=threads_before) - threads_before) / n_sessions,
+        "complete": complete / n_sessions,
+    }
+
+    for manager, processor in zip(managers, processors):
+        manager.stop()
+        processor.stop()
+    for manager in managers:
+        manager.join(1)
+    for renderer in renderers:
+        renderer.thread.join(timeout=1)
+    return metrics
+
+
+def sustained(metrics, max_latency):
+    return metrics["frame_drop_rate"] == 0 and metrics["stream_dropped_chunks"] == 0 and metrics["complete"] == 1 and metrics["transl_p95_ms"] <= max_latency * 1000
+
+
+def speech(wav, duration):
+    if wav:
+        samples, sample_rate = load_wav(wav)
+        layout = "stereo" if samples.shape[0] == 2 else "mono"
+        return to_frames(samples, sample_rate, layout), load_script(wav, samples.shape[1] / sample_rate)
+    # a synthesized sentence lasts 3.8 s
+    samples, sample_rate, script = synthesize_speech(n_sentences=max(1, round(duration / 3.8)), sample_rate=48000, channels=2)
+    return to_frames(samples, sample_rate, "stereo"), script
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("wav", nargs="?", help="16-bit PCM WAV file spoken by every session")
+    parser.add_argument("--sessions", default="1,5,10,20,40", help="comma-separated session counts")
+    parser.add_argument("--engine", choices=ENGINES, default="threads")
+    parser.add_argument("--duration", type=float, default=15, help="seconds of synthesized speech per session")
+    parser.add_argument("--stt-latency", type=float, default=0.1, help="seconds before a fake STT response is delivered")
+    parser.add_argument("--transl-latency", type=float, default=0.1, help="seconds per fake translate_text call")
+    parser.add_argument("--max-latency", type=float, default=1.5, help="p95 audio-to-translation latency (s) still sustained")
+    parser.add_argument("--json", help="write the metrics of every count to this file")
+    args = parser.parse_args()
+
+    frames, script = speech(args.wav, args.duration)
+    engine = ENGINES[args.engine]
+    print(
+        f"{len(frames) * FRAME_DURATION:.1f} s of audio per session, {args.engine} engine, "
+        f"fake STT {1000 * args.stt_latency:.0f} ms / translation {1000 * args.transl_latency:.0f} ms"
+    )
+    print(
+        "sessions | recv late p95/max (ms) | frames dropped | stream chunks dropped | DSP depth max | stream queue max (s) | "
+        "transc p50/p95 (ms) | transl p50/p95/p99 (ms) | CPU/session | threads (/session) | complete"
+    )
+
+    results, best = [], 0
+    for n_sessions in [int(n) for n in args.sessions.split(",")]:
+        metrics = run(n_sessions, frames, script, engine, args.stt_latency, args.transl_latency)
+        results.append(metrics)
+        ok = sustained(metrics, args.max_latency)
+        if ok:
+            best = max(best, n_sessions)
+        print(
+            f"{n_sessions:8d} | {metrics['recv_late_p95_ms']:10.1f} / {metrics['recv_late_max_ms']:9.1f} | "
+            f"{100 * metrics['frame_drop_rate']:12.2f} % | {metrics['stream_dropped_chunks']:21d} | {metrics['dsp_depth_max']:13d} | "
+            f"{metrics['stream_queued_max_s']:20.2f} | {metrics['transc_p50_ms']:8.0f} / {metrics['transc_p95_ms']:8.0f} | "
+            f"{metrics['transl_p50_ms']:6.0f} / {metrics['transl_p95_ms']:6.0f} / {metrics['transl_p99_ms']:6.0f} | "
+            f"{100 * metrics['cpu_per_session']:9.1f} % | {metrics['threads_max']:7d} ({metrics['threads_per_session']:4.1f}) | "
+            f"{100 * metrics['complete']:6.1f} %{'' if ok else '  <- not sustained'}"
+        )
+
+    print(f"\nsustained up to {best} sessions (p95 translation latency <= {args.max_latency} s, no audio dropped)" if best else "\nno session count sustained")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+# Offline replay of WAV files through the whole pipeline (AudioProcessor.recv -> ThreadManager -> subtitles HTML)
+# with scripted fake Google Cloud clients, faster than real time.
+import json
+from pathlib import Path
+import threading
+import time
+import tracemalloc
+import wave
+
+import numpy as np
+
+import thread_manager
+from microphone_stream import AudioProcessor
+from thread_manager import ThreadManager
+from utils.translation_cache import TranslationCache
+from utils.metrics import LatencyStats
+from web.display import format_subt, get_html_subt, join_text
+from benchmarks.fakes import FakeFrame, ScriptedSpeechClient, FakeTranslationClient
+
+
+FRAME_DURATION = 0.02   # WebRTC sends 20 ms frames
+WORD_DURATION = 0.3
+WORD_GAP = 0.1
+SENTENCE_GAP = 0.6
+
+
+def load_wav(path):
+    # int16 samples, shape (channels, n)
+    with wave.open(str(path), "rb") as f:
+        if f.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV files are supported")
+        data = np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16)
+        return data.reshape(-1, f.getnchannels()).T, f.getframerate()
+
+
+def write_wav(path, samples, sample_rate):
+    samples = np.atleast_2d(samples)
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(samples.shape[0])
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(samples.T.astype(np.int16).tobytes())
+
+
+def synthesize_speech(n_sentences=6, words_per_sentence=8, sample_rate=48000, channels=2):
+    # voiced bursts (one per word) and the matching STT script, so that any file format can be generated
+    rng = np.random.default_rng(0)
+    chunks, script, t = [], [], 0.0
+    for s in range(n_sentences):
+        words = []
+        for w in range(words_per_sentence):
+            n = int(WORD_DURATION * sample_rate)
+            f0 = rng.uniform(100, 250)
+            tone = sum(np.sin(2 * np.pi * f0 * k * np.arange(n) / sample_rate) / k for k in range(1, 6))
+            chunks += [0.2 * tone * np.hanning(n), np.zeros(int(WORD_GAP * sample_rate))]
+            words.append([f"s{s}w{w}", t, t + WORD_DURATION])
+            t += WORD_DURATION + WORD_GAP
+            script.append({"end": t, "transcript": " ".join(word for word, _, _ in words), "is_final": False})
+        chunks.append(np.zeros(int(SENTENCE_GAP * sample_rate)))
+        t += SENTENCE_GAP
+        script.append({"end": t, "transcript": " ".join(word for word, _, _ in words), "is_final": True, "words": words})
+
+    audio = (np.concatenate(chunks) * 32767).astype(np.int16)
+    return np.tile(audio, (channels, 1)), sample_rate, script
+
+
+def make_script(duration, words_per_second=2.5, words_per_sentence=8):
+    # placeholder words spread over a WAV file that has no script next to it
+    script, words = [], []
+    n_words = int(duration * words_per_second)
+    for i in range(n_words):
+        start = i / words_per_second
+        words.append([f"w{i}", start, start + 1 / words_per_second])
+        is_final = len(words) == words_per_sentence or i == n_words - 1
+        entry = {"end": start + 1 / words_per_second, "transcript": " ".join(w for w, _, _ in words), "is_final": is_final}
+        if is_final:
+            entry["words"], words = words, []
+        script.append(entry)
+    return script
+
+
+def load_script(wav_path, duration):
+    # scripted STT responses: <name>.json next to the WAV file, placeholder words otherwise
+    script_path = Path(wav_path).with_suffix(".json")
+    if script_path.exists():
+        return json.loads(script_path.read_text(encoding="utf-8"))
+    return make_script(duration)
+
+
+def to_frames(samples, sample_rate, layout, dtype="int16"):
+    # av-style frames: packed samples (1, n * channels) for the stereo layout
+    channels = 2 if layout == "stereo" else 1
+    if samples.shape[0] != channels:
+        samples = np.tile(samples.mean(axis=0).astype(samples.dtype), (channels, 1))
+    if dtype == "float32":
+        samples = samples.astype(np.float32) / 32768.0
+
+    frame_len = int(FRAME_DURATION * sample_rate)
+    return [
+        FakeFrame(samples[:, i:i + frame_len].T.reshape(-1), sample_rate=sample_rate, layout=layout)
+        for i in range(0, samples.shape[1], frame_len)
+    ]
+
+
+class Renderer:
+    # what the app.py loop does for one session, in a thread
+    def __init__(self, manager):
+        self.manager = manager
+        self.renders = 0
+        self.render_time = 0.0
+        self.thread = threading.Thread(target=self.run, name="replay_render", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        prev_transc, prev_transl, version = [], [], None
+        lang_audio, lang_transl = self.manager.lang_audio, self.manager.lang_transl
+        tracer, last_traced = self.manager.tracer, {"transc": None, "transl": None}
+        while self.manager.running:
+            version = self.manager.wait_update(version, timeout=0.1)
+            t0 = time.perf_counter()
+            new_line_transc, prev_transc, transc = format_subt(self.manager.output_stt, prev_transc)
+            new_line_transl, prev_transl, transl = format_subt(self.manager.output_transl, prev_transl)
+            get_html_subt(join_text(prev_transc, lang_audio), join_text(transc, lang_audio), new_line_transc, "transc", "Transcription")
+            get_html_subt(join_text(prev_transl, lang_transl), join_text(transl, lang_transl), new_line_transl, "transl", "Translation")
+            self.render_time += time.perf_counter() - t0
+            self.renders += 1
+
+            # a revision is traced on its first render only, as in app.py
+            for subt_type, received_at in (("transc", self.manager.stt_received_at), ("transl", self.manager.transl_received_at)):
+                if received_at != last_traced[subt_type]:
+                    tracer.record(f"render_{subt_type}", received_at)
+                    last_traced[subt_type] = received_at
+
+
+def replay(frames, script, n_sessions=1, speed=10.0, stt_latency=0.02, transl_latency=0.05, vad=False, trace_memory=False):
+    # frames are sent `speed` times faster than real time, every replay starts with an empty translation cache;
+    # returns the metrics per session
+    thread_manager.translation_cache = TranslationCache()
+    speech_client = ScriptedSpeechClient(script, latency=stt_latency)
+    transl_client = FakeTranslationClient(transl_latency)
+    if trace_memory:
+        tracemalloc.start()
+
+    processors = [AudioProcessor(vad=vad) for _ in range(n_sessions)]
+    managers = [
+        ThreadManager("en-US", "fr-FR", processor, transc_client=speech_client, transl_client=transl_client)
+        for processor in processors
+    ]
+    for manager in managers:
+        manager.start()
+    renderers = [Renderer(manager) for manager in managers]
+
+    cpu_start, start = time.process_time(), time.perf_counter()
+    for i, frame in enumerate(frames):
+        for processor in processors:
+            processor.recv(frame)
+        delay = start + (i + 1) * FRAME_DURATION / speed - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    # wait for the last translation
+    last_final = next(entry for entry in reversed(script) if entry["is_final"])["transcript"].split(" ")
+    deadline = time.perf_counter() + 5
+    while time.perf_counter() < deadline and not all(m.output_transl[-len(last_final):] == last_final for m in managers):
+        time.sleep(0.01)
+    wall = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    memory = tracemalloc.get_traced_memory()[1] if trace_memory else 0
+    if trace_memory:
+        tracemalloc.stop()
+
+    complete = sum(m.output_stt[-len(last_final):] == last_final and m.output_transl[-len(last_final):] == last_final for m in managers)
+    audio_duration = len(frames) * FRAME_DURATION
+    dsp_time = sum(p.pipeline.latency["dsp"].total for p in processors)
+    latency = LatencyStats()
+    for manager in managers:
+        for value in manager.transl_latency._values:
+            latency.add(value)
+    latency = latency.summary()
+    metrics = {
+        "realtime_factor": audio_duration / wall,
+        "dsp_x_realtime": audio_duration * n_sessions / dsp_time if dsp_time else 0.0,
+        "stt_to_transl_p50_ms": 1000 * latency["p50"],
+        "stt_to_transl_p95_ms": 1000 * latency["p95"],
+        "stt_calls": speech_client.calls / n_sessions,
+        "translate_calls": transl_client.calls / n_sessions,
+        "translate_chars": transl_client.chars / n_sessions,
+        "renders": sum(r.renders for r in renderers) / n_sessions,
+        "render_ms": 1000 * sum(r.render_time for r in renderers) / n_sessions,
+        "cpu_s": cpu / n_sessions,
+        "memory_kb": memory / 1024 / n_sessions,
+        "complete": complete / n_sessions,
+        "dropped_frames": sum(p.pipeline.stats["dropped"] for p in processors),
+    }
+
+    for manager, processor in zip(managers, processors):
+        manager.stop()
+        processor.stop()
+    for renderer in renderers:
+        renderer.thread.join(timeout=1)
+    return metrics
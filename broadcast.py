@@ -0,0 +1,187 @@
+import threading
+import time
+
+from utils.parameters import BROADCAST_THREAD_NAMES
+from utils.logs import print_logs
+from thread_manager import ThreadManager, stabilize
+
+
+class BroadcastViewer:
+    # same surface as ThreadManager for app.py, fed by a BroadcastSession
+    def __init__(self, session, lang_transl):
+        self.session = session
+        self.lang_audio, self.lang_transl = session.lang_audio, lang_transl
+        self.output_transl = []
+        self._running = True
+
+    @property
+    def running(self):
+        return self._running and self.session.running
+
+    @property
+    def output_stt(self):
+        return self.session.output_stt
+
+    @property
+    def tracer(self):
+        return self.session.tracer
+
+    @property
+    def stt_received_at(self):
+        return self.session.stt_received_at
+
+    @property
+    def transl_received_at(self):
+        return self.session.transl_received_at
+
+    def wait_update(self, version, timeout=None):
+        return self.session.wait_update(version, timeout)
+
+    def memory_usage(self):
+        return self.session.memory_usage()
+
+    def start(self):
+        pass
+
+    def stop(self):
+        self._running = False
+        self.session.unsubscribe(self)
+
+    def join(self, timeout=None):
+        # the threads belong to the broadcast session
+        return []
+
+
+class BroadcastSession(ThreadManager):
+    # a single STT stream whose transcript is translated once per target language and pushed to all the viewers
+    def __init__(self, name, lang_audio, audio_processor, transc_client=None, transl_client=None):
+        super().__init__(lang_audio, None, audio_processor, transc_client=transc_client, transl_client=transl_client)
+        self.name = name
+        self.thread_stt.name, self.thread_transl.name = BROADCAST_THREAD_NAMES
+
+        self.viewers = []
+        self.viewers_lock = threading.Lock()
+
+        # per target language: translated segments and previous output (for stabilization)
+        self.languages = {}
+
+    @property
+    def running(self):
+        # the broadcast ends with the speaker's audio
+        return self._running and self.audio_processor.running
+
+    @running.setter
+    def running(self, running):
+        self._running = running
+
+    def speech_to_text(self):
+        super().speech_to_text()
+        # the speaker left: the viewers are released and new ones cannot attach anymore
+        self.stop()
+        forget_broadcast(self)
+
+    def subscribe(self, lang_transl):
+        viewer = BroadcastViewer(self, lang_transl)
+        with self.viewers_lock:
+            self.viewers.append(viewer)
+            self.languages.setdefault(lang_transl, {"segments": {}, "prev_output": []})
+
+        # the new viewer gets the current translation without waiting for the next transcript
+        with self.stt_cond:
+            self.stt_version += 1
+            self.stt_cond.notify_all()
+
+        print_logs(f"New viewer on broadcast '{self.name}' ({lang_transl})", log_type="broadcast")
+        return viewer
+
+    def unsubscribe(self, viewer):
+        with self.viewers_lock:
+            if viewer in self.viewers:
+                self.viewers.remove(viewer)
+            if not any(v.lang_transl == viewer.lang_transl for v in self.viewers):
+                self.languages.pop(viewer.lang_transl, None)
+
+    def translate(self):
+        version = 0
+        while self.running:
+            version, output_stt, segments, pending_since, received_at = self.wait_transcript(version)
+            if not self.running or not output_stt:
+                continue
+            self.tracer.record("transl_sent", received_at)
+
+            with self.viewers_lock:
+                languages = list(self.languages.items())
+
+            # one translate_text call per distinct target language, with all its segments;
+            # the languages are requested together so that the last one does not wait for the others
+            requests = []
+            for lang_transl, state in languages:
+                texts, pending = self.segment_texts(output_stt, segments, state["segments"])
+                translations, missing = self.cached_translations(pending, lang_transl)
+                future = self.submit_translations(missing, lang_transl) if missing else None
+                requests.append((lang_transl, state, texts, pending, translations, future))
+
+            for lang_transl, state, texts, pending, translations, future in requests:
+                try:
+                    if future is not None:
+                        self.store_translations(pending, translations, self.wait_translations(future), lang_transl)
+                    output = stabilize(state["prev_output"], self.merge_segments(texts, pending, translations, lang_transl, state["segments"]))
+                except Exception as e:
+                    if self.running:
+                        print_logs(f"Translation to {lang_transl} failed: {e}", log_type="broadcast")
+                    continue
+                state["prev_output"] = output
+
+                with self.viewers_lock:
+                    for viewer in self.viewers:
+                        if viewer.lang_transl == lang_transl:
+                            viewer.output_transl = output
+
+            self.tracer.record("transl_received", received_at)
+            self.transl_received_at = received_at
+
+            self.notify_update()
+            if pending_since is not None:
+                self.transl_latency.add(time.time() - pending_since)
+
+
+# broadcasts of the server process, by name
+broadcasts = {}
+broadcasts_lock = threading.Lock()
+
+
+def get_broadcast(name):
+    session = broadcasts.get(name)
+    if session is not None and not session.running:
+        forget_broadcast(session)
+        return None
+    return session
+
+
+def forget_broadcast(session):
+    with broadcasts_lock:
+        if broadcasts.get(session.name) is session:
+            del broadcasts[session.name]
+
+
+def start_broadcast(name, lang_audio, audio_processor):
+    # the running broadcast is kept across the speaker's reruns if nothing changed
+    with broadcasts_lock:
+        session = broadcasts.get(name)
+        if session is not None and session.running and session.audio_processor is audio_processor and session.lang_audio == lang_audio:
+            return session
+
+        if session is not None:
+            session.stop()
+
+        print_logs(f"Starting broadcast '{name}'...", log_type="broadcast")
+        session = broadcasts[name] = BroadcastSession(name, lang_audio, audio_processor)
+        session.start()
+        return session
+
+
+def stop_broadcast(name):
+    with broadcasts_lock:
+        session = broadcasts.pop(name, None)
+    if session is not None:
+        session.stop()
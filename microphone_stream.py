@@ -1,22 +1,44 @@
+from collections import deque
+import itertools
+import threading
+import time
+
 import numpy as np
 import queue
 
 from streamlit_webrtc import AudioProcessorBase
-from scipy.signal import resample_poly
 
-from utils.parameters import SR, CHUNK
+from utils.parameters import SR, CHUNK, RING_BUFFER_SIZE, REPLAY_BUFFER_TIME, VAD_ENABLED, STT_MAX_REQUEST_BYTES
+from utils.audio_queue import AudioQueue
+from utils.ring_buffer import RingBuffer
+from utils.resampler import StreamingResampler
+from utils.dsp_pipeline import DSPPipeline
+from utils.vad import VoiceActivityDetector
+from utils.tracing import Tracer, process_tracer
 
 
 class AudioProcessor(AudioProcessorBase):
-    def __init__(self):
-        self.buffer = queue.Queue()
-        self._temp_buffer = []
+    def __init__(self, vad=VAD_ENABLED):
+        # one queue per STT stream, and recent chunks to replay into a new stream
+        self.subscribers = []
+        self.history = deque(maxlen=int(REPLAY_BUFFER_TIME * SR / CHUNK))
+        self.n_samples = 0
+        self._lock = threading.Lock()
+
+        self._temp_buffer = RingBuffer(RING_BUFFER_SIZE)
+        self._resampler = StreamingResampler(SR)
+        self.vad = VoiceActivityDetector() if vad else None
 
         self.running = True
         self.active_generators = 0
 
         self.volume = 0.0
 
+        self.tracer = Tracer(parent=process_tracer)
+
+        # DSP is done outside of the WebRTC callback so that recv() returns immediately
+        self.pipeline = DSPPipeline(self.process_frames)
+
     def _to_float32(self, data: np.ndarray) -> np.ndarray:
         if np.issubdtype(data.dtype, np.integer):
             if data.dtype == np.int16:
@@ -25,8 +47,8 @@ class AudioProcessor(AudioProcessorBase):
                 return data.astype(np.float32) / 2147483648.0
         return data.astype(np.float32)
 
-    def _to_mono(self, data, frames) -> np.ndarray:
-        if frames.layout.name == 'mono':
+    def _to_mono(self, data, layout) -> np.ndarray:
+        if layout == 'mono':
             return data
         if data.ndim == 2:
             axis = 0 if data.shape[0] <= 8 else 1
@@ -36,56 +58,147 @@ class AudioProcessor(AudioProcessorBase):
         return data
 
     def recv(self, frames):
-        audio = frames.to_ndarray()
-        audio_float = self._to_float32(audio[0])
-        audio_mono = self._to_mono(audio_float, frames).astype(np.float32)
-        audio_mono_16k = resample_poly(audio_mono, up=SR, down=frames.sample_rate)
-        self.fill_buffer(audio_mono_16k)
-
-        rms = np.sqrt(np.mean(audio_mono_16k**2))
-        self.volume = min(rms * 20, 1.0)
-
+        received_at = time.perf_counter() if self.tracer.enabled else None
+        self.pipeline.put((frames.to_ndarray(), frames.sample_rate, frames.layout.name, received_at))
         return frames
 
-    def fill_buffer(self, audio):
+    def process_frames(self, batch):
+        # consecutive frames with the same format are converted together
+        for (sample_rate, layout), group in itertools.groupby(batch, key=lambda item: item[1:3]):
+            group = list(group)
+            audio = np.concatenate([frame[0] for frame, _, _, _ in group])
+            audio_float = self._to_float32(audio)
+            audio_mono = self._to_mono(audio_float, layout).astype(np.float32)
+            audio_mono_16k = self._resampler.process(audio_mono, sample_rate)
+            self.fill_buffer(audio_mono_16k, received_at=group[-1][3])
+
+            if len(audio_mono_16k) > 0:
+                rms = np.sqrt(np.mean(audio_mono_16k**2))
+                self.volume = min(rms * 20, 1.0)
+
+    def fill_buffer(self, audio, received_at=None):
         audio_int16 = (audio * 32767).astype(np.int16)
-        self._temp_buffer.extend(audio_int16) 
+        self._temp_buffer.write(audio_int16)
 
-        if len(self._temp_buffer) >= CHUNK:
+        while len(self._temp_buffer) >= CHUNK:
             # conversion en octets car c'est attendu par l'API
-            segment_np = np.array(self._temp_buffer, dtype=np.int16)
-            audio_bytes = segment_np.tobytes()
-
-            self.buffer.put(audio_bytes)
-            self._temp_buffer = []
-
-    def generator(self):
+            chunk = self._temp_buffer.read_bytes(CHUNK)
+            chunks = self.vad.process(chunk) if self.vad is not None else [chunk]
+
+            # the audio time only counts the chunks sent to the STT streams
+            with self._lock:
+                for chunk in chunks:
+                    self.history.append((self.n_samples / SR, chunk))
+                    self.n_samples += CHUNK
+                    for buffer in self.subscribers:
+                        buffer.put(chunk)
+                    if received_at is not None:
+                        self.tracer.tick(self.n_samples / SR, received_at)
+
+            if received_at is not None:
+                self.tracer.record("fill_buffer", received_at)
+
+    def subscribe(self, since=None, buffer=None):
+        # returns a new audio queue (or the given one) and the audio time of its first chunk,
+        # replaying the chunks recorded after `since` if given
+        buffer = buffer or AudioQueue()
+        with self._lock:
+            replay = [] if since is None else [(t, chunk) for t, chunk in self.history if t + CHUNK / SR > since]
+            audio_offset = replay[0][0] if replay else self.n_samples / SR
+            for _, chunk in replay:
+                buffer.put(chunk)
+            self.subscribers.append(buffer)
+
+        return buffer, audio_offset
+
+    def unsubscribe(self, buffer):
+        with self._lock:
+            if buffer in self.subscribers:
+                self.subscribers.remove(buffer)
+        buffer.put(None)
+
+    def generator(self, buffer, max_bytes=STT_MAX_REQUEST_BYTES):
         self.active_generators += 1
         try:
+            # chunk taken from the buffer that did not fit in the previous request
+            carry = None
             while self.running:
                 # Use a blocking get() to ensure there's at least one chunk of
                 # data, and stop iteration if the chunk is None, indicating the
                 # end of the audio stream.
-                chunk = self.buffer.get()
+                chunk = buffer.get() if carry is None else carry
+                carry = None
                 if chunk is None:
                     return
-                data = [chunk]
+                data, size = [chunk], len(chunk)
 
-                # Now consume whatever other data's still buffered.
+                # Now consume whatever other data's still buffered, up to the
+                # size limit of a request (a backlog is sent in several requests).
                 while True:
                     try:
-                        chunk = self.buffer.get(block=False)
-                        if chunk is None:
-                            return
-                        data.append(chunk)
+                        chunk = buffer.get(block=False)
                     except queue.Empty:
                         break
+                    if chunk is None:
+                        return
+                    if size + len(chunk) > max_bytes:
+                        carry = chunk
+                        break
+                    data.append(chunk)
+                    size += len(chunk)
 
                 yield b"".join(data)
         finally:
             self.active_generators -= 1
 
+    async def agenerator(self, buffer, max_bytes=STT_MAX_REQUEST_BYTES):
+        # same as generator() for an AsyncAudioBuffer, without blocking the event loop
+        self.active_generators += 1
+        try:
+            carry = None
+            while self.running:
+                chunk = await buffer.aget() if carry is None else carry
+                carry = None
+                if chunk is None:
+                    return
+                data, size = [chunk], len(chunk)
+
+                while True:
+                    try:
+                        chunk = buffer.get(block=False)
+                    except queue.Empty:
+                        break
+                    if chunk is None:
+                        return
+                    if size + len(chunk) > max_bytes:
+                        carry = chunk
+                        break
+                    data.append(chunk)
+                    size += len(chunk)
+
+                yield b"".join(data)
+        finally:
+            self.active_generators -= 1
+
+    def memory_usage(self):
+        # bytes held by the audio buffers of the session
+        with self._lock:
+            queued = sum(getattr(buffer, "nbytes", 0) for buffer in self.subscribers)
+            history = sum(len(chunk) for _, chunk in self.history)
+        return {
+            "dsp_queue": self.pipeline.nbytes,
+            "ring_buffer": self._temp_buffer.nbytes,
+            "replay_history": history,
+            "stream_queues": queued,
+        }
+
     def stop(self):
         if self.running:
             self.running = False
-            self.buffer.put(None)
\ No newline at end of file
+            self.pipeline.stop()
+            with self._lock:
+                for buffer in self.subscribers:
+                    buffer.put(None)
+
+    def on_ended(self):
+        self.stop()
@@ -1,48 +1,200 @@
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+import sys
 import threading
 import time
 
 import streamlit as st
-from google.cloud import speech
-from google.cloud import translate_v3
 
-from utils.parameters import THREAD_NAMES, REFRESH_TRANSLATE_RATE, SR, STABILITY_MARGIN, TIME_BETWEEN_SENTENCES, STREAMING_LIMIT
+from utils.parameters import (
+    THREAD_NAMES, SR, TEARDOWN_TIMEOUT, STABILITY_MARGIN, TIME_BETWEEN_SENTENCES, STREAMING_LIMIT, STREAM_HANDOFF_TIME,
+    AUDIO_ENCODING, INCREMENTAL_TRANSLATION, TRANSLATE_MAX_WAIT, TRANSLATION_BATCHING, TRANSLATE_TIMEOUT,
+    TRANSLATE_MAX_IN_FLIGHT, STT_STALL_TIMEOUT, TRANSCRIPT_MAX_WORDS,
+    TRANSLATE_RETRY_DELAY, TRANSLATE_MAX_RETRIES,
+)
 from utils.logs import print_logs
+from utils.lazy_import import lazy_import
+from utils.audio_encoder import create_encoder
+from utils.metrics import LatencyStats
+from utils.translation_cache import translation_cache
+from utils.client_pool import client_pool
+from utils.segmentation import get_segmenter, IncrementalSegmenter
+from utils.transcript import Transcript
+from utils.session_monitor import session_monitor
+from utils.translation_dispatcher import translation_dispatcher
+from utils.tracing import Tracer
 from web.display import split_text, join_text
 
 
 PROJECT_ID = "formal-wonder-477401-g4"
 
+# imported when the first session opens its clients, not when the app starts
+speech = lazy_import("google.cloud.speech")
+translate_v3 = lazy_import("google.cloud.translate_v3")
+
+client_pool.register("speech", lambda: speech.SpeechClient())
+client_pool.register("translate", lambda: translate_v3.TranslationServiceClient())
+
+
+def stabilize(prev_output, output):
+    # stabilize the beginning of the output sentences to avoid changes of words that are too far
+    if len(prev_output) > len(output):
+        return prev_output
+    if len(prev_output) > STABILITY_MARGIN:
+        return prev_output[:-STABILITY_MARGIN] + output[len(prev_output)-STABILITY_MARGIN:]
+    return output
+
+
+class STTStream:
+    def __init__(self, client, config, audio_processor, since=None, encoding=AUDIO_ENCODING):
+        self.audio_processor = audio_processor
+        self.buffer, self.audio_offset = audio_processor.subscribe(since)
+        self.start_time = time.time()
+
+        # number of leading words of the interim results already transcribed by the previous session
+        self.skip_words = 0
+
+        # the encoder state is kept for the whole stream (headers are only sent at its start)
+        self.encoder = create_encoder(encoding)
+        self.sent_samples = 0
+        self.sent_bytes = 0
+        self.cancelled = False
+        self.call = client.streaming_recognize(config, self.requests())
+        self.responses = iter(self.call)
+
+    def requests(self):
+        for content in self.audio_processor.generator(self.buffer):
+            self.trace_sent(content)
+            yield speech.StreamingRecognizeRequest(audio_content=self.encode(content))
+
+    def encode(self, content):
+        content = self.encoder.encode(content)
+        self.sent_bytes += len(content)
+        return content
+
+    def trace_sent(self, content):
+        self.sent_samples += len(content) // 2
+        tracer = self.audio_processor.tracer
+        if tracer.enabled:
+            tracer.record("generator", tracer.received_at(self.audio_time(self.sent_samples / SR)))
+
+    def audio_time(self, stream_time):
+        # audio time of the session at a time of this stream (the audio dropped by its queue on overflow is skipped)
+        return self.audio_offset + stream_time + self.buffer.dropped_before(int(round(stream_time * SR))) / SR
+
+    @property
+    def elapsed(self):
+        return time.time() - self.start_time
+
+    @property
+    def expired(self):
+        # past the streaming time limit, the server ends the stream soon (in silence, no response triggers the handoff)
+        return self.elapsed > STREAMING_LIMIT
+
+    @property
+    def bitrate(self):
+        # bits sent per second of audio
+        return 8 * self.sent_bytes * SR / self.sent_samples if self.sent_samples else 0.0
+
+    def close(self):
+        # cancelling the call ends the iteration over the responses without waiting for the server
+        self.cancelled = True
+        self.audio_processor.unsubscribe(self.buffer)
+        if hasattr(self.call, "cancel"):
+            self.call.cancel()
+
+
+class TranslationJob:
+    # translation of one transcript revision: the displayed texts, the ones to translate
+    # and the translations already known when it was sent, with the languages of the session at that time
+    def __init__(self, version, lang_audio, lang_transl, pending_since, received_at):
+        self.version, self.lang_audio, self.lang_transl = version, lang_audio, lang_transl
+        self.pending_since, self.received_at = pending_since, received_at
+        self.texts, self.pending, self.translations = [], [], []
+        self.known = {}
+        self.future = None
+
 
 class ThreadManager:
-    def __init__(self, lang_audio, lang_transl, audio_processor):
-        self.transc_client = speech.SpeechClient()
-        self.transl_client = translate_v3.TranslationServiceClient()
+    # names of the pooled clients used for speech recognition and translation
+    CLIENT_NAMES = {"speech": "speech", "translate": "translate"}
+
+    def __init__(self, lang_audio, lang_transl, audio_processor, transc_client=None, transl_client=None):
+        # the first session of the process imports google.cloud.speech here, not in its STT thread
+        # where it would delay the subscription of the first stream to the audio
+        speech.load()
+        self.acquire_clients(transc_client, transl_client)
 
         self.audio_processor = audio_processor
+        # sessions that only translate published transcripts have no audio processor: their stages are not traced
+        self.tracer = getattr(audio_processor, "tracer", None) or Tracer(enabled=False)
 
         self.thread_stt = threading.Thread(target=self.speech_to_text, name=THREAD_NAMES[0])
         self.thread_transl = threading.Thread(target=self.translate, name=THREAD_NAMES[1])
 
         self.output_stt, self.output_transl = [], []
         self.prev_output_stt, self.prev_output_transl = [], []
-        self.prev_input_transl = []
+        self.prev_input_transl = None
+
+        # recent final segments followed by the current interim words
+        self.transcript = Transcript(TIME_BETWEEN_SENTENCES, TRANSCRIPT_MAX_WORDS)
+
+        # transcript split into final segments and the interim (unstable) tail
+        self.stt_segments = ([], [])
+        self.transl_segments = {}
+        self.transl_stats = {"requests": 0, "chars": 0, "discarded": 0, "cancelled": 0, "start_time": time.time()}
 
-        self.latest_final_transcs = []
-        self.prefix_stt_output = []
+        # translation requests in flight (cancelled by stop()), pipelined jobs and revision of the displayed translation
+        self.transl_futures = set()
+        self.transl_jobs = []
+        self.transl_version = 0
+        self.transl_lock = threading.Lock()
+        self.transl_executor = None
+
+        # consecutive failed translations and the timer of the next retry
+        self.transl_failures = 0
+        self.retry_timer = None
+
+        # transcript revisions published by speech_to_text, waited on by translate
+        self.stt_version = 0
+        self.stt_cond = threading.Condition()
+        self.first_pending_time = None
+        self.transl_latency = LatencyStats()
+
+        # receive time of the audio of the latest transcript/translation (only when tracing)
+        self.stt_received_at = None
+        self.transl_received_at = None
+
+        # bumped whenever the transcription or the translation changes, waited on by the UI
+        self.update_version = 0
+        self.update_cond = threading.Condition()
 
         self.lang_audio, self.lang_transl = lang_audio, lang_transl
+        self.encoding = AUDIO_ENCODING
+        self.tokenize = IncrementalSegmenter(get_segmenter(lang_audio)).split
+
+        # audio time (in seconds) of the end of the last final transcript
+        self.last_final_audio_time = None
+        self.streams = []
+        self.streams_lock = threading.Lock()
 
-        self.session_just_reloaded = False
-        self.is_first_session = True
+        # audio chunks dropped by the stream queues on overflow and streams reopened by the stall check
+        self.stream_stats = {"dropped": 0, "stalls": 0, "expired": 0}
+        self.memory = {}
 
         self.last_transc_time = time.time()
         self.start_time = time.time()
         self.running = True
 
+    def acquire_clients(self, transc_client=None, transl_client=None):
+        # clients are shared by all the sessions unless given explicitly
+        self.pooled_clients = [kind for kind, client in [("speech", transc_client), ("translate", transl_client)] if client is None]
+        self.transc_client = transc_client or client_pool.acquire(self.CLIENT_NAMES["speech"])
+        self.transl_client = transl_client or client_pool.acquire(self.CLIENT_NAMES["translate"])
+
     @property
     def streaming_config(self):
         config = speech.RecognitionConfig(
-            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+            encoding=speech.RecognitionConfig.AudioEncoding[self.encoding],
             sample_rate_hertz=SR,
             language_code=self.lang_audio,
             enable_word_time_offsets=True,
@@ -54,132 +206,502 @@ class ThreadManager:
             interim_results=True,
         )
 
+    def open_stream(self):
+        stream = STTStream(self.transc_client, self.streaming_config, self.audio_processor, since=self.last_final_audio_time, encoding=self.encoding)
+        with self.streams_lock:
+            self.streams.append(stream)
+        print_logs(f"Start STT session (replay from {stream.audio_offset:.1f}s)...")
+        return stream
+
+    def log_stream_stop(self, stream):
+        details = f"{stream.bitrate / 1000:.1f} kbit/s sent, {stream.buffer.stats['dropped']} chunks dropped"
+        vad = getattr(self.audio_processor, "vad", None)
+        if vad is not None:
+            details += f", {100 * vad.suppressed_ratio:.0f}% of the audio gated as silence"
+        print_logs(f"Stop STT session ({details})...")
+
+    def close_stream(self, stream):
+        if stream is None:
+            return
+        stream.close()
+        with self.streams_lock:
+            if stream in self.streams:
+                self.streams.remove(stream)
+                self.stream_stats["dropped"] += stream.buffer.stats["dropped"]
+
     def speech_to_text(self):
-        while self.running:
-            self.start_time = time.time()
-            print_logs("Start STT session...")
-
-            # end previous generator
-            self.audio_processor.buffer.put(None)
-            self.audio_processor.buffer.put(b"X")   # unblock if stuck on get()
-
-            # Wait for generator to fully exit
-            t0 = time.time()
-            while self.audio_processor.active_generators > 0:
-                if time.time() - t0 > 1:
-                    print("Timeout waiting for generator to stop!")
-                    break
-                time.sleep(0.01)
-
-            # clear the buffer
-            while not self.audio_processor.buffer.empty():
-                try:
-                    self.audio_processor.buffer.get_nowait()
-                except:
-                    break
-
-            # create a new generator
-            generator = self.audio_processor.generator()
-            
-            requests = (
-                speech.StreamingRecognizeRequest(audio_content=content)
-                for content in generator
-            )
-            responses = self.transc_client.streaming_recognize(self.streaming_config, requests)
-
-            for response in responses:
-
-                # restart session if streaming time limit is exceeded
-                if not self.running or (time.time() - self.start_time) > STREAMING_LIMIT:
-                    self.session_just_reloaded = True
-                    print_logs("Stop STT session...")
-                    break
-
-                if not response.results or not (result := response.results[0]).alternatives:
-                    continue
-
-                # If nobody talks and then the conversation start again -> clear previous subtitles
-                if time.time() - self.last_transc_time > TIME_BETWEEN_SENTENCES:
-                    self.prefix_stt_output = []
-                self.last_transc_time = time.time()
-
-                output_raw = result.alternatives[0].transcript
-                output = split_text(output_raw, self.lang_audio)
-
-                # stabilize the beginning of the output sentences to avoid changes of words that are too far
-                if self.session_just_reloaded:
-                    self.session_just_reloaded = False
-                    self.is_first_session = False
-                    output = ["...(session-reload)"] + output
-                elif len(self.prev_output_stt) > len(output):
-                    output = self.prev_output_stt
-                elif len(self.prev_output_stt) > STABILITY_MARGIN:
-                    output = self.prev_output_stt[:-STABILITY_MARGIN] + output[len(self.prev_output_stt)-STABILITY_MARGIN:]
-                elif not self.is_first_session:
-                    output = ["...(session-reload)"] + output
-
-                # add a prefix to the intermediate output (useful in case final transcripts arrived too fast)
-                if result.is_final:
-                    self.latest_final_transcs.append([output, time.time()])
-                    self.latest_final_transcs = [
-                        transc_data for transc_data in self.latest_final_transcs
-                        if time.time() - transc_data[1] <= TIME_BETWEEN_SENTENCES
-                    ]
-                    self.prefix_stt_output = [w for transc,_ in self.latest_final_transcs for w in transc]
-
-                self.output_stt = self.prefix_stt_output + output
-                self.prev_output_stt = [] if result.is_final else output
+        stream = self.open_stream()
+
+        while self.running and self.audio_processor.running:
+            next_stream = None
+            try:
+                for response in stream.responses:
+                    if not self.running or stream.cancelled:
+                        break
+
+                    # open the next session before the streaming time limit, replaying the audio since the last final result
+                    if next_stream is None and stream.elapsed > STREAMING_LIMIT - STREAM_HANDOFF_TIME:
+                        next_stream = self.open_stream()
+
+                    final_words = self.process_response(stream, response)
+
+                    # hand off to the next session at the end of a sentence (or when the limit is reached)
+                    if next_stream is not None:
+                        if final_words is not None:
+                            next_stream.skip_words += len(final_words)
+                            break
+                        if stream.elapsed > STREAMING_LIMIT:
+                            break
+            except Exception as e:
+                # a cancelled stream (stop or new language) or one ended by the streaming limit is not an error of the client
+                if not stream.cancelled and not stream.expired:
+                    print_logs(f"STT session interrupted: {e}")
+                    self.report_client("speech", success=False)
+            else:
+                self.report_client("speech", success=True)
+
+            self.log_stream_stop(stream)
+            self.close_stream(stream)
+            if not self.running or not self.audio_processor.running:
+                self.close_stream(next_stream)
+                break
+
+            stream = next_stream if next_stream is not None and not next_stream.cancelled else self.open_stream()
+            self.prev_output_stt = []
+
+    def process_response(self, stream, response):
+        if not response.results or not (result := response.results[0]).alternatives:
+            return None
+
+        alternative = result.alternatives[0]
+        last_final = self.last_final_audio_time
+
+        # skip results on audio already transcribed by the previous session
+        end_time = stream.audio_time(result.result_end_time.total_seconds())
+        if last_final is not None and end_time <= last_final + 1e-3:
+            if result.is_final:
+                stream.skip_words = 0
+            return None
+
+        received_at = self.tracer.received_at(end_time) if self.tracer.enabled else None
+        self.tracer.record("stt_final" if result.is_final else "stt_interim", received_at)
+
+        # If nobody talks and then the conversation start again -> clear previous subtitles
+        now = time.time()
+        if now - self.last_transc_time > TIME_BETWEEN_SENTENCES:
+            self.transcript.clear()
+        self.last_transc_time = now
+
+        output = self.tokenize(alternative.transcript)
+
+        if result.is_final and alternative.words and last_final is not None:
+            # remove the replayed words using their time offsets
+            words = [
+                w.word for w in alternative.words
+                if stream.audio_time((w.start_time.total_seconds() + w.end_time.total_seconds()) / 2) > last_final
+            ]
+            if len(words) < len(alternative.words):
+                output = split_text(join_text(words, self.lang_audio), self.lang_audio) if words else []
+                self.prev_output_stt = []
+        else:
+            # interim results have no time offsets: drop the words finalized by the previous session
+            output = output[stream.skip_words:]
+
+        output = stabilize(self.prev_output_stt, output)
+
+        # final transcripts are kept as a prefix of the intermediate output (useful in case they arrived too fast)
+        if result.is_final:
+            self.last_final_audio_time = end_time
+            stream.skip_words = 0
+            self.transcript.add_final(output, now)
+        else:
+            self.transcript.set_interim(output)
+
+        self.publish_transcript(self.transcript.output, self.transcript.segments, received_at)
+        self.prev_output_stt = [] if result.is_final else output
+
+        return output if result.is_final else None
+
+    def publish_transcript(self, output_stt, segments, received_at=None):
+        with self.stt_cond:
+            self.output_stt, self.stt_segments = output_stt, segments
+            self.stt_received_at = received_at
+            self.stt_version += 1
+            if self.first_pending_time is None:
+                self.first_pending_time = time.time()
+            self.stt_cond.notify_all()
+        self.notify_update()
+
+    def notify_update(self):
+        with self.update_cond:
+            self.update_version += 1
+            self.update_cond.notify_all()
+
+    def wait_update(self, version, timeout=None):
+        with self.update_cond:
+            self.update_cond.wait_for(lambda: not self.running or self.update_version != version, timeout)
+            return self.update_version
+
+    def wait_transcript(self, version):
+        # block until a revision newer than `version` is published: it is translated at once when no request is
+        # in flight, otherwise the following ones are coalesced until the requests are answered (at most TRANSLATE_MAX_WAIT)
+        with self.stt_cond:
+            self.stt_cond.wait_for(lambda: not self.running or self.stt_version > version)
+            self.stt_cond.wait_for(lambda: not self.running or not self.transl_jobs, TRANSLATE_MAX_WAIT)
+
+            pending_since, self.first_pending_time = self.first_pending_time, None
+            return self.stt_version, self.output_stt, self.stt_segments, pending_since, self.stt_received_at
+
+    def translate_texts(self, texts, lang_transl=None):
+        lang_transl = lang_transl or self.lang_transl
+        translations, missing = self.cached_translations(texts, lang_transl)
+        if missing:
+            self.store_translations(texts, translations, self.request_translations(missing, lang_transl), lang_transl)
+        return translations
+
+    def cached_translations(self, texts, lang_transl, lang_audio=None):
+        lang_audio = lang_audio or self.lang_audio
+        translations = [translation_cache.get(lang_audio, lang_transl, text) for text in texts]
+        missing = [text for text, translation in zip(texts, translations) if translation is None]
+        if missing:
+            self.transl_stats["requests"] += 1
+            self.transl_stats["chars"] += sum(len(text) for text in missing)
+        return translations, missing
+
+    def store_translations(self, texts, translations, results, lang_transl, lang_audio=None):
+        lang_audio = lang_audio or self.lang_audio
+        results = iter(results)
+        for i, text in enumerate(texts):
+            if translations[i] is None:
+                translations[i] = next(results)
+                translation_cache.put(lang_audio, lang_transl, text, translations[i])
+
+    def request_translations(self, texts, lang_transl):
+        return self.wait_translations(self.submit_translations(texts, lang_transl))
+
+    def wait_translations(self, future):
+        try:
+            results = future.result(timeout=TRANSLATE_TIMEOUT)
+        except CancelledError:
+            raise
+        except Exception:
+            self.report_client("translate", success=False)
+            raise
+        self.report_client("translate", success=True)
+        return results
+
+    def submit_translations(self, texts, lang_transl, lang_audio=None):
+        # future of the translations, which can be cancelled until the request is sent
+        lang_audio = lang_audio or self.lang_audio
+        if TRANSLATION_BATCHING:
+            # sent together with the requests of the other sessions
+            future = translation_dispatcher.submit(self.transl_client, f"projects/{PROJECT_ID}/locations/global", lang_audio, lang_transl, texts)
+        else:
+            if self.transl_executor is None:
+                self.transl_executor = ThreadPoolExecutor(TRANSLATE_MAX_IN_FLIGHT, thread_name_prefix=f"{THREAD_NAMES[1]}_rpc")
+            future = self.transl_executor.submit(self.direct_translations, texts, lang_transl, lang_audio)
+        self.transl_futures.add(future)
+        future.add_done_callback(self.transl_futures.discard)
+        return future
+
+    def direct_translations(self, texts, lang_transl, lang_audio=None):
+        response = self.transl_client.translate_text(
+            contents=texts,
+            target_language_code=lang_transl,
+            source_language_code=lang_audio or self.lang_audio,
+            parent=f"projects/{PROJECT_ID}/locations/global",
+            timeout=TRANSLATE_TIMEOUT,
+        )
+        return [translation.translated_text for translation in response.translations]
+
+    def report_client(self, kind, success):
+        if kind in self.pooled_clients:
+            name = self.CLIENT_NAMES[kind]
+            if success:
+                client_pool.report_success(name)
+                return
+            client_pool.report_error(name)
+            # the next calls of the session use the client created in place of a discarded one
+            if kind == "speech":
+                self.transc_client = client_pool.renew(name, self.transc_client)
+            else:
+                self.transl_client = client_pool.renew(name, self.transl_client)
+
+    def translate_segments(self, output_stt, segments, lang_transl=None, transl_segments=None):
+        lang_transl = lang_transl or self.lang_transl
+        transl_segments = self.transl_segments if transl_segments is None else transl_segments
+
+        texts, pending = self.segment_texts(output_stt, segments, transl_segments)
+        translations = self.translate_texts(pending, lang_transl) if pending else []
+        return self.merge_segments(texts, pending, translations, lang_transl, transl_segments)
+
+    def segment_texts(self, output_stt, segments, transl_segments):
+        # returns the texts to display and the ones that still need a translation
+        if INCREMENTAL_TRANSLATION:
+            # final segments are translated once, only the interim tail (current sentence) is sent again
+            finals, interim = segments
+            texts = [join_text(transc, self.lang_audio) for transc in finals] + [join_text(interim, self.lang_audio)]
+        else:
+            texts = [join_text(output_stt, self.lang_audio)]
+        texts = [text for text in texts if text]
+
+        pending = [text for text in dict.fromkeys(texts) if text not in transl_segments]
+        return texts, pending
+
+    def merge_segments(self, texts, pending, translations, lang_transl, transl_segments):
+        transl_segments.update(zip(pending, translations))
+
+        # forget the segments that are not displayed anymore
+        for text in set(transl_segments) - set(texts):
+            del transl_segments[text]
+
+        return [w for text in texts for w in split_text(transl_segments[text], lang_transl)]
+
+    @property
+    def transl_chars_per_minute(self):
+        elapsed = time.time() - self.transl_stats["start_time"]
+        return 60 * self.transl_stats["chars"] / elapsed if elapsed > 0 else 0.0
 
     def translate(self):
+        # up to TRANSLATE_MAX_IN_FLIGHT revisions are translated at once, the next revision waits for a free slot
+        version = 0
         while self.running:
-            # check if the transcription has changed
-            if self.output_stt and self.output_stt != self.prev_input_transl:
-                self.prev_input_transl = self.output_stt
-                input_transl = join_text(self.output_stt, self.lang_audio)
-
-                response = self.transl_client.translate_text(
-                    contents=[input_transl],
-                    target_language_code=self.lang_transl,
-                    source_language_code=self.lang_audio,
-                    parent=f"projects/{PROJECT_ID}/locations/global"
-                )
-
-                output_raw = response.translations[0].translated_text
-                output = split_text(output_raw, self.lang_transl)
-
-                # stabilize the beginning of the output sentences to avoid changes of words that are too far
-                if len(self.prev_output_transl) > len(output):
-                    output = self.prev_output_transl
-                elif len(self.prev_output_transl) > STABILITY_MARGIN:
-                    output = self.prev_output_transl[:-STABILITY_MARGIN] + output[len(self.prev_output_transl)-STABILITY_MARGIN:]
+            with self.stt_cond:
+                self.stt_cond.wait_for(lambda: not self.running or len(self.transl_jobs) < TRANSLATE_MAX_IN_FLIGHT)
+            version, output_stt, segments, pending_since, received_at = self.wait_transcript(version)
 
-                self.output_transl = output
-                self.prev_output_transl = output
-
-            time.sleep(REFRESH_TRANSLATE_RATE)
+            # check if the transcription has changed
+            if not self.running or not output_stt or segments == self.prev_input_transl:
+                continue
+            self.prev_input_transl = segments
+
+            self.tracer.record("transl_sent", received_at)
+            job = self.start_job(TranslationJob(version, self.lang_audio, self.lang_transl, pending_since, received_at), output_stt, segments)
+            job.future.add_done_callback(lambda future, job=job: self.finish_job(job))
+
+    def start_job(self, job, output_stt, segments):
+        with self.transl_lock:
+            job.texts, job.pending = self.segment_texts(output_stt, segments, self.transl_segments)
+            job.known = {text: self.transl_segments[text] for text in job.texts if text in self.transl_segments}
+        job.translations, missing = self.cached_translations(job.pending, job.lang_transl, job.lang_audio)
+
+        self.supersede_jobs()
+        if missing:
+            job.future = self.submit_translations(missing, job.lang_transl, job.lang_audio)
+        else:
+            job.future = Future()
+            job.future.set_result([])
+        with self.stt_cond:
+            self.transl_jobs.append(job)
+        return job
+
+    def finish_job(self, job):
+        # runs in the thread that completed the request
+        self.release_job(job)
+        future = job.future
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            self.report_client("translate", success=False)
+            with self.stt_cond:
+                self.transl_failures += 1
+                failures = self.transl_failures
+            if not self.running:
+                return
+            if failures > TRANSLATE_MAX_RETRIES:
+                if failures == TRANSLATE_MAX_RETRIES + 1:
+                    print_logs(f"Translation failed: {future.exception()}, not retried until the transcript changes")
+                return
+            delay = TRANSLATE_RETRY_DELAY * 2 ** (failures - 1)
+            print_logs(f"Translation failed: {future.exception()}, retrying in {delay:.1f}s")
+            self.schedule_retry(delay)
+            return
+        with self.stt_cond:
+            self.transl_failures = 0
+        if job.pending:
+            self.report_client("translate", success=True)
+
+        with self.transl_lock:
+            # results arriving after a newer revision was displayed (or for previous languages) are dropped,
+            # so the stabilization only ever moves forward
+            if not self.running or job.version <= self.transl_version or (job.lang_audio, job.lang_transl) != (self.lang_audio, self.lang_transl):
+                self.transl_stats["discarded"] += 1
+                return
+            self.store_translations(job.pending, job.translations, future.result(), job.lang_transl, job.lang_audio)
+            self.transl_segments.update(job.known)
+            output = stabilize(self.prev_output_transl, self.merge_segments(job.texts, job.pending, job.translations, job.lang_transl, self.transl_segments))
+
+            self.transl_version = job.version
+            self.output_transl = output
+            self.transl_received_at = job.received_at
+            self.prev_output_transl = output
+
+        # the older requests still in flight cannot be displayed anymore
+        for other in list(self.transl_jobs):
+            if other.version < job.version and other.future.cancel():
+                self.transl_stats["cancelled"] += 1
+
+        self.tracer.record("transl_received", job.received_at)
+        self.notify_update()
+        if job.pending_since is not None:
+            self.transl_latency.add(time.time() - job.pending_since)
+
+    def schedule_retry(self, delay):
+        if self.retry_timer is not None:
+            self.retry_timer.cancel()
+        self.retry_timer = threading.Timer(delay, self.retry_transcript)
+        self.retry_timer.daemon = True
+        self.retry_timer.start()
+
+    def cancel_retry(self):
+        if self.retry_timer is not None:
+            self.retry_timer.cancel()
+
+    def retry_transcript(self):
+        # the last revision is translated again, even if the speaker has stopped
+        if not self.running:
+            return
+        with self.stt_cond:
+            self.prev_input_transl = None
+            self.stt_version += 1
+            self.stt_cond.notify_all()
+
+    def supersede_jobs(self):
+        # the requests of the older revisions are replaced by the new one: the ones not sent yet are cancelled, and
+        # so are the ones already sent (where the client allows it) except the oldest, which keeps the display moving
+        # while the speaker goes on
+        jobs = list(self.transl_jobs)
+        oldest_sent = next((job for job in jobs if self.is_sent(job.future)), None)
+        for job in jobs:
+            if job is not oldest_sent and job.future.cancel():
+                self.transl_stats["cancelled"] += 1
+
+    @staticmethod
+    def is_sent(future):
+        # a blocking call cannot be cancelled once it is sent: the future of a running request refuses cancel()
+        return future.running()
+
+    def cancel_translations(self):
+        for future in list(self.transl_futures):
+            future.cancel()
+
+    def release_job(self, job):
+        with self.stt_cond:
+            if job in self.transl_jobs:
+                self.transl_jobs.remove(job)
+            self.stt_cond.notify_all()
+
+    def check_stall(self, now=None):
+        # called by the session monitor: a stream whose queued audio is not read anymore (stalled call,
+        # slow reconnection) or past the streaming limit without any response to hand off on (silence) is closed,
+        # speech_to_text then goes on with the next stream or opens a new one replaying the audio since the last final result
+        now = now or time.time()
+        with self.streams_lock:
+            streams = list(self.streams)
+        for stream in streams:
+            if stream.cancelled:
+                continue
+            stalled_for = stream.buffer.stalled_for(now)
+            if stalled_for > STT_STALL_TIMEOUT:
+                self.stream_stats["stalls"] += 1
+                print_logs(f"STT session stalled ({stream.buffer.duration:.1f}s of audio unread for {stalled_for:.0f}s), reopening...")
+                self.close_stream(stream)
+            elif now - stream.start_time > STREAMING_LIMIT:
+                self.stream_stats["expired"] += 1
+                print_logs("STT session reached the streaming limit without a response, reopening...")
+                self.close_stream(stream)
+
+    def memory_usage(self):
+        # bytes held by the buffers of the session
+        usage = self.audio_processor.memory_usage()
+        usage["transcript"] = sum(sys.getsizeof(word) for word in self.transcript.words)
+        usage["translations"] = sum(sys.getsizeof(text) + sys.getsizeof(translation) for text, translation in list(self.transl_segments.items()))
+        return usage
+
+    def reconfigure(self, lang_audio, lang_transl):
+        # language changes without restarting the session: the translations are redone for the new target,
+        # the STT streams are reopened with the new source language
+        if lang_transl != self.lang_transl:
+            with self.transl_lock, self.stt_cond:
+                self.lang_transl = lang_transl
+                self.transl_segments = {}
+                self.output_transl, self.prev_output_transl = [], []
+                self.prev_input_transl = None
+                self.stt_version += 1
+                self.stt_cond.notify_all()
+            self.cancel_translations()
+            self.notify_update()
+
+        if lang_audio != self.lang_audio:
+            print_logs(f"Switch STT language to {lang_audio}")
+            self.lang_audio = lang_audio
+            self.tokenize = IncrementalSegmenter(get_segmenter(lang_audio)).split
+            self.transcript.clear()
+            self.prev_output_stt = []
+            self.last_final_audio_time = None
+            self.publish_transcript([], ([], []))
+            with self.streams_lock:
+                streams = list(self.streams)
+            for stream in streams:
+                self.close_stream(stream)
 
     def start(self):
         if not self.thread_stt.is_alive():
             self.thread_stt.start()
         if not self.thread_transl.is_alive():
             self.thread_transl.start()
+        session_monitor.register(self)
 
     def stop(self):
+        if self.running:
+            print_logs(
+                f"Translation: {self.transl_chars_per_minute:,.0f} chars/min sent "
+                f"({self.transl_stats['requests']} requests, {self.transl_stats['chars']} chars)",
+                log_type="translation",
+            )
         self.running = False
-        if hasattr(self, "stream") and self.stream is not None:
-            self.stream.close()
-    
-
-def stop_all_threads():
+        session_monitor.unregister(self)
+        with self.stt_cond:
+            self.stt_cond.notify_all()
+        self.notify_update()
+
+        self.cancel_translations()
+        self.cancel_retry()
+        if self.transl_executor is not None:
+            self.transl_executor.shutdown(wait=False, cancel_futures=True)
+
+        with self.streams_lock:
+            streams = list(self.streams)
+        for stream in streams:
+            self.close_stream(stream)
+
+        for kind in self.pooled_clients:
+            client_pool.release(self.CLIENT_NAMES[kind], self.transc_client if kind == "speech" else self.transl_client)
+        self.pooled_clients = []
+
+    def join(self, timeout=None):
+        # returns the names of the threads still running after `timeout` seconds
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        for thread in [self.thread_stt, self.thread_transl]:
+            if thread.is_alive():
+                thread.join(None if deadline is None else max(0, deadline - time.perf_counter()))
+        return [thread.name for thread in [self.thread_stt, self.thread_transl] if thread.is_alive()]
+
+
+def stop_all_threads(timeout=TEARDOWN_TIMEOUT):
     # stop threads
     if "threads" in st.session_state:
 
         print_logs("Stopping threads...", log_type="threads")
-        st.session_state.threads.stop()
-
-        # wait for speech/translation threads to finish
-        for t in threading.enumerate():
-            if any(prefix in t.name for prefix in THREAD_NAMES):
-                t.join(timeout=2)
+        start = time.perf_counter()
+        threads = st.session_state.threads
+        threads.stop()
+
+        # wait for the threads of this session only (the other sessions use the same thread names)
+        alive = threads.join(timeout)
+        if alive:
+            print_logs(f"Threads still running after {timeout}s: {alive}", log_type="threads")
+        else:
+            print_logs(f"Threads stopped in {1000 * (time.perf_counter() - start):.0f} ms", log_type="threads")
 
         del st.session_state["threads"]
\ No newline at end of file
@@ -0,0 +1,133 @@
+from functools import lru_cache
+import random
+import struct
+
+import av
+import numpy as np
+
+from .parameters import SR, CHUNK, AUDIO_ENCODING, FLAC_COMPRESSION_LEVEL, OPUS_BITRATE
+
+
+class PCMEncoder:
+    # LINEAR16: the chunks are sent as they are
+    encoding = "LINEAR16"
+
+    def encode(self, pcm):
+        return pcm
+
+
+class AVEncoder:
+    # PyAV (installed with streamlit-webrtc) encoder kept for the whole STT stream:
+    # the first encoded chunk starts with the stream headers, the next ones only carry audio frames
+    codec = None
+
+    def __init__(self, bit_rate=None, options=None):
+        self.context = av.CodecContext.create(self.codec, "w")
+        self.context.sample_rate = SR
+        self.context.layout = "mono"
+        self.context.format = "s16"
+        if bit_rate is not None:
+            self.context.bit_rate = bit_rate
+        self.context.options = options or {}
+        self.context.open()
+
+        self.pts = 0
+        self.header = self.stream_header()
+
+    def encode(self, pcm):
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        frame = av.AudioFrame.from_ndarray(samples.reshape(1, -1), format="s16", layout="mono")
+        frame.sample_rate = SR
+        frame.pts = self.pts
+        self.pts += len(samples)
+
+        data = self.header + self.pack(self.context.encode(frame))
+        self.header = b""
+        return data
+
+    def stream_header(self):
+        return b""
+
+    def pack(self, packets):
+        return b"".join(bytes(packet) for packet in packets)
+
+
+class FLACEncoder(AVEncoder):
+    # native FLAC stream: "fLaC" marker, STREAMINFO block, then one frame per chunk
+    encoding = "FLAC"
+    codec = "flac"
+
+    def __init__(self, compression_level=FLAC_COMPRESSION_LEVEL):
+        super().__init__(options={"frame_size": str(CHUNK), "compression_level": str(compression_level)})
+
+    def stream_header(self):
+        streaminfo = bytes(self.context.extradata)
+        return b"fLaC" + bytes([0x80]) + len(streaminfo).to_bytes(3, "big") + streaminfo
+
+
+class OpusEncoder(AVEncoder):
+    # Ogg Opus: the identification and comment headers, then one Ogg page per chunk
+    # (the ogg muxer of ffmpeg holds the last packet until the next one, delaying the audio)
+    encoding = "OGG_OPUS"
+    codec = "libopus"
+
+    def __init__(self, bit_rate=OPUS_BITRATE):
+        self.serial = random.getrandbits(32)
+        self.page_sequence = 0
+        self.granule = 0
+        super().__init__(bit_rate=bit_rate)
+
+    def stream_header(self):
+        vendor = b"edgebox"
+        tags = b"OpusTags" + struct.pack("<I", len(vendor)) + vendor + struct.pack("<I", 0)
+        return self.page([bytes(self.context.extradata)], flags=0x02) + self.page([tags])
+
+    def pack(self, packets):
+        # the granule position counts the 48 kHz samples, pre-skip included
+        packets = [packet for packet in packets if packet.size]
+        pages = []
+        for i in range(0, len(packets), 255):
+            page_packets = packets[i:i + 255]
+            self.granule += sum(packet.duration for packet in page_packets) * 48000 // SR
+            pages.append(self.page([bytes(packet) for packet in page_packets]))
+        return b"".join(pages)
+
+    def page(self, packets, flags=0):
+        # packets smaller than 255 * 255 bytes (always the case for Opus), at most 255 per page
+        lacing = bytearray()
+        for packet in packets:
+            lacing += bytes([255] * (len(packet) // 255) + [len(packet) % 255])
+        header = struct.pack("<4sBBqIIIB", b"OggS", 0, flags, self.granule, self.serial, self.page_sequence, 0, len(lacing))
+        self.page_sequence += 1
+
+        page = bytearray(header + lacing + b"".join(packets))
+        page[22:26] = struct.pack("<I", ogg_crc(page))
+        return bytes(page)
+
+
+@lru_cache(maxsize=None)
+def ogg_crc_table():
+    table = []
+    for i in range(256):
+        crc = i << 24
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x04C11DB7) if crc & 0x80000000 else crc << 1
+        table.append(crc & 0xFFFFFFFF)
+    return table
+
+
+def ogg_crc(data):
+    # CRC-32 of the Ogg pages (direct polynomial, unlike zlib.crc32)
+    table = ogg_crc_table()
+    crc = 0
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ table[(crc >> 24) ^ byte]
+    return crc
+
+
+ENCODERS = {encoder.encoding: encoder for encoder in [PCMEncoder, FLACEncoder, OpusEncoder]}
+
+
+def create_encoder(encoding=AUDIO_ENCODING):
+    # one encoder per STT stream
+    return ENCODERS[encoding]()
@@ -0,0 +1,127 @@
+from collections import deque
+import asyncio
+import bisect
+import queue
+import threading
+import time
+
+from .parameters import SR, CHUNK, AUDIO_QUEUE_MAX_TIME, AUDIO_QUEUE_MAX_BYTES, AUDIO_OVERFLOW_POLICY, AUDIO_LIVE_TIME
+
+
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "skip_to_live")
+
+
+class AudioQueue:
+    # int16 PCM chunks waiting to be sent to an STT stream, bounded in bytes and in duration (None ends the stream);
+    # the samples dropped on overflow are recorded so that the stream can still map its audio time to the session's
+    def __init__(self, max_time=AUDIO_QUEUE_MAX_TIME, max_bytes=AUDIO_QUEUE_MAX_BYTES, policy=AUDIO_OVERFLOW_POLICY, live_time=AUDIO_LIVE_TIME):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+
+        self.max_bytes = min(max_bytes, 2 * SR * max_time)
+        self.live_bytes = int(2 * SR * live_time)
+        self.policy = policy
+
+        self._chunks = deque()
+        self._cond = threading.Condition()
+        self.nbytes = 0
+        self.read_samples = 0
+        self.last_read = time.time()
+
+        # (samples read when the gap was made, samples dropped up to that gap)
+        self._gap_positions, self._gap_dropped = [], []
+        self.stats = {"dropped": 0, "overflows": 0, "max_bytes": 0}
+
+    @property
+    def duration(self):
+        return self.nbytes / 2 / SR
+
+    def put(self, chunk):
+        with self._cond:
+            if chunk is not None and self.nbytes + len(chunk) > self.max_bytes:
+                self.stats["overflows"] += 1
+                if self.policy == "drop_newest":
+                    self._drop_gap(self.read_samples + self.nbytes // 2, len(chunk) // 2)
+                    self.stats["dropped"] += 1
+                    return
+                # the oldest chunks are dropped to make room, down to the last AUDIO_LIVE_TIME seconds when skipping to live
+                limit = self.max_bytes if self.policy == "drop_oldest" else self.live_bytes
+                dropped = 0
+                while self._chunks and self._chunks[0] is not None and self.nbytes + len(chunk) > limit:
+                    size = len(self._chunks.popleft())
+                    self.nbytes -= size
+                    dropped += size // 2
+                    self.stats["dropped"] += 1
+                self._drop_gap(self.read_samples, dropped)
+
+            if not self._chunks:
+                # the reader was idle, not stalled, until now
+                self.last_read = time.time()
+            self._chunks.append(chunk)
+            if chunk is not None:
+                self.nbytes += len(chunk)
+                self.stats["max_bytes"] = max(self.stats["max_bytes"], self.nbytes)
+            self._cond.notify()
+
+    def skip(self, samples):
+        # samples lost before reaching the queue (overwritten in a shared ring): counted as dropped chunks
+        with self._cond:
+            self.stats["dropped"] += -(-samples // CHUNK)
+            self._drop_gap(self.read_samples + self.nbytes // 2, samples)
+
+    def _drop_gap(self, position, samples):
+        if samples == 0:
+            return
+        total = (self._gap_dropped[-1] if self._gap_dropped else 0) + samples
+        if self._gap_positions and self._gap_positions[-1] == position:
+            self._gap_dropped[-1] = total
+        else:
+            self._gap_positions.append(position)
+            self._gap_dropped.append(total)
+
+    def dropped_before(self, position):
+        # samples dropped before the `position`-th sample read from the queue
+        with self._cond:
+            i = bisect.bisect_left(self._gap_positions, position)
+            return self._gap_dropped[i - 1] if i else 0
+
+    def get(self, block=True, timeout=None):
+        # same interface as queue.Queue.get
+        with self._cond:
+            if block and not self._cond.wait_for(lambda: self._chunks, timeout):
+                raise queue.Empty
+            if not self._chunks:
+                raise queue.Empty
+            chunk = self._chunks.popleft()
+            if chunk is not None:
+                self.nbytes -= len(chunk)
+                self.read_samples += len(chunk) // 2
+            self.last_read = time.time()
+            return chunk
+
+    def stalled_for(self, now=None):
+        # seconds since the queued audio was last read (0 when nothing is waiting)
+        if not self.nbytes:
+            return 0.0
+        return (now or time.time()) - self.last_read
+
+
+class AsyncAudioBuffer(AudioQueue):
+    # audio queue read by a coroutine: chunks are put from the DSP thread, the reader is woken up in the event loop
+    def __init__(self, loop, **kwargs):
+        super().__init__(**kwargs)
+        self.loop = loop
+        self._event = asyncio.Event()
+
+    def put(self, chunk):
+        super().put(chunk)
+        self.loop.call_soon_threadsafe(self._event.set)
+
+    async def aget(self):
+        while True:
+            try:
+                return self.get(block=False)
+            except queue.Empty:
+                pass
+            self._event.clear()
+            await self._event.wait()
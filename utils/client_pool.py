@@ -0,0 +1,99 @@
+import threading
+
+from .parameters import CLIENT_MAX_ERRORS
+from .logs import print_logs
+
+
+class ClientPool:
+    def __init__(self, max_errors=CLIENT_MAX_ERRORS):
+        self.max_errors = max_errors
+
+        self._factories = {}
+        self._closers = {}      # name -> function closing a client, if its transport can't be closed directly
+        self._clients = {}      # name -> client
+        self._users = {}        # id(client) -> number of sessions using the client
+        self._errors = {}       # name -> consecutive errors reported
+        self._discarded = {}    # id(client) -> (name, client) discarded but still used by some sessions
+        self._lock = threading.Lock()
+
+    def register(self, name, factory, close=None):
+        with self._lock:
+            self._factories[name] = factory
+            if close is not None:
+                self._closers[name] = close
+
+    def acquire(self, name):
+        # clients are created on first use and shared by all the sessions
+        with self._lock:
+            client = self._clients.get(name)
+            if client is None:
+                print_logs(f"Creating {name} client...", log_type="clients")
+                client = self._clients[name] = self._factories[name]()
+                self._errors[name] = 0
+            self._users[id(client)] = self._users.get(id(client), 0) + 1
+            return client
+
+    def release(self, name, client=None):
+        # a discarded client is closed when its last session releases it
+        with self._lock:
+            client = client if client is not None else self._clients.get(name)
+            if client is None or self._users.get(id(client), 0) == 0:
+                return
+            self._users[id(client)] -= 1
+            if self._users[id(client)] == 0 and id(client) in self._discarded:
+                self._discarded.pop(id(client))
+                self._close(name, client)
+
+    def renew(self, name, client):
+        # the client of a session replaced by the pool since it was acquired (discarded as unhealthy)
+        # is released for the current one
+        with self._lock:
+            if self._clients.get(name) is client:
+                return client
+        new_client = self.acquire(name)
+        self.release(name, client)
+        return new_client
+
+    def report_success(self, name):
+        self._errors[name] = 0
+
+    def report_error(self, name):
+        # after too many consecutive errors the channel is considered broken: the next acquire creates a new client,
+        # the discarded one is closed once the sessions using it have renewed or released it
+        with self._lock:
+            self._errors[name] = self._errors.get(name, 0) + 1
+            if self._errors[name] >= self.max_errors and name in self._clients:
+                print_logs(f"Discarding unhealthy {name} client...", log_type="clients")
+                client = self._clients.pop(name)
+                self._errors[name] = 0
+                if self._users.get(id(client), 0) > 0:
+                    self._discarded[id(client)] = (name, client)
+                else:
+                    self._close(name, client)
+
+    def is_healthy(self, name):
+        return name in self._clients and self._errors.get(name, 0) < self.max_errors
+
+    def _close(self, name, client):
+        self._users.pop(id(client), None)
+        transport = getattr(client, "transport", None)
+        if name in self._closers:
+            self._closers[name](client)
+        elif transport is not None and hasattr(transport, "close"):
+            transport.close()
+        print_logs(f"Closed {name} client", log_type="clients")
+
+    def shutdown(self, force=False):
+        # close the clients that are not used by any session anymore
+        with self._lock:
+            for name in list(self._clients):
+                if force or self._users.get(id(self._clients[name]), 0) == 0:
+                    self._close(name, self._clients.pop(name))
+            if force:
+                for name, client in self._discarded.values():
+                    self._close(name, client)
+                self._discarded = {}
+
+
+# shared by all the sessions of the server process
+client_pool = ClientPool()
@@ -0,0 +1,110 @@
+from collections import deque
+import threading
+import time
+
+from .parameters import DSP_QUEUE_SIZE, DSP_BATCH_SIZE, DSP_DROP_POLICY
+from .metrics import LatencyStats
+from .logs import print_logs
+
+
+# totals of all the pipelines of the process, exported on the metrics endpoint
+process_stats = {"enqueued": 0, "dropped": 0, "processed": 0, "batches": 0, "max_depth": 0, "failed": 0}
+process_latency = {"queue": LatencyStats(), "dsp": LatencyStats()}
+process_lock = threading.Lock()
+
+
+class DSPPipeline:
+    def __init__(self, process_batch, name="audio_dsp", maxsize=DSP_QUEUE_SIZE, batch_size=DSP_BATCH_SIZE, drop_policy=DSP_DROP_POLICY):
+        if drop_policy not in ("drop_oldest", "drop_newest"):
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+
+        self.process_batch = process_batch
+        self.maxsize, self.batch_size, self.drop_policy = maxsize, batch_size, drop_policy
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self.running = True
+
+        self.stats = {"enqueued": 0, "dropped": 0, "processed": 0, "batches": 0, "max_depth": 0, "failed": 0}
+        self.latency = {"queue": LatencyStats(), "dsp": LatencyStats()}
+
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def put(self, item):
+        with self._cond:
+            if len(self._queue) >= self.maxsize:
+                self.count("dropped")
+                if self.drop_policy == "drop_newest":
+                    return
+                self._queue.popleft()
+
+            self._queue.append((time.perf_counter(), item))
+            self.count("enqueued")
+            self.stats["max_depth"] = max(self.stats["max_depth"], len(self._queue))
+            with process_lock:
+                process_stats["max_depth"] = max(process_stats["max_depth"], len(self._queue))
+            self._cond.notify()
+
+    def count(self, key, n=1):
+        self.stats[key] += n
+        with process_lock:
+            process_stats[key] += n
+
+    def add_latency(self, key, value):
+        self.latency[key].add(value)
+        process_latency[key].add(value)
+
+    @property
+    def depth(self):
+        return len(self._queue)
+
+    @property
+    def nbytes(self):
+        # raw frames waiting to be processed
+        with self._cond:
+            return sum(item[0].nbytes for _, item in self._queue)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self.running and not self._queue:
+                    self._cond.wait()
+                if not self.running:
+                    return
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+
+            t0 = time.perf_counter()
+            for enqueued_at, _ in batch:
+                self.add_latency("queue", t0 - enqueued_at)
+
+            try:
+                self.process_batch([item for _, item in batch])
+            except Exception as e:
+                # a bad frame (unexpected format, resampler error) loses its batch, not the session
+                self.count("failed")
+                print_logs(f"DSP batch of {len(batch)} frames failed ({self.stats['failed']} so far): {e!r}", log_type="dsp")
+
+            self.add_latency("dsp", time.perf_counter() - t0)
+            self.count("processed", len(batch))
+            self.count("batches")
+
+    def stop(self):
+        with self._cond:
+            self.running = False
+            self._cond.notify_all()
+
+
+def format_dsp_prometheus(name="edgebox_dsp"):
+    lines = []
+    for key in ("enqueued", "dropped", "processed", "batches", "failed"):
+        lines += [f"# TYPE {name}_{key}_total counter", f"{name}_{key}_total {process_stats[key]}"]
+    lines += [f"# TYPE {name}_max_depth gauge", f"{name}_max_depth {process_stats['max_depth']}", f"# TYPE {name}_seconds summary"]
+    for stage, stats in process_latency.items():
+        summary = stats.summary()
+        if summary["count"]:
+            for q in (50, 95, 99):
+                lines.append(f'{name}_seconds{{stage="{stage}",quantile="{q / 100}"}} {summary[f"p{q}"]:.6f}')
+        lines.append(f'{name}_seconds_sum{{stage="{stage}"}} {stats.total:.6f}')
+        lines.append(f'{name}_seconds_count{{stage="{stage}"}} {stats.count}')
+    return "\n".join(lines) + "\n"
@@ -68,6 +68,10 @@ LANGUAGE_CODES = {
     "Zulu (South Africa)": "zu-ZA",
 }
 
+# options of the language selectboxes and their positions, built once per process
+LANGUAGE_NAMES = tuple(LANGUAGE_CODES)
+LANGUAGE_INDEX = {name: i for i, name in enumerate(LANGUAGE_NAMES)}
+
 
 LANGUAGE_USES_SPACE = {
     "af-ZA": True, "sq-AL": True, "am-ET": True, 
@@ -0,0 +1,34 @@
+import importlib
+import threading
+
+
+class LazyModule:
+    # module imported on the first access to one of its attributes, so that a cold start of the app
+    # does not pay for the heavy libraries (Google Cloud clients, scipy) before a stream is opened;
+    # the attributes read are then kept on the instance and found without going through __getattr__
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+        self.__dict__["_lock"] = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def load(self):
+        with self._lock:
+            if self._module is None:
+                self.__dict__["_module"] = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        value = getattr(self.load(), attr)
+        self.__dict__[attr] = value
+        return value
+
+    def __repr__(self):
+        return f"<lazy module '{self._name}'{' (loaded)' if self.loaded else ''}>"
+
+
+def lazy_import(name):
+    return LazyModule(name)
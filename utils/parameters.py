@@ -3,7 +3,25 @@ MAX_LEN = 10
 STABILITY_MARGIN = 3  # Number of words displayed that can be modified (previous ones are frozen)
 REFRESH_RATE_FAST = 0.1
 REFRESH_RATE_SLOW = 0.3
-REFRESH_TRANSLATE_RATE = 0.1
+RENDER_STATS_INTERVAL = 30  # Seconds between two logs of the subtitles rendering stats
+RENDER_CACHE_SIZE = 64  # Number of rendered subtitle panes kept in memory
+VOICE_LEVEL_STEP = 0.1  # Voice level changes smaller than this are not pushed to the browser
+TRANSLATE_MAX_WAIT = 0.1  # Maximum seconds a transcript change waits for the requests in flight before being translated
+TRANSLATE_TIMEOUT = 10  # Seconds before a translation request is abandoned
+TRANSLATE_MAX_IN_FLIGHT = 2  # Translation requests of a session sent without waiting for the previous ones (sent blocking calls cannot be cancelled)
+TRANSLATE_RETRY_DELAY = 0.5  # Seconds before a failed translation is retried, doubled after each consecutive failure
+TRANSLATE_MAX_RETRIES = 5  # Consecutive failed translations retried (the next ones wait for a new transcript)
+TEARDOWN_TIMEOUT = 1.0  # Seconds given to the threads of a session to exit on rerun/stop
+
+# Translation cache (shared by all sessions)
+TRANSLATION_CACHE_SIZE = 10000  # Maximum number of translations kept in memory
+TRANSLATION_CACHE_TTL = 3600  # Seconds before a cached translation expires
+TRANSLATION_CACHE_PATH = None  # SQLite file to persist the cache across restarts (None: memory only)
+INCREMENTAL_TRANSLATION = True  # Translate final sentences once and only re-send the interim one
+
+# Segmentation of the languages written without spaces
+MAX_LEN_GRAPHEMES = 20  # Tokens per subtitle line when they are graphemes (no dictionary for the language)
+SEGMENTATION_DICTIONARIES = {}  # Language code -> word list file (one word per line, first column) for word segmentation
 
 # Default languages
 DEFAULT_AUDIO_LANG = "French (France)"
@@ -11,6 +29,16 @@ DEFAULT_TRANS_LANG = "English (United States)"
 
 # Thread names
 THREAD_NAMES = ["speech_to_text", "translate"]
+BROADCAST_THREAD_NAMES = ["broadcast_stt", "broadcast_transl"]
+
+# Session engine
+ENGINE = "threads"  # "threads" (two threads per session), "asyncio" (tasks on shared event loops) or "processes" (worker processes)
+ASYNC_LOOPS = 1  # Number of event loop threads shared by the asyncio sessions
+ASYNC_LOOP_NAME = "session_loop"
+WORKER_PROCESSES = 2  # Number of worker processes running the sessions (ENGINE = "processes")
+WORKER_NAME = "session_worker"
+WORKER_POLL_INTERVAL = 0.01  # Seconds between two reads of the shared audio rings by a worker process
+SESSION_CHECK_INTERVAL = 1  # Seconds between two checks of the sessions of a process (stalled STT streams, memory gauges)
 
 # Display
 LOG_TITLE = "[Logs]"
@@ -18,8 +46,63 @@ LOG_TITLE = "[Logs]"
 # Audio stream
 SR = 16000
 CHUNK = int(SR / 10)
+RING_BUFFER_SIZE = CHUNK * 20  # Samples kept before the oldest ones are dropped
 TIME_BETWEEN_SENTENCES = 4
 STREAMING_LIMIT = 296
+STREAM_HANDOFF_TIME = 5  # Seconds before STREAMING_LIMIT at which the next STT session is opened
+REPLAY_BUFFER_TIME = 30  # Seconds of audio kept to be replayed into the next STT session
+
+# Audio queues of the STT streams (filled by the AudioProcessor, read by the request generators)
+AUDIO_QUEUE_MAX_TIME = 40  # Seconds of audio waiting to be sent to a stream (a replay of REPLAY_BUFFER_TIME seconds must fit)
+AUDIO_QUEUE_MAX_BYTES = 2_000_000  # Bytes of audio waiting to be sent to a stream
+AUDIO_OVERFLOW_POLICY = "skip_to_live"  # "drop_oldest", "drop_newest" or "skip_to_live" (only the last AUDIO_LIVE_TIME seconds are kept)
+AUDIO_LIVE_TIME = 1  # Seconds of audio kept when skipping to live
+STT_MAX_REQUEST_BYTES = 25600  # Audio bytes per StreamingRecognizeRequest (API limit: 25 KB), a backlog is split in several requests
+STT_STALL_TIMEOUT = 10  # Seconds an STT stream can leave its queued audio unread before it is reopened
+TRANSCRIPT_MAX_WORDS = 300  # Words kept in the transcript of a session (the oldest final sentences are dropped first)
+
+# Audio upload to Speech-to-Text (the compressed encodings use PyAV, installed with streamlit-webrtc)
+AUDIO_ENCODING = "LINEAR16"  # "LINEAR16" (256 kbit/s), "FLAC" (lossless) or "OGG_OPUS" (lossy, lowest bandwidth)
+FLAC_COMPRESSION_LEVEL = 5  # 0 (fastest) to 12 (smallest)
+OPUS_BITRATE = 24000  # Bits per second of the Opus encoder
+
+# Audio DSP pipeline (runs outside of the WebRTC callback thread)
+DSP_QUEUE_SIZE = 64  # Raw frames waiting to be processed
+DSP_BATCH_SIZE = 8  # Frames processed together
+DSP_DROP_POLICY = "drop_oldest"  # "drop_oldest" or "drop_newest" when the queue is full
+
+# Voice activity detection (silent chunks are not sent to Speech-to-Text)
+VAD_ENABLED = True
+VAD_MIN_ENERGY = 0.005  # Minimum RMS of a speech chunk
+VAD_ON_RATIO = 3.0  # RMS / noise floor ratio to detect speech
+VAD_OFF_RATIO = 2.0  # RMS / noise floor ratio to stay in speech
+VAD_NOISE_ADAPTATION = 0.05  # Speed at which the noise floor follows the silent chunks
+VAD_SPECTRAL_CHECK = False  # Also require most of the energy to be in the speech band
+VAD_SPEECH_BAND = (300, 3400)  # Hz
+VAD_SPEECH_BAND_RATIO = 0.5
+VAD_PRE_ROLL = 0.3  # Seconds of audio sent before the speech onset
+VAD_HANGOVER = 0.5  # Seconds of audio sent after the end of speech
+VAD_KEEPALIVE = 5  # Maximum seconds without sending audio (the API closes idle streams)
+
+# Translation requests batching (shared by all sessions)
+TRANSLATION_BATCHING = True
+TRANSLATION_BATCH_WINDOW = 0.005  # Seconds during which requests are collected before being sent
+TRANSLATION_MAX_BATCH = 128  # Maximum number of texts per translate_text call
+TRANSLATION_MAX_BATCH_CHARS = 30000  # Maximum number of characters per translate_text call
+TRANSLATION_DISPATCH_WORKERS = 8  # Batches sent concurrently
+
+# Google Cloud clients (shared by all sessions)
+CLIENT_MAX_ERRORS = 3  # Consecutive errors before a client is recreated
+
+# Metrics
+METRICS_WINDOW = 1000  # Number of recent samples kept to compute percentiles
+
+# Latency tracing (time since the audio frame was received, at each stage of the pipeline)
+TRACING_ENABLED = False
+TRACE_CLOCK_SIZE = 600  # Audio chunks whose receive time is kept to trace the STT results
+TRACE_PANEL = True  # Show the stage latencies in the sidebar when tracing is enabled
+TRACE_PANEL_INTERVAL = 2  # Seconds between two refreshes of the sidebar panel
+TRACE_EXPORT_PORT = None  # Port of the local Prometheus-style text endpoint (None: disabled)
 
 # Display messages
 SHUTDOWN_MSG = """
@@ -0,0 +1,103 @@
+from functools import lru_cache
+from math import gcd
+
+import numpy as np
+
+from .lazy_import import lazy_import
+
+
+# imported when the first WebRTC frame is resampled, not when the app starts
+signal = lazy_import("scipy.signal")
+
+
+@lru_cache(maxsize=None)
+def design_filter(up, down):
+    # same anti-aliasing filter and delay compensation as scipy.signal.resample_poly
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    taps = signal.firwin(2 * half_len + 1, 1.0 / max_rate, window=("kaiser", 5.0)) * up
+
+    n_pre_pad = down - half_len % down
+    n_pre_remove = (half_len + n_pre_pad) // down
+    taps = np.concatenate((np.zeros(n_pre_pad), taps)).astype(np.float32)
+    taps.setflags(write=False)
+
+    return taps, n_pre_remove
+
+
+class StreamingResampler:
+    def __init__(self, sr_out):
+        # created with the AudioProcessor of a WebRTC connection: scipy is imported now rather than by the first
+        # frames, which would pile up in the DSP queue meanwhile
+        signal.load()
+        self.sr_out = sr_out
+        self.sr_in = None
+
+    def reset(self, sr_in):
+        g = gcd(sr_in, self.sr_out)
+        self.sr_in = sr_in
+        self.up, self.down = self.sr_out // g, sr_in // g
+        if self.up == self.down:
+            self._taps, self._to_skip = np.ones(1, dtype=np.float32), 0
+        else:
+            self._taps, self._to_skip = design_filter(self.up, self.down)
+
+        self._hist = np.zeros(0, dtype=np.float32)
+        self._hist_start = 0    # input index of _hist[0], always a multiple of `down`
+        self._n_in = 0
+        self._next_out = 0
+        self._n_emitted = 0
+
+    def process(self, audio, sr_in):
+        audio = np.asarray(audio, dtype=np.float32)
+
+        # the browser changed its sample rate: emit the tail of the previous stream and restart
+        if sr_in != self.sr_in:
+            tail = self.flush() if self.sr_in is not None else np.zeros(0, dtype=np.float32)
+            self.reset(sr_in)
+            return np.concatenate((tail, self._process(audio)))
+
+        return self._process(audio)
+
+    def flush(self):
+        if self.sr_in is None or self._n_in == 0:
+            self.sr_in = None
+            return np.zeros(0, dtype=np.float32)
+
+        # feed silence to push out the outputs still waiting for future samples
+        remaining = -(-self._n_in * self.up // self.down) - self._n_emitted
+        pad = np.zeros(len(self._taps) // self.up + self.down + 1, dtype=np.float32)
+        out = self._process(pad)[: max(0, remaining)]
+
+        self.sr_in = None
+        return out
+
+    def _process(self, audio):
+        if self.up == self.down:
+            self._n_in += len(audio)
+            self._n_emitted += len(audio)
+            return audio
+
+        x = np.concatenate((self._hist, audio))
+        self._n_in += len(audio)
+
+        # outputs that only depend on the samples received so far
+        last_out = ((self._n_in - 1) * self.up) // self.down
+        offset = self._hist_start * self.up // self.down
+        out = signal.upfirdn(self._taps, x, self.up, self.down)[self._next_out - offset : last_out + 1 - offset]
+        self._next_out = last_out + 1
+
+        # keep only the history needed by the next outputs
+        needed = max(0, (self._next_out * self.down - len(self._taps)) // self.up)
+        new_start = (needed // self.down) * self.down
+        self._hist = x[new_start - self._hist_start :]
+        self._hist_start = new_start
+
+        # compensate the filter delay at the start of the stream
+        if self._to_skip:
+            skipped = min(self._to_skip, len(out))
+            out = out[skipped:]
+            self._to_skip -= skipped
+
+        self._n_emitted += len(out)
+        return out
@@ -0,0 +1,59 @@
+import numpy as np
+
+
+class RingBuffer:
+    def __init__(self, capacity, dtype=np.int16):
+        self.capacity = int(capacity)
+        self._data = np.zeros(self.capacity, dtype=dtype)
+        self._start = 0
+        self._size = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def nbytes(self):
+        # preallocated
+        return self._data.nbytes
+
+    def write(self, samples):
+        n = len(samples)
+        if n == 0:
+            return
+
+        # keep only the most recent samples if the write is larger than the buffer
+        if n > self.capacity:
+            self.dropped += n - self.capacity
+            samples = samples[-self.capacity:]
+            n = self.capacity
+
+        # drop the oldest samples on overflow
+        overflow = self._size + n - self.capacity
+        if overflow > 0:
+            self.dropped += overflow
+            self._start = (self._start + overflow) % self.capacity
+            self._size -= overflow
+
+        end = (self._start + self._size) % self.capacity
+        first = min(n, self.capacity - end)
+        self._data[end:end + first] = samples[:first]
+        if first < n:
+            self._data[:n - first] = samples[first:]
+        self._size += n
+
+    def read_bytes(self, n):
+        n = min(n, self._size)
+        first = min(n, self.capacity - self._start)
+        if first == n:
+            out = self._data[self._start:self._start + n].tobytes()
+        else:
+            out = self._data[self._start:].tobytes() + self._data[:n - first].tobytes()
+
+        self._start = (self._start + n) % self.capacity
+        self._size -= n
+        return out
+
+    def clear(self):
+        self._start = 0
+        self._size = 0
@@ -0,0 +1,215 @@
+from functools import lru_cache
+import bisect
+import re
+import unicodedata
+
+from .parameters import MAX_LEN, MAX_LEN_GRAPHEMES, SEGMENTATION_DICTIONARIES
+from .lang_list import LANGUAGE_USES_SPACE
+
+
+# scripts written without spaces between words
+DENSE_RANGES = [
+    (0x0E00, 0x0EFF),   # Thai, Lao
+    (0x0F00, 0x0FFF),   # Tibetan
+    (0x1000, 0x109F),   # Myanmar
+    (0x1780, 0x17FF),   # Khmer
+    (0x2E80, 0x2FDF),   # CJK radicals
+    (0x3005, 0x3007),
+    (0x3021, 0x3029),
+    (0x3038, 0x303B),
+    (0x3040, 0x30FF),   # Hiragana, Katakana
+    (0x31F0, 0x31FF),
+    (0x3400, 0x4DBF),   # CJK ideographs
+    (0x4E00, 0x9FFF),
+    (0xF900, 0xFAFF),
+    (0xFF66, 0xFF9F),   # halfwidth Katakana
+    (0x20000, 0x3134F),
+]
+
+# characters extending the previous grapheme (besides the combining marks)
+EXTEND_RANGES = [(0x0E33, 0x0E33), (0x0EB3, 0x0EB3), (0x200C, 0x200D), (0xFE00, 0xFE0F), (0x1F3FB, 0x1F3FF), (0xE0020, 0xE007F)]
+
+
+def common_prefix_length(a, b):
+    if b.startswith(a):
+        return len(a)
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def char_class(ranges):
+    return "".join(f"{re.escape(chr(lo))}-{re.escape(chr(hi))}" if hi > lo else re.escape(chr(lo)) for lo, hi in ranges)
+
+
+def to_ranges(code_points):
+    ranges = []
+    for cp in code_points:
+        if ranges and ranges[-1][1] == cp - 1:
+            ranges[-1][1] = cp
+        else:
+            ranges.append([cp, cp])
+    return ranges
+
+
+@lru_cache(maxsize=None)
+def character_classes():
+    # regex classes built once per process from the unicode database
+    dense = set()
+    for lo, hi in DENSE_RANGES:
+        dense.update(range(lo, hi + 1))
+    extend = set()
+    for lo, hi in EXTEND_RANGES:
+        extend.update(range(lo, hi + 1))
+
+    word, trail = [], []
+    for cp in range(0x110000):
+        category = unicodedata.category(chr(cp))
+        if category in ("Mn", "Mc", "Me"):
+            extend.add(cp)
+        elif cp in dense or cp in extend:
+            continue
+        elif category[0] in "LN":
+            word.append(cp)
+        elif category[0] in "PZ" or category == "Cc":
+            trail.append(cp)
+
+    return {
+        "dense": char_class(DENSE_RANGES),
+        "extend": char_class(to_ranges(sorted(extend))),
+        "word": char_class(to_ranges(word)),
+        "trail": char_class(to_ranges(trail)),
+    }
+
+
+class Segmenter:
+    # tokens must not depend on more than `lookahead` characters after their end,
+    # so that IncrementalSegmenter can keep them when only the text after changes
+    separator = ""
+    lookahead = 1
+    max_len = MAX_LEN
+
+    def segment(self, text):
+        return self.segment_from(text, 0)[0]
+
+    def segment_from(self, text, start):
+        # tokens of text[start:] and their end offsets in text
+        raise NotImplementedError
+
+    def join(self, tokens):
+        return self.separator.join(tokens)
+
+
+class SpaceSegmenter(Segmenter):
+    separator = " "
+
+    def segment(self, text):
+        return text.split(" ")
+
+    def segment_from(self, text, start):
+        tokens, ends = text[start:].split(" "), []
+        for token in tokens:
+            start += len(token)
+            ends.append(start)
+            start += 1
+        return tokens, ends
+
+
+class GraphemeSegmenter(Segmenter):
+    # one token per grapheme for the scripts without spaces, one per run of letters/digits for the others
+    # (e.g. latin words inside japanese), punctuation and spaces stay with the previous token,
+    # emoji ZWJ sequences are kept in one grapheme
+    max_len = MAX_LEN_GRAPHEMES
+
+    def __init__(self):
+        classes = character_classes()
+        extend, trail = classes["extend"], classes["trail"]
+        self.pattern = re.compile(
+            rf"(?:\r\n|(?:[{classes['word']}][{extend}]*)+|[\U0001F1E6-\U0001F1FF]{{2}}"
+            rf"|[^{extend}][{extend}]*(?:(?<=\u200d)[^{extend}][{extend}]*)*|[{extend}]+)[{trail}]*"
+        )
+        self.extend = re.compile(rf"[{extend}]")
+        self.trail = re.compile(rf"[{trail}]*")
+        self.dense = re.compile(rf"[{classes['dense']}]")
+
+    def segment_from(self, text, start):
+        tokens, ends = [], []
+        for match in self.pattern.finditer(text, start):
+            tokens.append(match.group())
+            ends.append(match.end())
+        return tokens, ends
+
+
+class DictionarySegmenter(GraphemeSegmenter):
+    # forward maximum matching of the dictionary words in the scripts without spaces,
+    # the remaining characters are segmented into graphemes
+    max_len = MAX_LEN
+
+    def __init__(self, words):
+        super().__init__()
+        self.words = {word for word in words if len(word) > 1}
+        self.max_word_len = max(map(len, self.words), default=1)
+        self.lookahead = self.max_word_len + 1
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls(line.split()[0] for line in f if line.strip())
+
+    def match_word(self, text, pos):
+        for length in range(min(self.max_word_len, len(text) - pos), 1, -1):
+            end = pos + length
+            # a word can't end inside a grapheme
+            if text[pos:end] in self.words and not self.extend.match(text, end):
+                return end
+        return None
+
+    def segment_from(self, text, start):
+        tokens, ends = [], []
+        pos = start
+        while pos < len(text):
+            end = self.match_word(text, pos) if self.dense.match(text, pos) else None
+            if end is None:
+                end = self.pattern.match(text, pos).end()
+            else:
+                end = self.trail.match(text, end).end()
+            tokens.append(text[pos:end])
+            ends.append(end)
+            pos = end
+        return tokens, ends
+
+
+class IncrementalSegmenter:
+    # segments successive versions of an interim transcript, only re-segmenting after the unchanged tokens
+    def __init__(self, segmenter):
+        self.segmenter = segmenter
+        self.text = ""
+        self.tokens = []
+        self.ends = []      # end offset of each token in self.text
+
+    def split(self, text):
+        unchanged = common_prefix_length(self.text, text)
+        k = bisect.bisect_right(self.ends, unchanged - self.segmenter.lookahead)
+        del self.tokens[k:], self.ends[k:]
+
+        start = self.ends[-1] + len(self.segmenter.separator) if k else 0
+        tokens, ends = self.segmenter.segment_from(text, start)
+        self.tokens.extend(tokens)
+        self.ends.extend(ends)
+
+        self.text = text
+        return list(self.tokens)
+
+
+@lru_cache(maxsize=None)
+def get_segmenter(lang):
+    if LANGUAGE_USES_SPACE.get(lang, True):
+        return SpaceSegmenter()
+    if lang in SEGMENTATION_DICTIONARIES:
+        return DictionarySegmenter.load(SEGMENTATION_DICTIONARIES[lang])
+    return GraphemeSegmenter()
@@ -0,0 +1,72 @@
+import os
+import threading
+import time
+
+from .parameters import SESSION_CHECK_INTERVAL
+from .logs import print_logs
+
+
+def process_rss():
+    # resident memory of the process in bytes (Linux), 0 when it cannot be read
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class SessionMonitor:
+    # one thread checking all the sessions of the process every `interval` seconds:
+    # the stalled STT streams are reopened and the memory held by each session is sampled
+    def __init__(self, interval=SESSION_CHECK_INTERVAL):
+        self.interval = interval
+        self.sessions = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self.memory = {"process_rss": 0, "sessions": 0, "count": 0}
+
+    def register(self, session):
+        with self._lock:
+            if session not in self.sessions:
+                self.sessions.append(session)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="session_monitor", daemon=True)
+                self._thread.start()
+
+    def unregister(self, session):
+        with self._lock:
+            if session in self.sessions:
+                self.sessions.remove(session)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.check()
+
+    def check(self, now=None):
+        with self._lock:
+            sessions = list(self.sessions)
+        total = 0
+        for session in sessions:
+            try:
+                session.check_stall(now)
+                session.memory = session.memory_usage()
+                total += sum(session.memory.values())
+            except Exception as e:
+                print_logs(f"Session check failed: {e}", log_type="monitor")
+        self.memory = {"process_rss": process_rss(), "sessions": total, "count": len(sessions)}
+
+
+def format_memory_prometheus(monitor=None, name="edgebox_memory_bytes"):
+    memory = (monitor or session_monitor).memory
+    return "\n".join([
+        f"# TYPE {name} gauge",
+        f'{name}{{scope="process_rss"}} {memory["process_rss"]}',
+        f'{name}{{scope="session_buffers"}} {memory["sessions"]}',
+        "# TYPE edgebox_sessions gauge",
+        f'edgebox_sessions {memory["count"]}',
+    ]) + "\n"
+
+
+# shared by all the sessions of the process
+session_monitor = SessionMonitor()
@@ -0,0 +1,64 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+HEADER_SIZE = 16    # int64 samples written since the creation, int64 closed flag
+
+
+class SharedAudioRing:
+    # int16 PCM ring in shared memory, written by the AudioProcessor of a session (it is one of its subscribers)
+    # and read by the worker process running the session; positions are absolute sample counts
+    def __init__(self, capacity=None, name=None):
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=HEADER_SIZE + 2 * int(capacity))
+        else:
+            # the spawned workers share the resource tracker of the Streamlit process, which unlinks the segment
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self._header = np.ndarray(2, dtype=np.int64, buffer=self.shm.buf)
+        self._data = np.ndarray((self.shm.size - HEADER_SIZE) // 2, dtype=np.int16, buffer=self.shm.buf, offset=HEADER_SIZE)
+        self.capacity = len(self._data)
+
+    @property
+    def written(self):
+        return int(self._header[0])
+
+    @property
+    def nbytes(self):
+        return self.shm.size
+
+    @property
+    def closed(self):
+        return bool(self._header[1])
+
+    def put(self, chunk):
+        # same interface as the subscriber queues: a chunk of PCM bytes, None at the end of the stream
+        if chunk is None:
+            self._header[1] = 1
+            return
+        samples = np.frombuffer(chunk, dtype=np.int16)
+        start = self.written % self.capacity
+        first = min(len(samples), self.capacity - start)
+        self._data[start:start + first] = samples[:first]
+        self._data[:len(samples) - first] = samples[first:]
+        # published once the samples are in place
+        self._header[0] += len(samples)
+
+    def oldest(self):
+        return max(0, self.written - self.capacity)
+
+    def read(self, position, end):
+        # samples in [position, end), the oldest ones may have been overwritten: call with position >= oldest()
+        start, stop = position % self.capacity, end % self.capacity
+        if end - position == 0:
+            return self._data[:0].copy()
+        if start < stop:
+            return self._data[start:stop].copy()
+        return np.concatenate([self._data[start:], self._data[:stop]])
+
+    def close(self, unlink=False):
+        self._header = self._data = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
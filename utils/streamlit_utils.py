@@ -1,11 +1,34 @@
+from functools import lru_cache
+
 import streamlit as st
 
 from .logs import print_logs
+from .client_pool import client_pool
+from .metrics import LatencyStats
 from thread_manager import stop_all_threads
+from worker_pool import shutdown_workers
+
+
+# time from the start of a rerun to its first subtitle, over all the sessions of the process
+rerun_latency = LatencyStats()
+
+
+@lru_cache(maxsize=None)
+def static_asset(path):
+    # files of web/ read once per process and shared by all the sessions and reruns
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@lru_cache(maxsize=None)
+def style_tag(path):
+    return f"<style>{static_asset(path).decode('utf-8')}</style>"
 
 
 def shutdown_app():
     stop_all_threads()
+    shutdown_workers()
+    client_pool.shutdown()
 
     print_logs("Shutting down Streamlit...")
     st.session_state["shutdown"] = True
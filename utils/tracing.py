@@ -0,0 +1,112 @@
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import bisect
+import threading
+import time
+
+from .parameters import TRACING_ENABLED, TRACE_CLOCK_SIZE
+from .metrics import LatencyStats
+from .logs import print_logs
+from .session_monitor import format_memory_prometheus
+from .translation_dispatcher import format_dispatcher_prometheus
+from .dsp_pipeline import format_dsp_prometheus
+
+
+# latency of each stage, measured since the audio it carries was received by AudioProcessor.recv
+STAGES = ["fill_buffer", "generator", "stt_interim", "stt_final", "transl_sent", "transl_received", "render_transc", "render_transl"]
+
+
+class Tracer:
+    # when disabled, callers only check `enabled` and pass None timestamps around
+    def __init__(self, parent=None, enabled=TRACING_ENABLED):
+        self.enabled = enabled
+        self.parent = parent
+        self.stages = {stage: LatencyStats() for stage in STAGES}
+
+        # (audio time at the end of a chunk, time its last frame was received), in audio order
+        self._clock_audio = deque(maxlen=TRACE_CLOCK_SIZE)
+        self._clock_received = deque(maxlen=TRACE_CLOCK_SIZE)
+        self._lock = threading.Lock()
+
+    def tick(self, audio_time, received_at):
+        with self._lock:
+            self._clock_audio.append(audio_time)
+            self._clock_received.append(received_at)
+
+    def received_at(self, audio_time):
+        # receive time of the chunk containing `audio_time`
+        with self._lock:
+            i = bisect.bisect_left(self._clock_audio, audio_time - 1e-6)
+            if i == len(self._clock_audio):
+                return self._clock_received[-1] if self._clock_received else None
+            return self._clock_received[i]
+
+    def record(self, stage, received_at):
+        if received_at is None:
+            return
+        latency = time.perf_counter() - received_at
+        self.stages[stage].add(latency)
+        if self.parent is not None:
+            self.parent.stages[stage].add(latency)
+
+    def summary(self):
+        return {stage: stats.summary() for stage, stats in self.stages.items() if stats.count}
+
+
+# aggregates the stages of all the sessions
+process_tracer = Tracer()
+
+
+def format_prometheus(tracer=process_tracer, name="edgebox_stage_latency_seconds"):
+    lines = [f"# TYPE {name} summary"]
+    for stage, summary in tracer.summary().items():
+        for q in (50, 95, 99):
+            lines.append(f'{name}{{stage="{stage}",quantile="{q / 100}"}} {summary[f"p{q}"]:.6f}')
+        lines.append(f'{name}_sum{{stage="{stage}"}} {summary["mean"] * summary["count"]:.6f}')
+        lines.append(f'{name}_count{{stage="{stage}"}} {summary["count"]}')
+    return "\n".join(lines) + "\n"
+
+
+def format_markdown(tracers):
+    # one table of p50/p95/p99 (ms) per stage, with a column group per tracer
+    names = list(tracers)
+    summaries = {name: tracer.summary() for name, tracer in tracers.items()}
+    lines = [
+        "| stage | " + " | ".join(f"{name} p50 | p95 | p99" for name in names) + " |",
+        "|---|" + "---:|---:|---:|" * len(names),
+    ]
+    for stage in STAGES:
+        cells = []
+        for name in names:
+            summary = summaries[name].get(stage)
+            cells += [f"{1000 * summary[f'p{q}']:.0f}" if summary else "-" for q in (50, 95, 99)]
+        lines.append(f"| {stage} | " + " | ".join(cells) + " |")
+    return "\n".join(lines)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = (format_prometheus() + format_memory_prometheus() + format_dispatcher_prometheus() + format_dsp_prometheus()).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+metrics_server = None
+metrics_server_lock = threading.Lock()
+
+
+def start_metrics_server(port):
+    # started once per process, the streamlit reruns reuse it
+    global metrics_server
+    with metrics_server_lock:
+        if metrics_server is None:
+            metrics_server = ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+            threading.Thread(target=metrics_server.serve_forever, name="metrics_server", daemon=True).start()
+            print_logs(f"Latency metrics on http://127.0.0.1:{port}/metrics", log_type="tracing")
+    return metrics_server
@@ -0,0 +1,67 @@
+from collections import deque
+
+
+class Transcript:
+    # final segments (most recent within `max_age` seconds) followed by the interim words,
+    # stored in one list so that a response only touches its own words;
+    # the oldest final segments are also dropped when there are more than `max_words` words;
+    # known limit: `output` and `segments` are copies published with every revision, so a response costs
+    # O(words kept), which `max_age` / `max_words` bound (TRANSCRIPT_MAX_WORDS in the sessions)
+    def __init__(self, max_age, max_words=None):
+        self.max_age, self.max_words = max_age, max_words
+        self.finals = deque()   # (words, arrival time), oldest first
+        self.words = []
+        self.start = 0          # index of the first word not expired
+        self.n_final = 0        # index of the first interim word
+
+        # published with every revision: rebuilt (never mutated) when the finals change
+        self.final_segments = []
+
+    def clear(self):
+        self.finals.clear()
+        self.words = []
+        self.start = self.n_final = 0
+        self.final_segments = []
+
+    def too_long(self):
+        return self.max_words is not None and len(self.words) - self.start > self.max_words
+
+    def set_interim(self, words):
+        del self.words[self.n_final:]
+        self.words.extend(words)
+        if self.finals and self.too_long():
+            self.drop_finals(self.too_long)
+
+    def add_final(self, words, now):
+        self.set_interim(words)
+        self.n_final = len(self.words)
+        self.finals.append((words, now))
+        self.expire(now)
+
+    def expire(self, now):
+        # the latest final segment is only dropped when it expires
+        self.drop_finals(lambda: now - self.finals[0][1] > self.max_age or (len(self.finals) > 1 and self.too_long()))
+
+    def drop_finals(self, condition):
+        while self.finals and condition():
+            words, _ = self.finals.popleft()
+            self.start += len(words)
+        self.final_segments = [words for words, _ in self.finals]
+
+        # expired words are removed in bulk once they are the majority (amortized O(1) per word)
+        if self.start > len(self.words) // 2:
+            del self.words[:self.start]
+            self.n_final -= self.start
+            self.start = 0
+
+    @property
+    def prefix(self):
+        return self.words[self.start:self.n_final]
+
+    @property
+    def output(self):
+        return self.words[self.start:]
+
+    @property
+    def segments(self):
+        return self.final_segments, self.words[self.n_final:]
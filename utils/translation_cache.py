@@ -0,0 +1,86 @@
+from collections import OrderedDict
+import sqlite3
+import threading
+import time
+
+from .parameters import TRANSLATION_CACHE_SIZE, TRANSLATION_CACHE_TTL, TRANSLATION_CACHE_PATH
+
+
+class TranslationCache:
+    def __init__(self, max_size=TRANSLATION_CACHE_SIZE, ttl=TRANSLATION_CACHE_TTL, path=TRANSLATION_CACHE_PATH):
+        self.max_size, self.ttl = max_size, ttl
+
+        self._entries = OrderedDict()   # key -> (translation, expiration time)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "disk_hits": 0}
+
+        # optional persistent tier, shared by all the threads
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                "source TEXT, target TEXT, text TEXT, translation TEXT, expires REAL, "
+                "PRIMARY KEY (source, target, text))"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(source, target, text):
+        return source, target, " ".join(text.split())
+
+    def get(self, source, target, text):
+        key = self.make_key(source, target, text)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return entry[0]
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT translation, expires FROM translations WHERE source = ? AND target = ? AND text = ?", key
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    self._store(key, row[0], row[1])
+                    self.stats["hits"] += 1
+                    self.stats["disk_hits"] += 1
+                    return row[0]
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, source, target, text, translation):
+        key = self.make_key(source, target, text)
+        expires = time.time() + self.ttl
+
+        with self._lock:
+            self._store(key, translation, expires)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?)", (*key, translation, expires))
+                self._db.commit()
+
+    def _store(self, key, translation, expires):
+        self._entries[key] = (translation, expires)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+# shared by all the sessions of the server process
+translation_cache = TranslationCache()
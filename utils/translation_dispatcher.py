@@ -0,0 +1,159 @@
+import asyncio
+from concurrent.futures import Future, InvalidStateError
+import threading
+import time
+
+from .parameters import TRANSLATE_TIMEOUT, TRANSLATION_BATCH_WINDOW, TRANSLATION_MAX_BATCH, TRANSLATION_MAX_BATCH_CHARS, TRANSLATION_DISPATCH_WORKERS
+from .metrics import LatencyStats, Histogram
+
+
+class TranslationRequest:
+    def __init__(self, texts, loop=None):
+        self.texts, self.loop = texts, loop
+        self.results = [None] * len(texts)
+        self.remaining = len(texts)
+        self.future = Future()
+        self.submit_time = time.perf_counter()
+
+
+class TranslationDispatcher:
+    # collects the translate_text requests of all the sessions for a few milliseconds
+    # and sends them as one multi-contents call per (client, source, target)
+    def __init__(self, window=TRANSLATION_BATCH_WINDOW, max_batch=TRANSLATION_MAX_BATCH, max_chars=TRANSLATION_MAX_BATCH_CHARS, workers=TRANSLATION_DISPATCH_WORKERS):
+        self.window, self.max_batch, self.max_chars = window, max_batch, max_chars
+        self.workers = workers
+
+        self._pending = {}      # (client, parent, source, target) -> [TranslationRequest]
+        self._cond = threading.Condition()
+        self._threads = []
+
+        self.batch_sizes = Histogram([1, 2, 4, 8, 16, 32, 64, 128])
+        self.queue_delay = LatencyStats()
+        self.stats = {"requests": 0, "calls": 0}
+
+    def translate(self, client, parent, source, target, texts):
+        return self.submit(client, parent, source, target, texts).result()
+
+    def submit(self, client, parent, source, target, texts, loop=None):
+        # the returned future can be cancelled by the session until it is batched, its texts are then left out;
+        # the calls of an async client are run in its event loop `loop`
+        request = TranslationRequest(texts, loop)
+        with self._cond:
+            if not self._threads:
+                self._threads = [
+                    threading.Thread(target=self._run, name=f"translation_dispatcher_{i}", daemon=True)
+                    for i in range(self.workers)
+                ]
+                for thread in self._threads:
+                    thread.start()
+
+            self._pending.setdefault((client, parent, source, target), []).append(request)
+            self.stats["requests"] += 1
+            self._cond.notify()
+
+        return request.future
+
+    def _run(self):
+        # each worker sends the requests of one (client, source, target) group at a time:
+        # while the workers are busy, the next groups keep growing
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending)
+
+            # let the other sessions add their requests to the batch
+            time.sleep(self.window)
+
+            with self._cond:
+                if not self._pending:
+                    continue
+                key = next(iter(self._pending))
+                requests = self._pending.pop(key)
+
+            for batch in self._make_batches(requests):
+                self._send(key, batch)
+
+    def _make_batches(self, requests):
+        # split the texts into batches within the API limits, remembering where each result goes
+        batch, n_chars = [], 0
+        for request in requests:
+            # a batched request is running: it cannot be cancelled anymore
+            if not request.future.set_running_or_notify_cancel():
+                continue
+            for i, text in enumerate(request.texts):
+                if batch and (len(batch) >= self.max_batch or n_chars + len(text) > self.max_chars):
+                    yield batch
+                    batch, n_chars = [], 0
+                batch.append((request, i, text))
+                n_chars += len(text)
+        if batch:
+            yield batch
+
+    def _send(self, key, batch):
+        client, parent, source, target = key
+        now = time.perf_counter()
+        for request in {request for request, _, _ in batch}:
+            self.queue_delay.add(now - request.submit_time)
+        self.batch_sizes.add(len(batch))
+        self.stats["calls"] += 1
+
+        try:
+            response = client.translate_text(
+                contents=[text for _, _, text in batch],
+                target_language_code=target,
+                source_language_code=source,
+                parent=parent,
+                timeout=TRANSLATE_TIMEOUT,
+            )
+            if asyncio.iscoroutine(response):
+                response = asyncio.run_coroutine_threadsafe(response, batch[0][0].loop).result()
+        except Exception as e:
+            for request, _, _ in batch:
+                self._resolve(request.future, exception=e)
+            return
+
+        for (request, i, _), translation in zip(batch, response.translations):
+            request.results[i] = translation.translated_text
+            request.remaining -= 1
+            if request.remaining == 0:
+                self._resolve(request.future, result=request.results)
+
+    def _resolve(self, future, result=None, exception=None):
+        # the session may have cancelled the request in the meantime
+        try:
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+        except InvalidStateError:
+            pass
+
+
+# shared by all the sessions of the server process
+translation_dispatcher = TranslationDispatcher()
+
+
+def format_dispatcher_prometheus(dispatcher=None, name="edgebox_translation"):
+    dispatcher = dispatcher or translation_dispatcher
+    batch_sizes, delay = dispatcher.batch_sizes, dispatcher.queue_delay.summary()
+    lines = [f"# TYPE {name}_batch_size histogram"]
+    cumulative = 0
+    for bucket, count in zip(batch_sizes.buckets + ["+Inf"], batch_sizes.counts):
+        cumulative += count
+        lines.append(f'{name}_batch_size_bucket{{le="{bucket}"}} {cumulative}')
+    lines += [
+        f"{name}_batch_size_sum {batch_sizes.total}",
+        f"{name}_batch_size_count {cumulative}",
+        f"# TYPE {name}_queue_delay_seconds summary",
+    ]
+    if delay["count"]:
+        for q in (50, 95, 99):
+            lines.append(f'{name}_queue_delay_seconds{{quantile="{q / 100}"}} {delay[f"p{q}"]:.6f}')
+    lines += [
+        f"{name}_queue_delay_seconds_sum {dispatcher.queue_delay.total:.6f}",
+        f"{name}_queue_delay_seconds_count {dispatcher.queue_delay.count}",
+        f"# TYPE {name}_requests_total counter",
+        f"{name}_requests_total {dispatcher.stats['requests']}",
+        f"# TYPE {name}_calls_total counter",
+        f"{name}_calls_total {dispatcher.stats['calls']}",
+    ]
+    return "\n".join(lines) + "\n"
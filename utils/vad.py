@@ -0,0 +1,74 @@
+from collections import deque
+
+import numpy as np
+
+from .parameters import (
+    SR, CHUNK, VAD_MIN_ENERGY, VAD_ON_RATIO, VAD_OFF_RATIO, VAD_NOISE_ADAPTATION, VAD_SPECTRAL_CHECK,
+    VAD_SPEECH_BAND, VAD_SPEECH_BAND_RATIO, VAD_PRE_ROLL, VAD_HANGOVER, VAD_KEEPALIVE,
+)
+
+
+class VoiceActivityDetector:
+    def __init__(self, spectral_check=VAD_SPECTRAL_CHECK, pre_roll=VAD_PRE_ROLL, hangover=VAD_HANGOVER, keepalive=VAD_KEEPALIVE):
+        self.spectral_check = spectral_check
+        self.hangover_chunks = int(hangover * SR / CHUNK)
+        self.keepalive_chunks = int(keepalive * SR / CHUNK)
+
+        self.noise_floor = VAD_MIN_ENERGY / VAD_ON_RATIO
+        self.active = False
+        self._hangover = 0
+        self._pre_roll = deque(maxlen=int(pre_roll * SR / CHUNK))
+        self._since_sent = 0
+
+        freqs = np.fft.rfftfreq(CHUNK, d=1 / SR)
+        self._speech_band = (freqs >= VAD_SPEECH_BAND[0]) & (freqs <= VAD_SPEECH_BAND[1])
+
+        self.stats = {"chunks": 0, "suppressed": 0}
+
+    @property
+    def suppressed_ratio(self):
+        return self.stats["suppressed"] / self.stats["chunks"] if self.stats["chunks"] else 0.0
+
+    def is_speech(self, samples):
+        energy = np.sqrt(np.mean(samples**2))
+
+        # hysteresis: a lower threshold is needed to stay active than to become active
+        ratio = VAD_OFF_RATIO if self.active else VAD_ON_RATIO
+        speech = energy > max(VAD_MIN_ENERGY, self.noise_floor * ratio)
+
+        if speech and self.spectral_check:
+            spectrum = np.abs(np.fft.rfft(samples, n=CHUNK))**2
+            speech = spectrum[self._speech_band].sum() > VAD_SPEECH_BAND_RATIO * spectrum.sum()
+
+        if not speech:
+            self.noise_floor += VAD_NOISE_ADAPTATION * (energy - self.noise_floor)
+
+        return speech
+
+    def process(self, chunk):
+        # returns the chunks to send: speech, with some audio before (pre-roll) and after (hangover)
+        self.stats["chunks"] += 1
+        samples = np.frombuffer(chunk, dtype=np.int16).astype(np.float32) / 32768.0
+
+        self.active = self.is_speech(samples)
+        if self.active:
+            self._hangover = self.hangover_chunks
+            out = list(self._pre_roll) + [chunk]
+            self._pre_roll.clear()
+        elif self._hangover > 0:
+            self._hangover -= 1
+            out = [chunk]
+        elif self._since_sent >= self.keepalive_chunks:
+            # some audio is still sent during long silences so that the STT stream is not closed;
+            # the pre-roll is older than this chunk and can't be sent after it anymore
+            self.stats["suppressed"] += len(self._pre_roll)
+            self._pre_roll.clear()
+            out = [chunk]
+        else:
+            if len(self._pre_roll) == self._pre_roll.maxlen:
+                self.stats["suppressed"] += 1
+            self._pre_roll.append(chunk)
+            out = []
+
+        self._since_sent = 0 if out else self._since_sent + 1
+        return out
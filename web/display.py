@@ -1,39 +1,54 @@
+from functools import lru_cache
 from pathlib import Path
 import re
 
-from utils.parameters import MAX_LEN, REFRESH_RATE_SLOW
-from utils.lang_list import LANGUAGE_USES_SPACE
+from utils.parameters import MAX_LEN, REFRESH_RATE_SLOW, RENDER_CACHE_SIZE, VOICE_LEVEL_STEP
+from utils.segmentation import get_segmenter
 
 
 TEMPLATE = (Path(__file__).parent / "subtitles_template.html").read_text(encoding="utf-8")
+VOICE_TEMPLATE = (Path(__file__).parent / "voice_template.html").read_text(encoding="utf-8")
+
+INDENT_PATTERN = re.compile(r'^[ \t]+', flags=re.MULTILINE)
+SLOT_PATTERN = re.compile(r'\{\{(\w+)\}\}')
+NEWLINE_INDENT_PATTERN = re.compile(r'\n[ \t]+')
 
 
 def join_text(text, lang):
-    return " ".join(text) if LANGUAGE_USES_SPACE[lang] else "".join(text)
+    return get_segmenter(lang).join(text)
 
 
 def split_text(text, lang):
-    return text.split(" ") if LANGUAGE_USES_SPACE[lang] else text.split("")
+    return get_segmenter(lang).segment(text)
 
 
 def sanitize_html(html: str) -> str:
     # remove indentations
-    html = re.sub(r'^[ \t]+', '', html, flags=re.MULTILINE)
+    html = INDENT_PATTERN.sub('', html)
     return html
 
 
-def format_subt(text, prev_subt):
+def compile_template(template):
+    # the template is sanitized once and split into static chunks and slot names
+    parts = SLOT_PATTERN.split(sanitize_html(template))
+    return parts[0::2], parts[1::2]
+
+
+TEMPLATE_CHUNKS, TEMPLATE_SLOTS = compile_template(TEMPLATE)
+
+
+def format_subt(text, prev_subt, max_len=MAX_LEN):
     new_line = False
 
-    if len(text) <= MAX_LEN:
+    if len(text) <= max_len:
         subt = text
         prev_subt = []
     else:
-        subt = text[(len(text) // MAX_LEN) * MAX_LEN :]
+        subt = text[(len(text) // max_len) * max_len :]
         start_subt = len(text) - len(subt)
 
         new_prev_subt = text[: start_subt]
-        new_prev_subt = new_prev_subt[-MAX_LEN :]
+        new_prev_subt = new_prev_subt[-max_len :]
         if prev_subt != new_prev_subt:
             prev_subt = new_prev_subt
             new_line = True
@@ -41,15 +56,38 @@ def format_subt(text, prev_subt):
     return new_line, prev_subt, subt
 
 
-def get_html_subt(prev_subt, subt, line_scroll, subt_type, subt_name, voice_level=0.0):
-    html = TEMPLATE
+def get_html_subt(prev_subt, subt, line_scroll, subt_type, subt_name):
+    return render_subt(prev_subt, subt, bool(line_scroll), subt_type, subt_name)
+
+
+def get_html_voice(voice_level):
+    # the level is quantized so that the small changes during speech are not pushed
+    return render_voice(round(voice_level / VOICE_LEVEL_STEP) * VOICE_LEVEL_STEP)
+
+
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
+def render_voice(voice_level):
+    return sanitize_html(VOICE_TEMPLATE).replace("{{VOICE_LEVEL}}", f"{voice_level:.2f}")
+
+
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
+def render_subt(prev_subt, subt, line_scroll, subt_type, subt_name):
+    values = {
+        "SUBT_NAME": subt_name,
+        "SUBT_TYPE": subt_type,
+        "ANIM_DURATION": str(REFRESH_RATE_SLOW),
+        "ANIMATE_CLASS": "animate" if line_scroll else "",
+        "PREV_SUBT": prev_subt if len(prev_subt) > 0 else "▪▪▪",
+        "SUBT": subt if len(subt) > 0 else "▪▪▪",
+    }
 
-    html = html.replace("{{SUBT_NAME}}", subt_name)
-    html = html.replace("{{SUBT_TYPE}}", subt_type)
-    html = html.replace("{{ANIM_DURATION}}", str(REFRESH_RATE_SLOW))
-    html = html.replace("{{VOICE_LEVEL}}", f"{voice_level:.2f}")
-    html = html.replace("{{ANIMATE_CLASS}}", "animate" if line_scroll else "")
-    html = html.replace("{{PREV_SUBT}}", prev_subt if len(prev_subt) > 0 else "▪▪▪")
-    html = html.replace("{{SUBT}}", subt if len(subt) > 0 else "▪▪▪")
+    html = [TEMPLATE_CHUNKS[0]]
+    for slot, chunk in zip(TEMPLATE_SLOTS, TEMPLATE_CHUNKS[1:]):
+        value = values.get(slot, "{{" + slot + "}}")
+        # multi-line values get the same indentation removal as the template
+        if "\n" in value:
+            value = NEWLINE_INDENT_PATTERN.sub('\n', value)
+        html.append(value)
+        html.append(chunk)
 
-    return sanitize_html(html)
\ No newline at end of file
+    return "".join(html)
@@ -0,0 +1,296 @@
+import multiprocessing
+import queue
+import threading
+import time
+import uuid
+
+from microphone_stream import AudioProcessor
+from thread_manager import ThreadManager
+from utils.parameters import (
+    SR, CHUNK, REPLAY_BUFFER_TIME, TEARDOWN_TIMEOUT, WORKER_PROCESSES, WORKER_NAME, WORKER_POLL_INTERVAL,
+)
+from utils.logs import print_logs
+from utils.audio_queue import AudioQueue
+from utils.shared_ring import SharedAudioRing
+from utils.tracing import Tracer
+
+
+#------- worker process side -------#
+
+class RingAudioSource:
+    # the part of AudioProcessor used by ThreadManager, fed by the shared ring of the session:
+    # the ring keeps the last REPLAY_BUFFER_TIME seconds, which is also the replay buffer of the STT streams
+    generator = AudioProcessor.generator
+    agenerator = AudioProcessor.agenerator
+
+    def __init__(self, ring):
+        self.ring = ring
+        self.subscribers = {}   # buffer -> next position to read
+        self._lock = threading.Lock()
+        self.running = True
+        self.active_generators = 0
+        self.tracer = Tracer(enabled=False)
+
+    def subscribe(self, since=None, buffer=None):
+        buffer = buffer or AudioQueue()
+        with self._lock:
+            if self.ring is None:
+                # the session is closed: the stream ends at once
+                buffer.put(None)
+                return buffer, since or 0.0
+            position = self.ring.written
+            if since is not None:
+                position = max(int(since * SR) // CHUNK * CHUNK, self.ring.oldest())
+            self.subscribers[buffer] = position
+        self.poll()
+        return buffer, position / SR
+
+    def unsubscribe(self, buffer):
+        with self._lock:
+            self.subscribers.pop(buffer, None)
+        buffer.put(None)
+
+    def poll(self):
+        # called by the poller of the worker: new chunks are put in the subscriber queues
+        with self._lock:
+            if self.ring is None:
+                return
+            written = self.ring.written
+            oldest = self.ring.oldest()
+            for buffer, position in self.subscribers.items():
+                # a subscriber more than the ring capacity behind has lost the overwritten audio
+                if position < oldest:
+                    buffer.skip(oldest - position)
+                    position = oldest
+                if position < written:
+                    samples = self.ring.read(position, written)
+                    for i in range(0, len(samples), CHUNK):
+                        buffer.put(samples[i:i + CHUNK].tobytes())
+                    self.subscribers[buffer] = written
+
+            if self.ring.closed and self.running:
+                self.running = False
+                for buffer in self.subscribers:
+                    buffer.put(None)
+
+    def memory_usage(self):
+        with self._lock:
+            return {"stream_queues": sum(buffer.nbytes for buffer in self.subscribers)}
+
+    def close(self):
+        with self._lock:
+            self.running = False
+            self.ring.close()
+            self.ring = None
+
+
+class WorkerSession(ThreadManager):
+    # a ThreadManager whose updates are sent to the Streamlit process
+    def __init__(self, session_id, results, lang_audio, lang_transl, source, transc_client=None, transl_client=None):
+        self.session_id, self.results = session_id, results
+        super().__init__(lang_audio, lang_transl, source, transc_client=transc_client, transl_client=transl_client)
+
+    def notify_update(self):
+        super().notify_update()
+        self.results.put((self.session_id, self.output_stt, self.output_transl, self.last_final_audio_time))
+
+
+def worker_main(commands, results, clients=None):
+    # sessions of one worker process; `clients` builds the (speech, translation) clients shared by its sessions,
+    # the pooled Google Cloud clients are used otherwise
+    transc_client, transl_client = clients() if clients is not None else (None, None)
+    sessions = {}
+    sessions_lock = threading.Lock()
+
+    def poll_rings():
+        while True:
+            with sessions_lock:
+                sources = [session.audio_processor for session in sessions.values()]
+            for source in sources:
+                source.poll()
+            time.sleep(WORKER_POLL_INTERVAL)
+
+    threading.Thread(target=poll_rings, name="ring_poller", daemon=True).start()
+
+    while True:
+        command, session_id, *args = commands.get()
+        if command == "exit":
+            break
+
+        if command == "start":
+            ring_name, lang_audio, lang_transl, since = args
+            try:
+                ring = SharedAudioRing(name=ring_name)
+            except FileNotFoundError:
+                continue    # stopped before it reached the worker
+            session = WorkerSession(session_id, results, lang_audio, lang_transl, RingAudioSource(ring), transc_client, transl_client)
+            session.last_final_audio_time = since
+            with sessions_lock:
+                sessions[session_id] = session
+            session.start()
+
+        elif command == "reconfigure" and session_id in sessions:
+            sessions[session_id].reconfigure(*args)
+
+        elif command == "stop" and session_id in sessions:
+            with sessions_lock:
+                session = sessions.pop(session_id)
+            session.stop()
+            session.join(TEARDOWN_TIMEOUT)
+            session.audio_processor.close()
+
+
+#------- Streamlit process side -------#
+
+class WorkerProcess:
+    def __init__(self, index, clients=None):
+        self.name = f"{WORKER_NAME}_{index}"
+        self.clients = clients
+        self.sessions = {}
+        self.restarts = 0
+        self.start()
+
+    def start(self):
+        # spawned: forking a process that runs gRPC channels and Streamlit threads is not safe
+        context = multiprocessing.get_context("spawn")
+        self.commands, self.results = context.Queue(), context.Queue()
+        self.process = context.Process(target=worker_main, args=(self.commands, self.results, self.clients), name=self.name, daemon=True)
+        self.process.start()
+
+    def send(self, command, session_id, *args):
+        self.commands.put((command, session_id, *args))
+
+
+class WorkerPool:
+    # sessions are assigned to the least loaded worker; when a worker dies, only its sessions are restarted
+    # (in a new process for the same worker, replaying the audio since their last final transcript)
+    def __init__(self, n_workers=WORKER_PROCESSES, clients=None):
+        self.workers = [WorkerProcess(i, clients) for i in range(n_workers)]
+        self.lock = threading.Lock()
+        self.running = True
+        for worker in self.workers:
+            threading.Thread(target=self.receive, args=(worker,), name=f"{worker.name}_results", daemon=True).start()
+
+    def assign(self, session):
+        with self.lock:
+            worker = min(self.workers, key=lambda worker: len(worker.sessions))
+            worker.sessions[session.session_id] = session
+            worker.send("start", session.session_id, session.ring.name, session.lang_audio, session.lang_transl, None)
+        return worker
+
+    def release(self, session):
+        with self.lock:
+            if session.worker is not None and session.worker.sessions.pop(session.session_id, None) is not None:
+                session.worker.send("stop", session.session_id)
+
+    def receive(self, worker):
+        # transcripts of the sessions of one worker, and restart of the worker when its process died
+        while self.running:
+            try:
+                session_id, output_stt, output_transl, last_final = worker.results.get(timeout=0.5)
+            except queue.Empty:
+                if self.running and not worker.process.is_alive():
+                    self.restart(worker)
+                continue
+            session = worker.sessions.get(session_id)
+            if session is not None:
+                session.update(output_stt, output_transl, last_final)
+
+    def restart(self, worker):
+        print_logs(f"Worker {worker.name} died (exit code {worker.process.exitcode}), restarting {len(worker.sessions)} sessions", log_type="workers")
+        with self.lock:
+            worker.restarts += 1
+            worker.start()
+            for session in worker.sessions.values():
+                worker.send("start", session.session_id, session.ring.name, session.lang_audio, session.lang_transl, session.last_final_audio_time)
+
+    def shutdown(self):
+        self.running = False
+        for worker in self.workers:
+            worker.send("exit", None)
+        for worker in self.workers:
+            worker.process.join(TEARDOWN_TIMEOUT)
+            if worker.process.is_alive():
+                worker.process.terminate()
+
+
+class RemoteSession:
+    # same surface as ThreadManager for app.py, the STT and translation streams run in a worker process:
+    # the audio goes through a shared-memory ring, the transcripts come back through the results queue of the worker
+    def __init__(self, lang_audio, lang_transl, audio_processor, pool=None):
+        self.pool = pool or get_worker_pool()
+        self.session_id = uuid.uuid4().hex
+        self.lang_audio, self.lang_transl = lang_audio, lang_transl
+        self.audio_processor = audio_processor
+        self.tracer = audio_processor.tracer
+        self.ring = SharedAudioRing(capacity=REPLAY_BUFFER_TIME * SR)
+        self.worker = None
+
+        self.output_stt, self.output_transl = [], []
+        self.stt_received_at = self.transl_received_at = None
+        self.last_final_audio_time = None
+
+        self.update_version = 0
+        self.update_cond = threading.Condition()
+        self.running = True
+
+    def update(self, output_stt, output_transl, last_final_audio_time):
+        self.output_stt, self.output_transl = output_stt, output_transl
+        self.last_final_audio_time = last_final_audio_time
+        with self.update_cond:
+            self.update_version += 1
+            self.update_cond.notify_all()
+
+    def wait_update(self, version, timeout=None):
+        with self.update_cond:
+            self.update_cond.wait_for(lambda: not self.running or self.update_version != version, timeout)
+            return self.update_version
+
+    def memory_usage(self):
+        # the audio buffers and the shared ring (the other buffers of the session are in the worker)
+        return self.audio_processor.memory_usage()
+
+    def reconfigure(self, lang_audio, lang_transl):
+        if (lang_audio, lang_transl) != (self.lang_audio, self.lang_transl):
+            self.lang_audio, self.lang_transl = lang_audio, lang_transl
+            self.worker.send("reconfigure", self.session_id, lang_audio, lang_transl)
+
+    def start(self):
+        if self.worker is None and self.running:
+            self.audio_processor.subscribe(None, self.ring)
+            self.worker = self.pool.assign(self)
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self.audio_processor.unsubscribe(self.ring)
+        self.pool.release(self)
+        with self.update_cond:
+            self.update_cond.notify_all()
+        self.ring.close(unlink=True)
+
+    def join(self, timeout=None):
+        # the threads run in the worker
+        return []
+
+
+# started on first use, shared by all the sessions of the Streamlit process
+worker_pool = None
+worker_pool_lock = threading.Lock()
+
+
+def get_worker_pool():
+    global worker_pool
+    with worker_pool_lock:
+        if worker_pool is None:
+            worker_pool = WorkerPool()
+        return worker_pool
+
+
+def shutdown_workers():
+    global worker_pool
+    with worker_pool_lock:
+        if worker_pool is not None:
+            worker_pool.shutdown()
+            worker_pool = None